@@ -1,23 +1,51 @@
+import math
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
 from datetime import timedelta
 
+from django.http import StreamingHttpResponse
 from django.utils.timezone import now
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
 from core.local import local_state
 from poi.api import serializers
 from poi.api.filters import LocationHistoryFilter
+from poi.api.renderers import (
+    FAST_RENDERER_CLASSES,
+    TRACK_RENDERER_CLASSES,
+    TrackJSONRenderer,
+    stream_json_list,
+)
 from poi.models import LocationHistory
+from poi.tracks import (
+    READINGS_CHUNK_SIZE,
+    chain_readings,
+    chunked,
+    downsample,
+    exclude_not_traveling,
+    merge_windows,
+    track_columns,
+)
 from telemetry.api.serializers import VehicleStateReadingSerializer
 from telemetry.models.bt.reading import Reading
 
+# readings around a history added by ``expand``
+EXPAND_WINDOW = timedelta(minutes=10)
+BATCH_MAX_HISTORIES = 200
+# reading windows of a vehicle closer than this are read in one range
+BATCH_MAX_GAP = timedelta(hours=1)
+
 
 class LocationHistoryViewSet(ReadOnlyModelViewSet):
     serializer_class = serializers.LocationHistorySerializer
+    renderer_classes = FAST_RENDERER_CLASSES
     filter_backends = (DjangoFilterBackend,)
     filter_class = LocationHistoryFilter
+    query_budget = {"list": 2, "retrieve": 1}
 
     def get_queryset(self):
         return LocationHistory.objects.for_customer(local_state.customer)
@@ -29,7 +57,7 @@ class LocationHistoryViewSet(ReadOnlyModelViewSet):
                 lower={
                     "vehicle_id": obj.vehicle.pk,
                     "datetime": obj.get_duration_lower()
-                    - timedelta(minutes=10),
+                    - EXPAND_WINDOW,
                 },
                 upper={
                     "vehicle_id": obj.vehicle.pk,
@@ -49,7 +77,7 @@ class LocationHistoryViewSet(ReadOnlyModelViewSet):
                 upper={
                     "vehicle_id": obj.vehicle.pk,
                     "datetime": obj.get_duration_upper()
-                    + timedelta(minutes=10),
+                    + EXPAND_WINDOW,
                 },
             )
         return None
@@ -62,53 +90,235 @@ class LocationHistoryViewSet(ReadOnlyModelViewSet):
         ]
 
     @staticmethod
-    def _exclude_not_traveling_readings(data) -> list:
-        # Exclude not traveling readings
-        _new_data = []
-        _prev = None
+    def _track_params(params) -> dict:
+        """Streaming and downsampling query params of ``readings``."""
+        track = {}
+        for name, cast in (
+            ("tolerance", float),
+            ("bucket", int),
+            ("max_points", int),
+        ):
+            try:
+                track[name] = cast(params.get(name) or 0)
+            except ValueError:
+                raise ValidationError({name: "A number is required."})
+            if track[name] < 0:
+                raise ValidationError({name: "Must not be negative."})
+        track["stream"] = params.get("stream") not in (None, "", "0", "false")
+        return track
+
+    @staticmethod
+    def _track_bucket(obj, track) -> int:
+        """Seconds of the time buckets, from ``max_points`` if not given."""
+        if track["bucket"] or not track["max_points"]:
+            return track["bucket"]
+        end = obj.get_duration_upper() or now()
+        seconds = (end - obj.get_duration_lower()).total_seconds()
+        return math.ceil(seconds / track["max_points"])
 
-        for reading in data:
-            if reading.is_traveling or not _prev or _prev.is_traveling:
-                _new_data.append(reading)
+    @staticmethod
+    def _get_readings(obj):
+        """QuerySet of the readings of ``obj`` in datetime order."""
+        return Reading.objects.sorted_range(
+            lower=dict(vehicle_id=obj.vehicle.pk, datetime=obj.duration.lower),
+            upper=dict(
+                vehicle_id=obj.vehicle.pk,
+                datetime=obj.duration.upper or now() + timedelta(seconds=1),
+            ),
+        )
 
-            _prev = reading
+    def _track(self, obj, expand, track):
+        """
+        Readings of ``obj`` in datetime order, read as they are consumed,
+        filtered and downsampled on the fly, with the serializer context.
+        """
+        lower = upper = None
+        context_data = {}
+        if expand:
+            lower = self._get_lower_expand(obj)
+            upper = self._get_upper_expand(obj)
+            context_data["expanded_ids"] = self._get_expanded_ids(lower, upper)
 
-        return _new_data
+        # server-side cursor instead of the queryset result cache
+        readings = self._get_readings(obj).iterator(
+            chunk_size=READINGS_CHUNK_SIZE
+        )
+        readings = chain_readings(readings, lower, upper)
+        readings = downsample(
+            exclude_not_traveling(readings),
+            tolerance=track["tolerance"],
+            bucket=self._track_bucket(obj, track),
+            keep=[pk for pk in context_data.get("expanded_ids", ()) if pk],
+        )
+        return readings, context_data
 
-    @action(detail=True, methods=["GET"])
+    @action(
+        detail=True,
+        methods=["GET"],
+        renderer_classes=FAST_RENDERER_CLASSES + list(TRACK_RENDERER_CLASSES),
+    )
     def readings(self, request, pk=None):
         obj: LocationHistory = self.get_object()
-
-        data = list(
-            Reading.objects.sorted_range(
-                lower=dict(
-                    vehicle_id=obj.vehicle.pk, datetime=obj.duration.lower
-                ),
-                upper=dict(
-                    vehicle_id=obj.vehicle.pk,
-                    datetime=obj.duration.upper or now() + timedelta(seconds=1),
-                ),
-            )
+        expand = request.GET.get("expand")
+        track = self._track_params(request.GET)
+        # columnar tracks are small enough to be sent whole
+        columnar = isinstance(
+            request.accepted_renderer, TRACK_RENDERER_CLASSES
         )
 
-        expand = request.GET.get("expand")
-        context_data = {}
-        if expand:
-            lower_qs = self._get_lower_expand(obj)
-            upper_qs = self._get_upper_expand(obj)
-            context_data["expanded_ids"] = self._get_expanded_ids(
-                lower_qs, upper_qs
+        readings, context_data = self._track(obj, expand, track)
+        if track["stream"] and not columnar:
+            chunks = (
+                VehicleStateReadingSerializer(
+                    instance=chunk, many=True, context=context_data
+                ).data
+                for chunk in chunked(readings, READINGS_CHUNK_SIZE)
             )
-            if lower_qs:
-                data.append(lower_qs)
-
-            if upper_qs:
-                data.append(upper_qs)
+            return StreamingHttpResponse(
+                stream_json_list(chunks), content_type="application/json"
+            )
+        data = list(readings)
 
-        data = self._exclude_not_traveling_readings(data)
-        data = sorted(data, key=lambda obj: obj.datetime)
+        if columnar:
+            return Response(
+                track_columns(data, context_data.get("expanded_ids", ()))
+            )
         return Response(
             VehicleStateReadingSerializer(
                 instance=data, many=True, context=context_data
             ).data
         )
+
+    @staticmethod
+    def _batch_histories(request, queryset):
+        ids = request.GET.get("ids")
+        if ids:
+            try:
+                ids = [int(pk) for pk in ids.split(",")]
+            except ValueError:
+                raise ValidationError(
+                    {"ids": "A comma separated list of ids is required."}
+                )
+            queryset = queryset.filter(pk__in=ids)
+        histories = list(
+            queryset.order_by("vehicle_id", "duration")[
+                : BATCH_MAX_HISTORIES + 1
+            ]
+        )
+        if len(histories) > BATCH_MAX_HISTORIES:
+            raise ValidationError(
+                {
+                    "detail": f"At most {BATCH_MAX_HISTORIES} location "
+                    f"histories at once, narrow the filters."
+                }
+            )
+        return histories
+
+    @staticmethod
+    def _history_window(obj, expand):
+        """Readings of ``obj`` and of its expansion are within this window."""
+        lower = obj.get_duration_lower()
+        upper = obj.get_duration_upper()
+        if expand:
+            lower -= EXPAND_WINDOW
+            upper = upper and upper + EXPAND_WINDOW
+        return lower, upper or now() + timedelta(seconds=1)
+
+    def _vehicle_readings(self, vehicle_id, histories, expand):
+        """Readings of the union of the windows of ``histories``."""
+        readings = []
+        windows = [self._history_window(obj, expand) for obj in histories]
+        for start, end in merge_windows(windows, BATCH_MAX_GAP):
+            readings.extend(
+                Reading.objects.sorted_range(
+                    lower=dict(vehicle_id=vehicle_id, datetime=start),
+                    upper=dict(vehicle_id=vehicle_id, datetime=end),
+                )
+            )
+        return readings
+
+    @staticmethod
+    def _history_readings(obj, readings, datetimes, expand):
+        """
+        Readings of ``obj`` sliced from the readings of its vehicle, with
+        the expansions of ``_get_lower_expand`` and ``_get_upper_expand``:
+        the last traveling reading before the history and the first one
+        after it.
+        """
+        lower = obj.get_duration_lower()
+        upper = obj.get_duration_upper() or now() + timedelta(seconds=1)
+        first = bisect_left(datetimes, lower)
+        last = bisect_left(datetimes, upper)
+        if not expand:
+            return readings[first:last], None, None
+
+        before = readings[bisect_left(datetimes, lower - EXPAND_WINDOW):first]
+        lower_expand = next(
+            (reading for reading in reversed(before) if reading.is_traveling),
+            None,
+        )
+        upper_expand = None
+        if obj.get_duration_upper():
+            after = readings[
+                last:bisect_right(datetimes, upper + EXPAND_WINDOW)
+            ]
+            upper_expand = next(
+                (reading for reading in after if reading.is_traveling), None
+            )
+        return readings[first:last], lower_expand, upper_expand
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="readings",
+        renderer_classes=FAST_RENDERER_CLASSES + [TrackJSONRenderer],
+    )
+    def batch_readings(self, request):
+        """
+        Tracks of many histories, by ``ids`` or ``LocationHistoryFilter``
+        params, grouped by history id. The readings of a vehicle are read
+        once for all its histories.
+        """
+        histories = self._batch_histories(
+            request, self.filter_queryset(self.get_queryset())
+        )
+        expand = bool(request.GET.get("expand"))
+        track = self._track_params(request.GET)
+        columnar = isinstance(request.accepted_renderer, TrackJSONRenderer)
+
+        by_vehicle = defaultdict(list)
+        for obj in histories:
+            by_vehicle[obj.vehicle_id].append(obj)
+
+        response = {}
+        for vehicle_id, vehicle_histories in by_vehicle.items():
+            readings = self._vehicle_readings(
+                vehicle_id, vehicle_histories, expand
+            )
+            datetimes = [reading.datetime for reading in readings]
+            for obj in vehicle_histories:
+                data, lower, upper = self._history_readings(
+                    obj, readings, datetimes, expand
+                )
+                expanded_ids = self._get_expanded_ids(lower, upper)
+                data = list(
+                    downsample(
+                        exclude_not_traveling(
+                            chain_readings(data, lower, upper)
+                        ),
+                        tolerance=track["tolerance"],
+                        bucket=self._track_bucket(obj, track),
+                        keep=[pk for pk in expanded_ids if pk],
+                    )
+                )
+                if columnar:
+                    response[obj.pk] = track_columns(data, expanded_ids)
+                else:
+                    response[obj.pk] = VehicleStateReadingSerializer(
+                        instance=data,
+                        many=True,
+                        context={"expanded_ids": expanded_ids}
+                        if expand
+                        else {},
+                    ).data
+        return Response(response)
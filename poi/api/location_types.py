@@ -7,6 +7,7 @@ from poi.api import serializers
 
 class LocationTypeViewSet(ModelViewSet):
     serializer_class = serializers.LocationTypeSerializer
+    query_budget = {"list": 2, "retrieve": 1}
 
     def get_queryset(self):
         return models.LocationType.objects.for_customer(
@@ -1,6 +1,8 @@
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from rest_framework_gis.filters import InBBoxFilter
@@ -9,14 +11,18 @@ from core.local import local_state
 from poi import models
 from poi.api import serializers
 from poi.api.filters import LocationFilter, LocationHistoryFilter
+from poi.api.parsers import FAST_PARSER_CLASSES
+from poi.api.renderers import FAST_RENDERER_CLASSES
+from poi.histogram import location_presence, state_durations
+from poi.rollups import rollup_histogram
 from utils.dates import days_into_hours
 from vehicle.models import Vehicle
-from telemetry.api.filters import VehicleStateActiveDaysFilter
-from tracker.models import VehicleState
 
 
 class LocationViewSet(ModelViewSet):
     serializer_class = serializers.LocationSerializer
+    renderer_classes = FAST_RENDERER_CLASSES
+    parser_classes = FAST_PARSER_CLASSES
     bbox_filter_field = "area"
     filter_backends = (
         InBBoxFilter,
@@ -24,11 +30,21 @@ class LocationViewSet(ModelViewSet):
     )
     bbox_filter_include_overlapping = True
     filter_class = LocationFilter
+    # most queries a GET may run, checked by poi.tests.query_budget
+    query_budget = {
+        "list": 2,
+        "retrieve": 1,
+        "vehicles": 3,
+        "get_vehicle": 3,
+        "backfill": 2,
+    }
 
     def get_queryset(self):
-        return models.Location.objects.for_customer(
-            local_state.customer
-        ).order_by("name")
+        return (
+            models.Location.objects.for_customer(local_state.customer)
+            .select_related("company", "primary_contact")
+            .order_by("name")
+        )
 
     def perform_create(self, serializer):
         serializer.save(fc_owner=local_state.customer)
@@ -43,12 +59,6 @@ class LocationViewSet(ModelViewSet):
         ).filter(**params)
         return self._filter_qs_by_params(request.GET, l_history)
 
-    @staticmethod
-    def _filter_vehicle_state(lh_qs, params):
-        vehicles = lh_qs.values_list("vehicle", flat=True)
-        vs_qs = VehicleState.objects.filter(vehicle__in=vehicles)
-        return VehicleStateActiveDaysFilter(params, queryset=vs_qs).qs
-
     @staticmethod
     def _prepare_history_context(l_history, request):
         return {"l_history": l_history, "params": request.GET}
@@ -67,31 +77,24 @@ class LocationViewSet(ModelViewSet):
         lower = request.GET.get(lower_qp_name)
         upper = request.GET.get(upper_qp_name)
 
-        # Filter QS
-        l_history = self._filter_location_history({"location": pk}, request)
         hours = days_into_hours(lower, upper)
-        response = {}
-
-        for hour in hours:
-            start = hour["start_datetime"]
-            end = hour["end_datetime"]
-            params = {lower_qp_name: start, upper_qp_name: end}
-            hour_qs = self._filter_qs_by_params(params, l_history)
-            vs_hour_qs = self._filter_vehicle_state(hour_qs, params)
-            _vs_duration = VehicleState.count_states_duration(
-                vs_hour_qs, start, end
+        histogram = rollup_histogram(
+            pk, local_state.customer, request.GET, hours
+        )
+        if histogram is None:
+            # Filter QS
+            l_history = self._filter_location_history(
+                {"location": pk}, request
             )
-
-            response[hour["start"]] = {
-                "entered": hour_qs.entered(start, end).count(),
-                "inside": hour_qs.count(),
-                "exited": hour_qs.exited(start, end).count(),
-                "traveling": _vs_duration["traveling"],
-                "idling": _vs_duration["idling"],
-                "stopped": _vs_duration["stopped"],
-                "towed": _vs_duration["towed"],
-                "total": _vs_duration["total"],
-            }
+            presence = location_presence(l_history, hours)
+            durations = state_durations(l_history, hours)
+            histogram = [
+                {**counts, **seconds}
+                for counts, seconds in zip(presence, durations)
+            ]
+        response = {
+            hour["start"]: row for hour, row in zip(hours, histogram)
+        }
 
         return Response(response)
 
@@ -104,7 +107,10 @@ class LocationViewSet(ModelViewSet):
         # Paginate QS
         page = self.paginate_queryset(data)
         if page is not None:
-            serializer = self._loc_vehicle_serializer(page, l_history, request)
+            # dwell stats of the page only
+            serializer = self._loc_vehicle_serializer(
+                page, l_history.filter(vehicle__in=page), request
+            )
             return self.get_paginated_response(serializer.data)
 
         serializer = self._loc_vehicle_serializer(data, l_history, request)
@@ -122,3 +128,22 @@ class LocationViewSet(ModelViewSet):
             context=self._prepare_history_context(l_history, request),
         )
         return Response(serializer.data)
+
+    @action(detail=True, methods=["GET", "POST"])
+    def backfill(self, request, pk=None):
+        """
+        Progress of the latest history backfill of the location, POST
+        starts a new one.
+        """
+        location = self.get_object()
+        if request.method == "POST":
+            backfill = models.LocationBackfill.start(location)
+            return Response(
+                serializers.LocationBackfillSerializer(backfill).data,
+                status=status.HTTP_202_ACCEPTED,
+            )
+
+        backfill = location.backfills.first()
+        if backfill is None:
+            raise NotFound("The location has no backfill.")
+        return Response(serializers.LocationBackfillSerializer(backfill).data)
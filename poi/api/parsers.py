@@ -0,0 +1,33 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+UTF8_ENCODINGS = ("utf-8", "utf8")
+
+
+class ORJSONParser(JSONParser):
+    """``JSONParser`` backed by orjson for UTF-8 request bodies."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower() not in UTF8_ENCODINGS:
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+FAST_PARSER_CLASSES = [ORJSONParser] + [
+    parser
+    for parser in api_settings.DEFAULT_PARSER_CLASSES
+    if parser not in (JSONParser, ORJSONParser)
+]
@@ -0,0 +1,118 @@
+from django.contrib.gis.geos import GEOSGeometry
+from psycopg2.extras import Range
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders, json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+from poi.tracks import pack_track
+
+# JSONRenderer escapes these for JavaScript compatibility
+LINE_SEPARATORS = (
+    ("\u2028".encode(), b"\\u2028"),
+    ("\u2029".encode(), b"\\u2029"),
+)
+
+_drf_default = encoders.JSONEncoder().default
+
+
+def default(obj):
+    """Types orjson does not handle (or formats differently than DRF)."""
+    if isinstance(obj, GEOSGeometry):
+        return json.loads(obj.geojson)
+    if isinstance(obj, Range):
+        # same keys as RangeField.value_to_string
+        if obj.isempty:
+            return {"empty": True}
+        return {
+            "lower": obj.lower,
+            "upper": obj.upper,
+            "bounds": obj._bounds,
+        }
+    return _drf_default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` output produced by orjson.
+
+    Falls back to ``JSONRenderer`` without orjson and for indented or
+    ASCII-only output.
+    """
+
+    # datetimes go through ``default`` to keep DRF's "Z" suffix
+    options = (
+        0
+        if orjson is None
+        else orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b""
+
+        ret = orjson.dumps(data, default=default, option=self.options)
+        for char, escaped in LINE_SEPARATORS:
+            if char in ret:
+                ret = ret.replace(char, escaped)
+        return ret
+
+
+class TrackJSONRenderer(ORJSONRenderer):
+    """Columnar tracks of ``poi.tracks.track_columns``, ``?format=track``."""
+
+    media_type = "application/vnd.track+json"
+    format = "track"
+
+
+class TrackBinaryRenderer(BaseRenderer):
+    """
+    ``poi.tracks.pack_track`` of columnar tracks, ``?format=track-binary``.
+    Errors, which are not tracks, are rendered as JSON.
+    """
+
+    media_type = "application/vnd.track"
+    format = "track-binary"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and "path" in data:
+            return pack_track(data)
+        return ORJSONRenderer().render(data)
+
+
+# views returning columnar tracks check for these
+TRACK_RENDERER_CLASSES = (TrackJSONRenderer, TrackBinaryRenderer)
+
+FAST_RENDERER_CLASSES = [ORJSONRenderer] + [
+    renderer
+    for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+    if renderer not in (JSONRenderer, ORJSONRenderer)
+]
+
+
+def stream_json_list(chunks, renderer=None):
+    """
+    Bytes of a JSON array of the items of ``chunks``, rendering one chunk at
+    a time for a ``StreamingHttpResponse``.
+    """
+    renderer = renderer or ORJSONRenderer()
+    yield b"["
+    separator = b""
+    for chunk in chunks:
+        if chunk:
+            yield separator + renderer.render(chunk)[1:-1]
+            separator = b","
+    yield b"]"
@@ -4,4 +4,5 @@ from poi.api.serializers.fields import (
 )
 from poi.api.serializers.locations import *
 from poi.api.serializers.location_history import LocationHistorySerializer
+from poi.api.serializers.location_backfill import LocationBackfillSerializer
 from poi.api.serializers.location_vehicle import *
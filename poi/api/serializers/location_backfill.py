@@ -0,0 +1,25 @@
+from rest_framework import serializers
+
+from poi.models import LocationBackfill
+
+
+class LocationBackfillSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = LocationBackfill
+        fields = (
+            "id",
+            "location",
+            "status",
+            "progress",
+            "period_start",
+            "period_end",
+            "vehicles_total",
+            "vehicles_done",
+            "histories_created",
+            "created",
+            "finished",
+            "error",
+        )
+        read_only_fields = fields
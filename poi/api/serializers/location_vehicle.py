@@ -9,24 +9,25 @@ class LocationVehicleSerializer(serializers.ModelSerializer):
         model = Vehicle
         fields = ("id",)
 
-    def _get_total_inside_time(self, qs):
-        params = self.context["params"]
-        start = iso_to_datetime(params.get("duration__range_lower"))
-        end = iso_to_datetime(params.get("duration__range_upper"))
-        duration_in_seconds = 0
-
-        for history in qs:
-            duration_in_seconds += history.duration_in_seconds(start, end)
-        return int(duration_in_seconds)
+    def _get_dwell_stats(self):
+        # one grouped query for every vehicle of l_history
+        if "dwell_stats" not in self.context:
+            params = self.context["params"]
+            stats = self.context["l_history"].dwell_stats(
+                iso_to_datetime(params.get("duration__range_lower")),
+                iso_to_datetime(params.get("duration__range_upper")),
+            )
+            self.context["dwell_stats"] = {row["vehicle_id"]: row for row in stats}
+        return self.context["dwell_stats"]
 
     def to_representation(self, instance):
-        qs = self.context["l_history"].filter(vehicle=instance)
+        stats = self._get_dwell_stats().get(instance.id, {})
 
         return {
             "id": instance.id,
-            "total_inside_time": self._get_total_inside_time(qs),
-            "ingress_count": qs.count(),
-            "egress_count": qs.exclude(duration__endswith=None).count(),
+            "total_inside_time": int(stats.get("total_inside_time", 0)),
+            "ingress_count": stats.get("ingress_count", 0),
+            "egress_count": stats.get("egress_count", 0),
         }
 
 
@@ -0,0 +1,487 @@
+"""
+Set based location containment.
+
+``latest_readings_inside`` finds the vehicles whose latest reading is inside
+an area, reading one index entry per vehicle, and ``enter_location`` moves them in with
+bulk operations: their open histories are closed and new open histories
+created, without the per vehicle ``update_location_history`` and
+``create_location_history`` calls.
+
+``GeofenceEngine`` classifies batches of incoming readings without querying
+the areas: every customer's locations are kept in memory in a shapely
+``STRtree`` of prepared geometries, reloaded when the customer's
+``geofence_version_key`` is bumped by a Location save or delete. The
+enter/exit transitions of a batch are written with bulk operations, closing
+histories before opening new ones and never starting a history before the
+last one of the vehicle ended, as ``allow_only_one_open_history_per_vehicle``
+and ``dont_overlap`` require.
+
+Vehicles keep their state (location and last processed reading) in memory,
+the readings of a vehicle must therefore be processed by a single engine,
+e.g. by partitioning the ingestion by vehicle.
+
+``backfill_vehicle`` replays the past readings of a vehicle against a
+location area and replaces the location's histories of the period with the
+visits found, clipped by the vehicle's histories elsewhere.
+"""
+import typing as t
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import pytz
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Max, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from psycopg2.extras import DateTimeTZRange
+
+try:
+    import shapely
+except ImportError:  # pragma: no cover
+    shapely = None
+
+from poi.models import Location, LocationHistory, schedule_rollup
+from poi.models.location import geofence_version_key
+from poi.models.location_history import RangeLower, RangeUpper
+from telemetry.models.bt.reading import Reading
+from vehicle.models import Vehicle
+
+OUTSIDE = 0
+# end of open intervals in ``subtract_intervals``
+END_OF_TIME = datetime.max.replace(tzinfo=pytz.UTC)
+READINGS_CHUNK_SIZE = 2000
+
+Transition = namedtuple("Transition", "vehicle_id location_id datetime kind")
+
+# latest reading per vehicle, an index lookup each instead of a scan of all
+# the readings of the vehicles
+LATEST_READINGS_SQL = """
+SELECT latest.{pk}
+FROM unnest(%s::bigint[]) AS vehicle(id)
+CROSS JOIN LATERAL (
+    SELECT {pk} FROM {table}
+    WHERE {vehicle} = vehicle.id
+    ORDER BY {datetime} DESC
+    LIMIT 1
+) AS latest
+"""
+
+
+def latest_readings_inside(area, vehicle_ids) -> t.Dict[int, datetime]:
+    """Latest reading datetime of the vehicles last seen inside ``area``."""
+    vehicle_ids = list(vehicle_ids)
+    if not vehicle_ids:
+        return {}
+
+    using = router.db_for_read(Reading)
+    connection = connections[using]
+    opts = Reading._meta
+    sql = LATEST_READINGS_SQL.format(
+        pk=connection.ops.quote_name(opts.pk.column),
+        table=connection.ops.quote_name(opts.db_table),
+        vehicle=connection.ops.quote_name(opts.get_field("vehicle_id").column),
+        datetime=connection.ops.quote_name(opts.get_field("datetime").column),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [vehicle_ids])
+        latest = [pk for pk, in cursor.fetchall()]
+
+    # the default manager of readings takes a vehicle per call
+    return dict(
+        Reading._base_manager.using(using)
+        .filter(pk__in=latest, point__within=area)
+        .values_list("vehicle_id", "datetime")
+    )
+
+
+def enter_location(location, entries: t.Dict[int, datetime]) -> int:
+    """
+    Open histories of ``location`` for the vehicles of ``entries`` from
+    their datetime, closing the histories they have open elsewhere.
+    Vehicles with a history already open at ``location`` (e.g. written by
+    its backfill) are left as they are.
+    """
+    if not entries:
+        return 0
+
+    entries = dict(entries)
+    modified = timezone.now()
+    with transaction.atomic():
+        closing = []
+        for history in LocationHistory.objects.select_for_update().filter(
+            vehicle_id__in=entries, duration__endswith__isnull=True
+        ):
+            if history.location_id == location.pk:
+                del entries[history.vehicle_id]
+            else:
+                closing.append(history)
+        for history in closing:
+            opened = history.duration
+            # never end a history before it started, nor overlap it
+            end = max(entries[history.vehicle_id], opened.lower)
+            entries[history.vehicle_id] = end
+            history.duration = DateTimeTZRange(opened.lower, end)
+            history.modified = modified
+            schedule_rollup(history.location_id, [opened])
+        LocationHistory.objects.bulk_update(closing, ["duration", "modified"])
+
+        created = LocationHistory.objects.bulk_create(
+            LocationHistory(
+                vehicle_id=vehicle_id,
+                location=location,
+                duration=DateTimeTZRange(start, None),
+            )
+            for vehicle_id, start in entries.items()
+        )
+        schedule_rollup(location.pk, [history.duration for history in created])
+    return len(created)
+
+
+class LocationIndex:
+    """STRtree of the prepared areas of a customer's locations."""
+
+    def __init__(self, locations: t.Sequence[tuple]):
+        self.location_ids = np.array(
+            [location_id for location_id, _ in locations], dtype=np.int64
+        )
+        self.geometries = shapely.from_wkb(
+            [bytes(area.wkb) for _, area in locations]
+        )
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+    @classmethod
+    def for_customer(cls, customer_id):
+        return cls(
+            list(
+                Location.objects.filter(fc_owner_id=customer_id).values_list(
+                    "id", "area"
+                )
+            )
+        )
+
+    def locate(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Location id of every point, ``OUTSIDE`` if in none."""
+        located = np.full(len(xs), OUTSIDE, dtype=np.int64)
+        if len(self.location_ids) and len(xs):
+            points, areas = self.tree.query(
+                shapely.points(xs, ys), predicate="within"
+            )
+            located[points] = self.location_ids[areas]
+        return located
+
+
+class GeofenceEngine:
+    """
+    Enter/exit detection of reading batches against in-memory location
+    areas, see the module docstring.
+    """
+
+    def __init__(self):
+        if shapely is None:
+            raise ImproperlyConfigured("The geofence engine needs shapely 2.")
+        self.indexes = {}  # customer id: (version, LocationIndex)
+        self.customers = {}  # vehicle id: customer id
+        self.states = {}  # vehicle id: (location id, last processed epoch)
+
+    def _indexes(self, customer_ids) -> dict:
+        keys = {
+            customer_id: geofence_version_key(customer_id)
+            for customer_id in customer_ids
+        }
+        versions = cache.get_many(list(keys.values()))
+        indexes = {}
+        for customer_id, key in keys.items():
+            version = versions.get(key)
+            cached = self.indexes.get(customer_id)
+            if cached is None or cached[0] != version:
+                cached = (version, LocationIndex.for_customer(customer_id))
+                self.indexes[customer_id] = cached
+            indexes[customer_id] = cached[1]
+        return indexes
+
+    def _customers(self, vehicle_ids) -> np.ndarray:
+        missing = [pk for pk in vehicle_ids if pk not in self.customers]
+        if missing:
+            self.customers.update(
+                Vehicle.objects.filter(id__in=missing).values_list(
+                    "id", "customer_id"
+                )
+            )
+        return np.array(
+            [self.customers.get(pk, 0) for pk in vehicle_ids], dtype=np.int64
+        )
+
+    def _states(self, vehicle_ids) -> t.Tuple[np.ndarray, np.ndarray]:
+        """Current location and epoch of the last change of every vehicle."""
+        missing = [pk for pk in vehicle_ids if pk not in self.states]
+        if missing:
+            histories = (
+                LocationHistory.objects.filter(vehicle_id__in=missing)
+                .order_by()
+                .values("vehicle_id")
+                .annotate(
+                    open_location=Max(
+                        "location_id",
+                        filter=Q(duration__endswith__isnull=True),
+                    ),
+                    since=Max(
+                        Coalesce(
+                            RangeUpper("duration"), RangeLower("duration")
+                        )
+                    ),
+                )
+            )
+            for history in histories:
+                self.states[history["vehicle_id"]] = (
+                    history["open_location"] or OUTSIDE,
+                    history["since"].timestamp(),
+                )
+            for pk in missing:
+                self.states.setdefault(pk, (OUTSIDE, -np.inf))
+        locations, since = zip(*(self.states[pk] for pk in vehicle_ids))
+        return np.array(locations, dtype=np.int64), np.array(since)
+
+    def classify(self, vehicle_ids, timestamps, xs, ys):
+        """
+        Readings sorted by vehicle and time, without the ones older than
+        the vehicle's state, with their location and previous location.
+        """
+        vehicle_ids = np.asarray(vehicle_ids, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=float)
+        xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+        order = np.lexsort((timestamps, vehicle_ids))
+        vehicle_ids, timestamps = vehicle_ids[order], timestamps[order]
+        xs, ys = xs[order], ys[order]
+
+        vehicles, rows = np.unique(vehicle_ids, return_inverse=True)
+        state_locations, since = self._states(vehicles.tolist())
+        fresh = timestamps > since[rows]
+        vehicle_ids, timestamps = vehicle_ids[fresh], timestamps[fresh]
+        xs, ys, rows = xs[fresh], ys[fresh], rows[fresh]
+
+        customers = self._customers(vehicles.tolist())[rows]
+        locations = np.full(len(rows), OUTSIDE, dtype=np.int64)
+        for customer_id, index in self._indexes(
+            set(customers.tolist()) - {0}
+        ).items():
+            mask = customers == customer_id
+            locations[mask] = index.locate(xs[mask], ys[mask])
+
+        previous = np.empty_like(locations)
+        previous[1:] = locations[:-1]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = vehicle_ids[1:] != vehicle_ids[:-1]
+        previous[first] = state_locations[rows[first]]
+        return vehicle_ids, timestamps, locations, previous
+
+    def transitions(
+        self, vehicle_ids, timestamps, xs, ys
+    ) -> t.List[Transition]:
+        """Exits and entries of a batch, in vehicle and time order."""
+        vehicle_ids, timestamps, locations, previous = self.classify(
+            vehicle_ids, timestamps, xs, ys
+        )
+        changes = []
+        for row in np.flatnonzero(locations != previous).tolist():
+            moment = datetime.fromtimestamp(timestamps[row], tz=pytz.UTC)
+            vehicle_id = int(vehicle_ids[row])
+            exited, entered = int(previous[row]), int(locations[row])
+            if exited != OUTSIDE:
+                changes.append(Transition(vehicle_id, exited, moment, "exit"))
+            if entered != OUTSIDE:
+                changes.append(
+                    Transition(vehicle_id, entered, moment, "enter")
+                )
+
+        # vehicles stay where they are until the newest reading of the batch
+        last = np.ones(len(vehicle_ids), dtype=bool)
+        last[:-1] = vehicle_ids[:-1] != vehicle_ids[1:]
+        for vehicle_id, timestamp, location_id in zip(
+            vehicle_ids[last].tolist(),
+            timestamps[last].tolist(),
+            locations[last].tolist(),
+        ):
+            self.states[vehicle_id] = (location_id, timestamp)
+        return changes
+
+    @staticmethod
+    def write(changes: t.Sequence[Transition]) -> int:
+        """Closes and opens the histories of ``changes`` in bulk."""
+        closes = {}  # vehicle id: end of its open history
+        opened = {}  # vehicle id: (location id, start) opened in the batch
+        created = []
+        for change in changes:
+            if change.kind == "enter":
+                opened[change.vehicle_id] = (
+                    change.location_id,
+                    change.datetime,
+                )
+            elif change.vehicle_id in opened:
+                location_id, start = opened.pop(change.vehicle_id)
+                created.append(
+                    LocationHistory(
+                        vehicle_id=change.vehicle_id,
+                        location_id=location_id,
+                        duration=DateTimeTZRange(start, change.datetime),
+                    )
+                )
+            else:
+                closes[change.vehicle_id] = change.datetime
+        created += [
+            LocationHistory(
+                vehicle_id=vehicle_id,
+                location_id=location_id,
+                duration=DateTimeTZRange(start, None),
+            )
+            for vehicle_id, (location_id, start) in opened.items()
+        ]
+
+        modified = timezone.now()
+        with transaction.atomic():
+            closing = list(
+                LocationHistory.objects.select_for_update().filter(
+                    vehicle_id__in=closes, duration__endswith__isnull=True
+                )
+            )
+            for history in closing:
+                schedule_rollup(history.location_id, [history.duration])
+                history.duration = DateTimeTZRange(
+                    history.duration.lower,
+                    max(closes[history.vehicle_id], history.duration.lower),
+                )
+                history.modified = modified
+            LocationHistory.objects.bulk_update(
+                closing, ["duration", "modified"]
+            )
+            LocationHistory.objects.bulk_create(created)
+            for history in created:
+                schedule_rollup(history.location_id, [history.duration])
+        return len(closing) + len(created)
+
+    def process(self, vehicle_ids, timestamps, xs, ys) -> t.List[Transition]:
+        """
+        Transitions of a batch of readings given as columns (epoch seconds,
+        longitudes and latitudes), written to ``LocationHistory``.
+        """
+        snapshot = dict(self.states)
+        changes = self.transitions(vehicle_ids, timestamps, xs, ys)
+        try:
+            self.write(changes)
+        except IntegrityError:
+            # histories written by someone else, start over from the database
+            self.states = snapshot
+            for vehicle_id in {change.vehicle_id for change in changes}:
+                self.states.pop(vehicle_id, None)
+            changes = self.transitions(vehicle_ids, timestamps, xs, ys)
+            self.write(changes)
+        return changes
+
+    def process_readings(self, readings) -> t.List[Transition]:
+        readings = [
+            reading for reading in readings if reading.point is not None
+        ]
+        return self.process(
+            [reading.vehicle_id for reading in readings],
+            [reading.datetime.timestamp() for reading in readings],
+            [reading.point.x for reading in readings],
+            [reading.point.y for reading in readings],
+        )
+
+
+def replay_visits(readings, area) -> t.List[tuple]:
+    """``(start, end)`` of the visits of ``area`` by time ordered readings."""
+    prepared = area.prepared
+    visits = []
+    start = None
+    for reading in readings:
+        if reading.point is None:
+            continue
+        inside = prepared.contains(reading.point)
+        if inside and start is None:
+            start = reading.datetime
+        elif not inside and start is not None:
+            visits.append((start, reading.datetime))
+            start = None
+    if start is not None:
+        # still inside at the last reading
+        visits.append((start, None))
+    return visits
+
+
+def subtract_intervals(intervals, others) -> t.List[tuple]:
+    """Parts of ``intervals`` not in ``others``, ``None`` ends are open."""
+    others = [(lower, upper or END_OF_TIME) for lower, upper in others]
+    result = []
+    for start, end in intervals:
+        pieces = [(start, end or END_OF_TIME)]
+        for lower, upper in others:
+            pieces = [
+                piece
+                for piece_start, piece_end in pieces
+                for piece in (
+                    (piece_start, min(piece_end, lower)),
+                    (max(piece_start, upper), piece_end),
+                )
+                if piece[0] < piece[1]
+            ]
+        result += [
+            (piece_start, None if piece_end == END_OF_TIME else piece_end)
+            for piece_start, piece_end in pieces
+        ]
+    return result
+
+
+def backfill_vehicle(location, vehicle_id, start, end) -> int:
+    """
+    Replaces the histories of ``location`` started between ``start`` and
+    ``end`` by the visits replayed from the readings of the vehicle. Later
+    histories, written by ingestion since, are kept and clip the visits.
+    """
+    readings = Reading.objects.sorted_range(
+        lower=dict(vehicle_id=vehicle_id, datetime=start),
+        upper=dict(vehicle_id=vehicle_id, datetime=end),
+    ).iterator(chunk_size=READINGS_CHUNK_SIZE)
+    visits = replay_visits(readings, location.area)
+
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                existing = list(
+                    LocationHistory.objects.select_for_update()
+                    .filter(
+                        Q(duration__endswith__isnull=True)
+                        | Q(duration__endswith__gt=start),
+                        vehicle_id=vehicle_id,
+                    )
+                    .values_list("pk", "location_id", "duration")
+                )
+                replaced = [
+                    pk
+                    for pk, location_id, duration in existing
+                    if location_id == location.pk
+                    and start <= duration.lower < end
+                ]
+                others = [
+                    (duration.lower, duration.upper)
+                    for pk, _, duration in existing
+                    if pk not in replaced
+                ]
+                LocationHistory.objects.filter(pk__in=replaced).delete()
+                created = LocationHistory.objects.bulk_create(
+                    LocationHistory(
+                        vehicle_id=vehicle_id,
+                        location=location,
+                        duration=DateTimeTZRange(lower, upper),
+                        created_by_replace=True,
+                    )
+                    for lower, upper in subtract_intervals(visits, others)
+                )
+            return len(created)
+        except IntegrityError:
+            # histories written meanwhile (e.g. by ingestion), reconcile again
+            if attempt:
+                raise
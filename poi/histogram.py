@@ -0,0 +1,182 @@
+"""
+Hourly histogram of a location.
+
+``location_presence`` counts the histories entering, inside and exiting each
+hour bucket in one statement: the buckets are unnested from two arrays and
+joined against the history ranges that overlap them, so the number of
+queries does not grow with the length of the period.
+
+``state_durations`` loads the histories and vehicle states of the whole
+period once and clips every state against the buckets it spans with NumPy,
+instead of ``VehicleState.count_states_duration`` per hour.
+"""
+import typing as t
+
+import numpy as np
+from django.db import connections, router
+from django.utils import timezone
+from psycopg2.extras import DateTimeTZRange
+
+from poi.models import LocationHistory
+from tracker.models import VehicleState
+
+STATE_TYPES = ("traveling", "idling", "stopped", "towed")
+# (state, bucket) pairs clipped at once, bounds the memory of long periods
+STATE_BUCKETS_CHUNK_SIZE = 200000
+
+PRESENCE_SQL = """
+SELECT
+    COUNT(history.id) FILTER (
+        WHERE lower(history.duration) BETWEEN bucket.start AND bucket.end
+    ) AS entered,
+    COUNT(history.id) AS inside,
+    COUNT(history.id) FILTER (
+        WHERE upper(history.duration) BETWEEN bucket.start AND bucket.end
+    ) AS exited,
+    COALESCE(SUM(EXTRACT(EPOCH FROM
+        LEAST(COALESCE(upper(history.duration), now()), bucket.end)
+        - GREATEST(lower(history.duration), bucket.start)
+    )), 0) AS occupancy
+FROM unnest(%s::timestamptz[], %s::timestamptz[])
+    WITH ORDINALITY AS bucket (start, "end", position)
+LEFT JOIN ({history}) AS history
+    ON history.duration && tstzrange(bucket.start, bucket.end)
+GROUP BY bucket.position
+ORDER BY bucket.position
+"""
+
+
+def location_presence(
+    l_history, hours: t.Sequence[dict], occupancy: bool = False
+) -> t.List[dict]:
+    """
+    ``entered``, ``inside`` and ``exited`` counts of ``l_history`` per hour
+    of ``days_into_hours``, like ``entered()``, ``count()`` and ``exited()``
+    of the history filtered by each hour. With ``occupancy``, also the
+    seconds inside of all the histories clipped to the hour.
+    """
+    if not hours:
+        return []
+
+    history_sql, history_params = (
+        l_history.order_by().values("id", "duration").query.sql_with_params()
+    )
+    starts = [hour["start_datetime"] for hour in hours]
+    ends = [hour["end_datetime"] for hour in hours]
+    with connections[router.db_for_read(LocationHistory)].cursor() as cursor:
+        cursor.execute(
+            PRESENCE_SQL.format(history=history_sql),
+            [starts, ends, *history_params],
+        )
+        presence = []
+        for entered, inside, exited, seconds in cursor.fetchall():
+            counts = {"entered": entered, "inside": inside, "exited": exited}
+            if occupancy:
+                counts["occupancy"] = int(seconds)
+            presence.append(counts)
+        return presence
+
+
+def _seconds(datetimes, default=np.inf) -> np.ndarray:
+    """Epoch seconds, ``default`` for missing (open) bounds."""
+    return np.array(
+        [default if value is None else value.timestamp() for value in datetimes],
+        dtype=float,
+    )
+
+
+def _vehicles_inside(l_history, starts, ends) -> t.Tuple[list, np.ndarray]:
+    """Vehicles of ``l_history`` and whether each has a history in each bucket."""
+    histories = list(l_history.order_by().values_list("vehicle_id", "duration"))
+    vehicle_ids = sorted({vehicle_id for vehicle_id, _ in histories})
+    index = {vehicle_id: i for i, vehicle_id in enumerate(vehicle_ids)}
+
+    inside = np.zeros((len(vehicle_ids), len(starts)), dtype=bool)
+    if histories:
+        vehicles = np.array([index[vehicle_id] for vehicle_id, _ in histories])
+        lower = _seconds((duration.lower for _, duration in histories), -np.inf)
+        upper = _seconds(duration.upper for _, duration in histories)
+        overlaps = (lower[:, None] < ends) & (upper[:, None] > starts)
+        np.logical_or.at(inside, vehicles, overlaps)
+    return vehicle_ids, inside
+
+
+def _state_buckets(states, counts, first) -> t.Tuple[np.ndarray, np.ndarray]:
+    """``states`` paired with each of the ``counts`` buckets from ``first``."""
+    counts = counts[states]
+    state = np.repeat(states, counts)
+    offsets = np.arange(len(state)) - np.repeat(
+        np.cumsum(counts) - counts, counts
+    )
+    return state, first[state] + offsets
+
+
+def state_durations(l_history, hours: t.Sequence[dict]) -> t.List[dict]:
+    """
+    Seconds per vehicle state type (and in total) of the vehicles inside
+    during each hour of ``days_into_hours``, with the states clipped to the
+    hour like ``VehicleState.count_states_duration``.
+    """
+    if not hours:
+        return []
+
+    starts = _seconds(hour["start_datetime"] for hour in hours)
+    ends = _seconds(hour["end_datetime"] for hour in hours)
+    vehicle_ids, inside = _vehicles_inside(l_history, starts, ends)
+    seconds = np.zeros((len(STATE_TYPES) + 1, len(hours)))
+
+    if vehicle_ids:
+        states = list(
+            VehicleState.objects.filter(
+                vehicle__in=vehicle_ids,
+                duration__overlap=DateTimeTZRange(
+                    hours[0]["start_datetime"], hours[-1]["end_datetime"]
+                ),
+            )
+            .order_by()
+            .values_list("vehicle_id", "duration", "type")
+        )
+        index = {vehicle_id: i for i, vehicle_id in enumerate(vehicle_ids)}
+        codes = {
+            getattr(VehicleState.TYPES, name): code
+            for code, name in enumerate(STATE_TYPES)
+        }
+        now = timezone.now().timestamp()
+
+        vehicles = np.array(
+            [index[vehicle_id] for vehicle_id, _, _ in states], dtype=int
+        )
+        lower = _seconds(
+            (duration.lower for _, duration, _ in states), -np.inf
+        )
+        # ongoing states last until now
+        upper = _seconds((duration.upper for _, duration, _ in states), now)
+        state_codes = np.array(
+            [codes.get(state_type, -1) for _, _, state_type in states],
+            dtype=int,
+        )
+
+        # buckets are contiguous and sorted: a state spans the buckets from
+        # the first ending after it starts to the last starting before it ends
+        first = np.searchsorted(ends, lower, side="right")
+        counts = np.maximum(np.searchsorted(starts, upper) - first, 0)
+        chunks = (np.cumsum(counts) - counts) // STATE_BUCKETS_CHUNK_SIZE
+        for chunk in np.split(
+            np.arange(len(states)), np.flatnonzero(np.diff(chunks)) + 1
+        ):
+            state, bucket = _state_buckets(chunk, counts, first)
+            clipped = np.minimum(upper[state], ends[bucket]) - np.maximum(
+                lower[state], starts[bucket]
+            )
+            clipped = np.clip(clipped, 0, None)
+            clipped *= inside[vehicles[state], bucket]
+            code = state_codes[state]
+            known = code >= 0
+            np.add.at(seconds, (code[known], bucket[known]), clipped[known])
+            np.add.at(seconds[-1], bucket, clipped)
+
+    names = (*STATE_TYPES, "total")
+    return [
+        {name: int(value) for name, value in zip(names, bucket)}
+        for bucket in seconds.T
+    ]
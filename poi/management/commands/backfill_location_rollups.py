@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from poi.models import Location
+from poi.rollups import finalized_until, rollup_period
+
+
+class Command(BaseCommand):
+    help = "Compute the hourly location rollups of the past days."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=30, help="Days to roll up."
+        )
+        parser.add_argument(
+            "--location",
+            type=int,
+            action="append",
+            default=[],
+            help="Roll up only these locations.",
+        )
+        parser.add_argument(
+            "--window",
+            type=int,
+            default=24,
+            help="Hours rolled up at once per location.",
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] < 1 or options["window"] < 1:
+            raise CommandError("--days and --window must be positive.")
+
+        locations = Location.objects.all()
+        if options["location"]:
+            locations = locations.filter(id__in=options["location"])
+
+        end = finalized_until(timezone.now())
+        start = end - timedelta(days=options["days"])
+        window = timedelta(hours=options["window"])
+        count = 0
+        while start < end:
+            window_end = min(start + window, end)
+            count += rollup_period(start, window_end, locations)
+            self.stdout.write(f"{window_end.isoformat()}: {count} rollups")
+            start = window_end
+        self.stdout.write(f"Stored {count} rollups.")
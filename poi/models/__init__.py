@@ -5,3 +5,8 @@ from poi.models.location_type import (
 )
 from poi.models.location import Location, LocationQuerySet
 from poi.models.location_history import LocationHistory
+from poi.models.location_rollup import LocationHourlyRollup, schedule_rollup
+from poi.models.location_backfill import (
+    BACKFILL_STATUS,
+    LocationBackfill,
+)
@@ -6,11 +6,12 @@ from django.contrib.postgres.validators import (
     RangeMinValueValidator,
     RangeMaxValueValidator,
 )
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.db.models import QuerySet
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from model_utils.models import TimeStampedModel
 from psycopg2._range import NumericRange
@@ -22,6 +23,8 @@ from poi.models import LocationType
 from utils.images import AutoRotateImageField
 from utils.storage import PublicMediaStorage, customer_upload_to
 
+GEOFENCE_VERSION_KEY = "poi:geofence-version:{customer_id}"
+
 
 class LocationQuerySet(QuerySet):
     def for_customer(self, customer: Customer):
@@ -103,15 +106,26 @@ class Location(TimeStampedModel):
 @receiver(post_save, sender=Location)
 def create_lh_for_vehicles_inside(sender, instance, created, **kwargs):
     if created:
-        for vehicle in instance.fc_owner.vehicles.all():
-            reading = vehicle.last_reading
-
-            # Check if any vehicle inside new Location
-            if reading and instance.area.contains(reading.point):
-                # End prev LH if exists
-                vehicle.update_location_history(end_datetime=reading.datetime)
-
-                # Create new LH
-                vehicle.create_location_history(
-                    location=instance, start_datetime=reading.datetime
-                )
+        from poi.tasks import create_histories_inside_location
+
+        # one spatial query and bulk writes, after the location is committed
+        transaction.on_commit(
+            lambda: create_histories_inside_location.delay(instance.pk)
+        )
+
+
+def geofence_version_key(customer_id) -> str:
+    return GEOFENCE_VERSION_KEY.format(customer_id=customer_id)
+
+
+def bump_geofence_version(customer_id):
+    """Makes in-memory geofences of the customer (``poi.geofence``) reload."""
+    key = geofence_version_key(customer_id)
+    cache.add(key, 1, None)
+    cache.incr(key)
+
+
+@receiver((post_save, post_delete), sender=Location)
+def invalidate_geofences(sender, instance, **kwargs):
+    customer_id = instance.fc_owner_id
+    transaction.on_commit(lambda: bump_geofence_version(customer_id))
@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from model_utils import Choices
+from model_utils.models import TimeStampedModel
+
+from poi.models import Location
+
+BACKFILL_STATUS = Choices(
+    ("pending", "Pending"),
+    ("running", "Running"),
+    ("done", "Done"),
+    ("failed", "Failed"),
+    ("cancelled", "Cancelled"),
+)
+
+
+def backfill_days() -> int:
+    return getattr(settings, "LOCATION_BACKFILL_DAYS", 30)
+
+
+class LocationBackfill(TimeStampedModel):
+    """
+    Replay of the readings of a location owner's vehicles against the
+    location area, rebuilding its histories of the period
+    (``poi.tasks.start_location_backfill``).
+    """
+
+    location = models.ForeignKey(
+        Location, related_name="backfills", on_delete=models.CASCADE
+    )
+    status = models.CharField(
+        max_length=16, choices=BACKFILL_STATUS, default=BACKFILL_STATUS.pending
+    )
+    period_start = models.DateTimeField()
+    period_end = models.DateTimeField()
+    vehicles_total = models.PositiveIntegerField(default=0)
+    vehicles_done = models.PositiveIntegerField(default=0)
+    histories_created = models.PositiveIntegerField(default=0)
+    finished = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+
+    class Meta:
+        ordering = ("-created",)
+
+    def __str__(self):
+        return f"Location backfill {self.pk} - {self.location_id}"
+
+    @property
+    def progress(self) -> float:
+        if self.status == BACKFILL_STATUS.done:
+            return 1.0
+        if not self.vehicles_total:
+            return 0.0
+        return self.vehicles_done / self.vehicles_total
+
+    @classmethod
+    def start(cls, location, days: int = None) -> "LocationBackfill":
+        """New backfill of ``location``, cancelling the unfinished ones."""
+        from poi.tasks import start_location_backfill
+
+        now = timezone.now()
+        with transaction.atomic():
+            cls.objects.filter(
+                location=location,
+                status__in=(BACKFILL_STATUS.pending, BACKFILL_STATUS.running),
+            ).update(status=BACKFILL_STATUS.cancelled, finished=now)
+            backfill = cls.objects.create(
+                location=location,
+                period_start=now - timedelta(days=days or backfill_days()),
+                period_end=now,
+            )
+            transaction.on_commit(
+                lambda: start_location_backfill.delay(backfill.pk)
+            )
+        return backfill
+
+
+@receiver(pre_save, sender=Location)
+def remember_previous_area(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = (
+            Location.objects.filter(pk=instance.pk)
+            .values("area", "radius")
+            .first()
+        )
+    instance._backfill_previous = previous
+
+
+@receiver(post_save, sender=Location)
+def backfill_changed_area(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_backfill_previous", None)
+    if created or (
+        previous
+        and (
+            previous["area"] != instance.area
+            or previous["radius"] != instance.radius
+        )
+    ):
+        LocationBackfill.start(instance)
@@ -3,6 +3,8 @@ from django.contrib.postgres.constraints import ExclusionConstraint
 from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Count, DateTimeField, FloatField, Func, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least, Now
 from django.utils import timezone
 from model_utils.models import TimeStampedModel
 
@@ -11,6 +13,23 @@ from poi.models import Location
 from vehicle.models import Vehicle
 
 
+class RangeLower(Func):
+    function = "LOWER"
+    output_field = DateTimeField()
+
+
+class RangeUpper(Func):
+    function = "UPPER"
+    output_field = DateTimeField()
+
+
+class Epoch(Func):
+    """Seconds of an interval."""
+
+    template = "EXTRACT(EPOCH FROM %(expressions)s)"
+    output_field = FloatField()
+
+
 class LocationHistoryQuerySet(models.QuerySet):
     def for_customer(self, customer: Customer):
         return self.filter(location__fc_owner=customer)
@@ -21,6 +40,33 @@ class LocationHistoryQuerySet(models.QuerySet):
     def exited(self, start, end):
         return self.filter(duration__endswith__range=(start, end))
 
+    def dwell_stats(self, start=None, end=None):
+        """
+        Per vehicle: seconds inside with every history clipped to
+        ``start``/``end`` like ``duration_in_seconds``, ingress and egress
+        counts.
+        """
+        lower = RangeLower("duration")
+        if start:
+            lower = Greatest(lower, Value(start, output_field=DateTimeField()))
+        upper = Coalesce(RangeUpper("duration"), Now())
+        if end:
+            upper = Least(upper, Value(end, output_field=DateTimeField()))
+
+        return (
+            self.order_by()
+            .values("vehicle_id")
+            .annotate(
+                total_inside_time=Coalesce(
+                    Sum(Greatest(Epoch(upper - lower), Value(0.0))), Value(0.0)
+                ),
+                ingress_count=Count("id"),
+                egress_count=Count(
+                    "id", filter=Q(duration__endswith__isnull=False)
+                ),
+            )
+        )
+
 
 class LocationHistory(TimeStampedModel):
     duration = DateTimeRangeField()
@@ -0,0 +1,100 @@
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from poi.models import Location, LocationHistory
+
+
+class LocationHourlyRollup(models.Model):
+    """
+    Histogram of a location for one finalized hour, of all its vehicles
+    (empty ``vehicle_group``) or of the vehicles of one group.
+
+    Rows of all vehicles are stored for every rolled up hour, even when
+    nobody was inside, so that they tell which hours are covered; rows of a
+    group only when one of its vehicles was inside.
+    """
+
+    location = models.ForeignKey(
+        Location, related_name="hourly_rollups", on_delete=models.CASCADE
+    )
+    vehicle_group = models.CharField(max_length=64, blank=True, default="")
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+
+    entered = models.PositiveIntegerField(default=0)
+    inside = models.PositiveIntegerField(default=0)
+    exited = models.PositiveIntegerField(default=0)
+    occupancy = models.PositiveIntegerField(
+        default=0, help_text="Seconds inside of all the histories"
+    )
+    traveling = models.PositiveIntegerField(default=0)
+    idling = models.PositiveIntegerField(default=0)
+    stopped = models.PositiveIntegerField(default=0)
+    towed = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("start",)
+        constraints = [
+            models.UniqueConstraint(
+                name="unique_location_hourly_rollup",
+                fields=["location", "vehicle_group", "start"],
+            ),
+        ]
+
+    def __str__(self):
+        return f"Location rollup {self.location_id} - {self.start}"
+
+
+def schedule_rollup(location_id, durations):
+    """Roll up again the hours of ``durations`` once the change is committed."""
+    from poi.tasks import update_location_rollups
+
+    durations = [duration for duration in durations if duration]
+    lowers = [duration.lower for duration in durations if duration.lower]
+    if not lowers:
+        return
+    uppers = [duration.upper for duration in durations]
+    # an open history has been counted in every finalized hour until now
+    end = timezone.now() if None in uppers else max(uppers)
+    start = min(lowers)
+    transaction.on_commit(
+        lambda: update_location_rollups.delay(
+            location_id, start.isoformat(), end.isoformat()
+        )
+    )
+
+
+@receiver(pre_save, sender=LocationHistory)
+def remember_previous_location_history(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = (
+            LocationHistory.objects.filter(pk=instance.pk)
+            .values("location_id", "duration")
+            .first()
+        )
+    instance._rollup_previous = previous
+
+
+@receiver(post_save, sender=LocationHistory)
+def rollup_saved_location_history(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_rollup_previous", None)
+    if previous and previous["location_id"] != instance.location_id:
+        schedule_rollup(previous["location_id"], [previous["duration"]])
+        previous = None
+    schedule_rollup(
+        instance.location_id,
+        [instance.duration, previous and previous["duration"]],
+    )
+
+
+@receiver(post_delete, sender=LocationHistory)
+def rollup_deleted_location_history(sender, instance, **kwargs):
+    schedule_rollup(instance.location_id, [instance.duration])
@@ -0,0 +1,204 @@
+"""
+Hourly rollups of the location histograms.
+
+``rollup_location`` computes the histogram of finalized hours (hours that
+ended before the current one) with ``poi.histogram``, for all the vehicles
+and for every vehicle group that was inside, and stores it in
+``LocationHourlyRollup``. Rollups are kept up to date:
+
+- when a history is saved or deleted, for the hours it covers
+  (``poi.tasks.update_location_rollups``),
+- every hour, for the hours that just ended (``poi.tasks.rollup_last_hour``),
+  which counts the histories that are still open,
+- for the past, by the ``backfill_location_rollups`` command.
+
+Vehicle states and vehicle groups only reach the rollups through these
+runs: the hourly task rolls up the last ``LOCATION_ROLLUP_TRAILING_HOURS``
+again, a state or group change of an older hour is not counted until the
+command is run for it.
+
+``rollup_histogram`` answers a histogram request from the rollups when all
+its hours are covered, and returns ``None`` otherwise so that the histogram
+is computed from the histories.
+"""
+import typing as t
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from psycopg2.extras import DateTimeTZRange
+
+from poi.histogram import STATE_TYPES, location_presence, state_durations
+from poi.models import Location, LocationHistory, LocationHourlyRollup
+from utils.dates import days_into_hours
+
+ROLLUP_FIELDS = ("entered", "inside", "exited", *STATE_TYPES, "total")
+# histogram parameters the rollups can answer
+ROLLUP_PARAMS = {
+    "duration__range_lower",
+    "duration__range_upper",
+    "vehicle_group",
+    "format",
+}
+HOUR = timedelta(hours=1)
+
+
+def finalized_until(now: datetime = None) -> datetime:
+    """End of the last finalized hour."""
+    return (now or timezone.now()).replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_hours(start: datetime, end: datetime) -> t.List[dict]:
+    """``days_into_hours`` of the finalized hours between ``start`` and ``end``."""
+    until = finalized_until()
+    start = finalized_until(start)
+    end = min(finalized_until(end - timedelta(microseconds=1)) + HOUR, until)
+    if start >= end:
+        return []
+    hours = days_into_hours(
+        start.strftime("%Y-%m-%dT%H:%M:%S"), end.strftime("%Y-%m-%dT%H:%M:%S")
+    )
+    return [hour for hour in hours if hour["end_datetime"] <= until]
+
+
+def _rollups(location_id, vehicle_group, l_history, hours, keep_empty):
+    presence = location_presence(l_history, hours, occupancy=True)
+    durations = state_durations(l_history, hours)
+    return [
+        LocationHourlyRollup(
+            location_id=location_id,
+            vehicle_group=vehicle_group,
+            start=hour["start_datetime"],
+            end=hour["end_datetime"],
+            **counts,
+            **seconds,
+        )
+        for hour, counts, seconds in zip(hours, presence, durations)
+        if keep_empty or counts["inside"]
+    ]
+
+
+def rollup_location(location_id: int, start: datetime, end: datetime) -> int:
+    """Store the rollups of the finalized hours between ``start`` and ``end``."""
+    hours = rollup_hours(start, end)
+    if not hours:
+        return 0
+
+    with transaction.atomic():
+        # runs of a location are serialized and compute inside the lock, so
+        # the last one to commit has read the latest histories and states
+        locked = Location.objects.select_for_update().filter(pk=location_id)
+        if not locked.values_list("pk", flat=True):
+            return 0
+        rollups = _location_rollups(location_id, hours)
+        LocationHourlyRollup.objects.filter(
+            location_id=location_id,
+            start__gte=hours[0]["start_datetime"],
+            start__lte=hours[-1]["start_datetime"],
+        ).delete()
+        LocationHourlyRollup.objects.bulk_create(rollups)
+    return len(rollups)
+
+
+def _location_rollups(location_id, hours) -> t.List[LocationHourlyRollup]:
+    l_history = LocationHistory.objects.filter(location_id=location_id)
+    period = l_history.filter(
+        duration__overlap=DateTimeTZRange(
+            hours[0]["start_datetime"], hours[-1]["end_datetime"]
+        )
+    )
+    groups = sorted(
+        {
+            str(group)
+            for group in period.exclude(vehicle__groups=None)
+            .order_by()
+            .values_list("vehicle__groups", flat=True)
+            .distinct()
+        }
+    )
+
+    rollups = _rollups(location_id, "", l_history, hours, keep_empty=True)
+    for group in groups:
+        rollups += _rollups(
+            location_id,
+            group,
+            l_history.filter(vehicle__groups=group),
+            hours,
+            keep_empty=False,
+        )
+    return rollups
+
+
+def rollup_empty_locations(location_ids, start: datetime, end: datetime) -> int:
+    """Store empty rollups for locations without histories in the period."""
+    hours = rollup_hours(start, end)
+    rollups = [
+        LocationHourlyRollup(
+            location_id=location_id,
+            start=hour["start_datetime"],
+            end=hour["end_datetime"],
+        )
+        for location_id in location_ids
+        for hour in hours
+    ]
+    if rollups:
+        LocationHourlyRollup.objects.bulk_create(
+            rollups, ignore_conflicts=True
+        )
+    return len(rollups)
+
+
+def rollup_period(start: datetime, end: datetime, locations=None) -> int:
+    """Rollups of every location (or of ``locations``) between ``start`` and ``end``."""
+    locations = Location.objects.all() if locations is None else locations
+    location_ids = set(locations.values_list("id", flat=True))
+    active = set(
+        LocationHistory.objects.filter(
+            Q(duration__endswith__isnull=True) | Q(duration__endswith__gt=start),
+            location__in=location_ids,
+            duration__startswith__lt=end,
+        )
+        .order_by()
+        .values_list("location_id", flat=True)
+        .distinct()
+    )
+    count = rollup_empty_locations(location_ids - active, start, end)
+    for location_id in sorted(active):
+        count += rollup_location(location_id, start, end)
+    return count
+
+
+def rollup_histogram(location_id, customer, params, hours: t.Sequence[dict]):
+    """
+    Histogram rows of ``hours`` from the rollups of a location of
+    ``customer``, ``None`` unless the request can be answered by the rollups
+    and every hour is rolled up.
+    """
+    if not hours or set(params) - ROLLUP_PARAMS:
+        return None
+    if hours[-1]["end_datetime"] > finalized_until():
+        return None
+
+    vehicle_group = params.get("vehicle_group", "")
+    rollups = LocationHourlyRollup.objects.filter(
+        location_id=location_id,
+        location__fc_owner=customer,
+        vehicle_group__in={"", vehicle_group},
+        start__gte=hours[0]["start_datetime"],
+        start__lte=hours[-1]["start_datetime"],
+    ).values("vehicle_group", "start", "end", *ROLLUP_FIELDS)
+    by_hour = {
+        (rollup["vehicle_group"], rollup["start"], rollup["end"]): rollup
+        for rollup in rollups
+    }
+
+    histogram = []
+    empty = dict.fromkeys(ROLLUP_FIELDS, 0)
+    for hour in hours:
+        key = (hour["start_datetime"], hour["end_datetime"])
+        if ("", *key) not in by_hour:
+            return None
+        rollup = by_hour.get((vehicle_group, *key), empty)
+        histogram.append({name: rollup[name] for name in ROLLUP_FIELDS})
+    return histogram
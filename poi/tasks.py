@@ -0,0 +1,153 @@
+from datetime import datetime
+
+from celery import group, shared_task
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from psycopg2.extras import DateTimeTZRange
+
+from poi.geofence import (
+    backfill_vehicle,
+    enter_location,
+    latest_readings_inside,
+)
+from poi.models import (
+    BACKFILL_STATUS,
+    Location,
+    LocationBackfill,
+    schedule_rollup,
+)
+from poi.rollups import HOUR, finalized_until, rollup_location, rollup_period
+from poi.tracks import chunked
+
+
+@shared_task(ignore_result=True)
+def update_location_rollups(location_id: int, start: str, end: str):
+    """Roll up again the finalized hours of a location touched by a history."""
+    if not Location.objects.filter(pk=location_id).exists():
+        return 0
+    return rollup_location(
+        location_id, datetime.fromisoformat(start), datetime.fromisoformat(end)
+    )
+
+
+def rollup_trailing_hours() -> int:
+    return getattr(settings, "LOCATION_ROLLUP_TRAILING_HOURS", 6)
+
+
+@shared_task(ignore_result=True)
+def rollup_last_hour():
+    """
+    Roll up the hours that just ended for every location, to be scheduled
+    hourly with celery beat a few minutes past the hour.
+
+    The trailing hours are rolled up again so that vehicle states and group
+    changes ingested late are counted.
+    """
+    end = finalized_until(timezone.now())
+    return rollup_period(end - HOUR * rollup_trailing_hours(), end)
+
+
+@shared_task(ignore_result=True)
+def create_histories_inside_location(location_id: int):
+    """Open histories of a new location for the vehicles last seen inside."""
+    location = (
+        Location.objects.filter(pk=location_id)
+        .select_related("fc_owner")
+        .first()
+    )
+    if location is None:
+        return 0
+    vehicle_ids = location.fc_owner.vehicles.values_list("id", flat=True)
+    return enter_location(
+        location, latest_readings_inside(location.area, vehicle_ids)
+    )
+
+
+def backfill_chunk_size() -> int:
+    return getattr(settings, "LOCATION_BACKFILL_CHUNK_SIZE", 50)
+
+
+def _finish_backfill(backfill_id: int):
+    finished = LocationBackfill.objects.filter(
+        pk=backfill_id,
+        status=BACKFILL_STATUS.running,
+        vehicles_done__gte=F("vehicles_total"),
+    ).update(status=BACKFILL_STATUS.done, finished=timezone.now())
+    if finished:
+        backfill = LocationBackfill.objects.get(pk=backfill_id)
+        schedule_rollup(
+            backfill.location_id,
+            [DateTimeTZRange(backfill.period_start, None)],
+        )
+
+
+@shared_task(ignore_result=True)
+def start_location_backfill(backfill_id: int):
+    """Backfill of a location, a task per chunk of the owner's vehicles."""
+    backfill = (
+        LocationBackfill.objects.filter(
+            pk=backfill_id, status=BACKFILL_STATUS.pending
+        )
+        .select_related("location__fc_owner")
+        .first()
+    )
+    if backfill is None:
+        return
+    vehicle_ids = list(
+        backfill.location.fc_owner.vehicles.order_by("id").values_list(
+            "id", flat=True
+        )
+    )
+    LocationBackfill.objects.filter(pk=backfill_id).update(
+        status=BACKFILL_STATUS.running,
+        vehicles_total=len(vehicle_ids),
+        modified=timezone.now(),
+    )
+    if not vehicle_ids:
+        _finish_backfill(backfill_id)
+        return
+    group(
+        backfill_location_vehicles.s(backfill_id, chunk)
+        for chunk in chunked(vehicle_ids, backfill_chunk_size())
+    ).apply_async()
+
+
+@shared_task(ignore_result=True, acks_late=True)
+def backfill_location_vehicles(backfill_id: int, vehicle_ids: list):
+    """Replays the readings of ``vehicle_ids`` for a running backfill."""
+    backfill = (
+        LocationBackfill.objects.filter(
+            pk=backfill_id, status=BACKFILL_STATUS.running
+        )
+        .select_related("location")
+        .first()
+    )
+    if backfill is None:
+        # cancelled by a newer backfill or failed
+        return 0
+
+    created = 0
+    try:
+        for vehicle_id in vehicle_ids:
+            created += backfill_vehicle(
+                backfill.location,
+                vehicle_id,
+                backfill.period_start,
+                backfill.period_end,
+            )
+    except Exception as error:
+        LocationBackfill.objects.filter(pk=backfill_id).update(
+            status=BACKFILL_STATUS.failed,
+            error=repr(error),
+            finished=timezone.now(),
+        )
+        raise
+
+    LocationBackfill.objects.filter(pk=backfill_id).update(
+        vehicles_done=F("vehicles_done") + len(vehicle_ids),
+        histories_created=F("histories_created") + created,
+        modified=timezone.now(),
+    )
+    _finish_backfill(backfill_id)
+    return created
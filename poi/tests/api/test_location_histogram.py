@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+import pytz
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from psycopg2._range import DateTimeTZRange
+
+from authentication.baker_recipes import UserRecipe
+from core.local import local_state
+from core.tests.base import FCTestCase
+from poi.api.filters import LocationHistoryFilter
+from poi.baker_recipes import LocationHistoryRecipe, LocationRecipe
+from poi.histogram import location_presence, state_durations
+from poi.models import LocationHistory
+from telemetry.api.filters import VehicleStateActiveDaysFilter
+from tracker.baker_recipes import vehicle_state_recipe
+from tracker.models import VehicleState
+from utils.dates import days_into_hours
+from vehicle.baker_recipes import VehicleRecipe
+
+
+class LocationHistogramTestCase(FCTestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        super().setUp()
+
+        self.user = UserRecipe.make()
+        local_state.customer = self.user.customer
+        self.location = LocationRecipe.make(fc_owner=self.user.customer)
+        self.start = datetime(2020, 1, 1, 10, 5, tzinfo=pytz.UTC)
+        durations = [
+            (self.start, self.start + timedelta(hours=1)),
+            (self.start + timedelta(minutes=20), self.start + timedelta(hours=3)),
+            (self.start + timedelta(hours=5), None),
+        ]
+        states = [
+            (VehicleState.TYPES.stopped, timedelta(minutes=65)),
+            (VehicleState.TYPES.traveling, timedelta(minutes=85)),
+            (VehicleState.TYPES.idling, timedelta(hours=4)),
+        ]
+        for (lower, upper), (state_type, state_duration) in zip(durations, states):
+            vehicle = VehicleRecipe.make(customer=self.user.customer)
+            LocationHistoryRecipe.make(
+                vehicle=vehicle,
+                location=self.location,
+                duration=DateTimeTZRange(lower, upper),
+            )
+            vehicle_state_recipe(
+                vehicle, lower, duration=state_duration, type=state_type
+            ).make()
+        self.l_history = LocationHistory.objects.for_customer(
+            self.user.customer
+        ).filter(location=self.location)
+        self.hours = days_into_hours(
+            self.start.strftime("%Y-%m-%dT%H:%M:%S"),
+            (self.start + timedelta(hours=8)).strftime("%Y-%m-%dT%H:%M:%S"),
+        )
+
+    def tearDown(self):
+        local_state.clear()
+
+    def hour_history(self, hour):
+        return LocationHistoryFilter(
+            {
+                "duration__range_lower": hour["start_datetime"],
+                "duration__range_upper": hour["end_datetime"],
+            },
+            queryset=self.l_history,
+        ).qs
+
+    def test_same_counts_as_hour_filters(self):
+        l_history, hours = self.l_history, self.hours
+
+        with CaptureQueriesContext(connection) as queries:
+            presence = location_presence(l_history, hours)
+        self.assertEqual(len(queries), 1)
+
+        expected = []
+        for hour in hours:
+            start, end = hour["start_datetime"], hour["end_datetime"]
+            hour_qs = self.hour_history(hour)
+            expected.append(
+                {
+                    "entered": hour_qs.entered(start, end).count(),
+                    "inside": hour_qs.count(),
+                    "exited": hour_qs.exited(start, end).count(),
+                }
+            )
+        self.assertEqual(presence, expected)
+        self.assertEqual(presence[0], {"entered": 2, "inside": 2, "exited": 0})
+
+    def test_same_durations_as_count_states_duration(self):
+        with CaptureQueriesContext(connection) as queries:
+            durations = state_durations(self.l_history, self.hours)
+        self.assertEqual(len(queries), 2)
+
+        expected = []
+        for hour in self.hours:
+            start, end = hour["start_datetime"], hour["end_datetime"]
+            params = {"duration__range_lower": start, "duration__range_upper": end}
+            vehicles = self.hour_history(hour).values_list("vehicle", flat=True)
+            states = VehicleStateActiveDaysFilter(
+                params, queryset=VehicleState.objects.filter(vehicle__in=vehicles)
+            ).qs
+            seconds = VehicleState.count_states_duration(states, start, end)
+            expected.append(
+                {
+                    name: int(seconds[name])
+                    for name in ("traveling", "idling", "stopped", "towed", "total")
+                }
+            )
+        self.assertEqual(durations, expected)
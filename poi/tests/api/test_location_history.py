@@ -1,3 +1,4 @@
+import json
 from datetime import datetime, timedelta
 from unittest import skip
 
@@ -277,3 +278,120 @@ class TestLocationHistoryReadingApi(FCTestCase):
                 self.assertEqual(i["id"], self.readings[11].pk)
             else:
                 self.assertEqual(i["expanded"], False)
+
+    def test_readings_action_stream(self):
+        url = f"/api/location-history/{self.location_history.pk}/readings/"
+        expected = self.client.get(url, {"expand": True}).json()
+
+        response = self.client.get(url, {"expand": True, "stream": 1})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertTrue(response.streaming)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(data, expected)
+
+    def test_readings_action_time_buckets(self):
+        url = f"/api/location-history/{self.opened_location_history.pk}/readings/"
+        readings = self.client.get(url, {"expand": True}).data
+
+        response = self.client.get(url, {"expand": True, "bucket": 60})
+        self.assertLess(len(response.data), len(readings))
+        # the expanded and the last readings are kept
+        self.assertEqual(response.data[0], readings[0])
+        self.assertEqual(response.data[-1], readings[-1])
+
+    def test_readings_action_invalid_tolerance(self):
+        response = self.client.get(
+            f"/api/location-history/{self.location_history.pk}/readings/",
+            {"tolerance": "far"},
+        )
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_readings_action_track_format(self):
+        url = f"/api/location-history/{self.location_history.pk}/readings/"
+        readings = self.client.get(url, {"expand": True}).data
+
+        response = self.client.get(url, {"expand": True, "format": "track"})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        track = response.json()
+        self.assertEqual(track["ids"], [row["id"] for row in readings])
+        self.assertEqual(track["expanded"], [0, len(readings) - 1])
+        self.assertEqual(len(track["time"]), len(readings))
+
+        response = self.client.get(
+            url, {"expand": True}, HTTP_ACCEPT="application/vnd.track"
+        )
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertTrue(response.content.startswith(b"TRK"))
+        self.assertIn(track["path"].encode(), response.content)
+
+    def test_batch_readings(self):
+        histories = (self.location_history, self.opened_location_history)
+        expected = {
+            history.pk: self.client.get(
+                f"/api/location-history/{history.pk}/readings/",
+                {"expand": True},
+            ).json()
+            for history in histories
+        }
+
+        response = self.client.get(
+            "/api/location-history/readings/",
+            {
+                "ids": ",".join(str(history.pk) for history in histories),
+                "expand": True,
+            },
+        )
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(
+            response.json(), {str(pk): data for pk, data in expected.items()}
+        )
+
+        # by filters
+        response = self.client.get(
+            "/api/location-history/readings/",
+            {"location": self.location_history.location_id},
+        )
+        self.assertEqual(
+            set(response.json()), {str(history.pk) for history in histories}
+        )
+
+    def test_batch_readings_expand_many_candidates(self):
+        vehicle = VehicleRecipe.make(customer=self.customer)
+        TrackerInstallRecipe.make(vehicle=vehicle)
+        # traveling every minute from 1m to 12m
+        ReadingRecipe.make(
+            _quantity=12,
+            vehicle_id=vehicle.id,
+            status=Reading.STATUS_CHOICES.valid,
+            movement_type=Reading.MOVEMENT_TYPES.traveling,
+            datetime=seq(self.start_time, timedelta(minutes=1)),
+        )
+        readings = list(Reading.objects.all(vehicle_id=vehicle.id))
+        history = LocationHistoryRecipe.make(
+            vehicle=vehicle,
+            location=self.location_history.location,
+            duration=DateTimeTZRange(
+                self.start_time + timedelta(minutes=5, seconds=30),
+                self.start_time + timedelta(minutes=8, seconds=30),
+            ),
+        )
+        expected = self.client.get(
+            f"/api/location-history/{history.pk}/readings/", {"expand": True}
+        ).json()
+        # the last traveling reading before and the first one after
+        self.assertEqual(
+            [row["id"] for row in expected],
+            [reading.pk for reading in readings[4:9]],
+        )
+
+        response = self.client.get(
+            "/api/location-history/readings/",
+            {"ids": str(history.pk), "expand": True},
+        )
+        self.assertEqual(response.json(), {str(history.pk): expected})
+
+    def test_batch_readings_invalid_ids(self):
+        response = self.client.get(
+            "/api/location-history/readings/", {"ids": "1,two"}
+        )
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
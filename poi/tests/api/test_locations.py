@@ -22,6 +22,7 @@ from poi.baker_recipes import (
     LocationHistoryRecipe,
 )
 from poi.models import Location, LocationHistory
+from poi.tasks import create_histories_inside_location
 from poi.tests.geojson_locations import (
     BBOX_NORTH_CAROLINA,
     CHARLOTTE,
@@ -939,6 +940,9 @@ class LocationApiVehiclesInsideTestCase(FCTestCase):
             format="json",
         )
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        # histories are created by a task once the location is committed
+        self.assertEqual(LocationHistory.objects.count(), 1)
+        self.assertEqual(create_histories_inside_location(res.data["id"]), 1)
         self.assertEqual(LocationHistory.objects.count(), 2)
 
         prev_lh = LocationHistory.objects.last()
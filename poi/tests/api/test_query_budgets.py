@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from psycopg2._range import DateTimeTZRange
+from rest_framework.test import APIClient
+
+from authentication.baker_recipes import UserRecipe
+from core.local import local_state
+from core.tests.base import FCTestCase
+from crm.baker_recipes import CompanyRecipe, ContactRecipe
+from poi.baker_recipes import (
+    LocationHistoryRecipe,
+    LocationRecipe,
+    LocationTypeRecipe,
+)
+from poi.tests.query_budget import QueryBudgetTestMixin
+from vehicle.baker_recipes import VehicleRecipe
+
+
+class PoiQueryBudgetTestCase(QueryBudgetTestMixin, FCTestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        super().setUp()
+
+        self.client = APIClient()
+        self.user = UserRecipe.make()
+        local_state.customer = self.user.customer
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        local_state.clear()
+
+    def make_locations(self, count):
+        return LocationRecipe.make(
+            fc_owner=self.user.customer,
+            company=CompanyRecipe.make(fc_owner=self.user.customer),
+            primary_contact=ContactRecipe.make(fc_owner=self.user.customer),
+            _quantity=count,
+        )
+
+    def test_locations(self):
+        self.assertQueryBudget("/api/locations/", populate=self.make_locations)
+
+    def test_location(self):
+        location = self.make_locations(1)[0]
+        self.assertQueryBudget(f"/api/locations/{location.id}/")
+
+    def test_location_types(self):
+        def populate(count):
+            LocationTypeRecipe.make(customer=self.user.customer, _quantity=count)
+
+        self.assertQueryBudget("/api/location-types/", populate=populate)
+
+    def test_location_history(self):
+        location = self.make_locations(1)[0]
+
+        def populate(count):
+            LocationHistoryRecipe.make(location=location, _quantity=count)
+
+        self.assertQueryBudget("/api/location-history/", populate=populate)
+
+    def test_location_vehicles(self):
+        location = self.make_locations(1)[0]
+        start = timezone.now() - timedelta(days=1)
+
+        def populate(count):
+            for vehicle in VehicleRecipe.make(customer=self.user.customer, _quantity=count):
+                for hours in range(2):
+                    LocationHistoryRecipe.make(
+                        location=location,
+                        vehicle=vehicle,
+                        duration=DateTimeTZRange(
+                            start + timedelta(hours=hours),
+                            start + timedelta(hours=hours, minutes=30),
+                        ),
+                    )
+
+        self.assertQueryBudget(
+            f"/api/locations/{location.id}/vehicles/", populate=populate
+        )
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import pytz
+from django.contrib.gis.geos import Point
+from django.test import SimpleTestCase
+from psycopg2._range import DateTimeTZRange
+from rest_framework.renderers import JSONRenderer
+
+from poi.api.renderers import ORJSONRenderer
+
+
+class ORJSONRendererTestCase(SimpleTestCase):
+    def test_matches_json_renderer(self):
+        data = {
+            "id": 1,
+            "datetime": datetime(2021, 1, 1, 10, tzinfo=pytz.UTC),
+            "results": [{"name": "Depot", "radius": None}],
+        }
+        self.assertEqual(
+            ORJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+    def test_range_and_geometry(self):
+        data = {
+            "duration": DateTimeTZRange(
+                datetime(2021, 1, 1, 10, tzinfo=pytz.UTC), None
+            ),
+            "empty": DateTimeTZRange(empty=True),
+            "point": Point(1.0, 2.0),
+        }
+        self.assertEqual(
+            ORJSONRenderer().render(data),
+            b'{"duration":{"lower":"2021-01-01T10:00:00Z","upper":null,'
+            b'"bounds":"[)"},"empty":{"empty":true},'
+            b'"point":{"type":"Point","coordinates":[1.0,2.0]}}',
+        )
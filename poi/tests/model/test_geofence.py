@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pytz
+from psycopg2._range import DateTimeTZRange
+
+from authentication.baker_recipes import UserRecipe
+from core.tests.base import FCTestCase
+from poi.baker_recipes import LocationRecipe
+from poi.geofence import GeofenceEngine, shapely
+from poi.models import LocationHistory
+from poi.tasks import start_location_backfill, update_location_rollups
+from poi.tests.geojson_locations import CHARLOTTE_GEOMETRY, FORT_MILL_GEOMETRY
+from vehicle.baker_recipes import VehicleRecipe
+
+OUTSIDE_POINT = (0.0, 0.0)
+
+
+class GeofenceEngineTestCase(FCTestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        super().setUp()
+        if shapely is None:
+            self.skipTest("shapely is not installed")
+
+        self.customer = UserRecipe.make().customer
+        self.location = LocationRecipe.make(
+            fc_owner=self.customer, area=CHARLOTTE_GEOMETRY
+        )
+        self.vehicle = VehicleRecipe.make(customer=self.customer)
+        self.engine = GeofenceEngine()
+        self.start = datetime(2021, 1, 1, tzinfo=pytz.UTC)
+        inside = CHARLOTTE_GEOMETRY.point_on_surface
+        self.inside = (inside.x, inside.y)
+
+    def process(self, *positions, offset=0):
+        timestamps = [
+            (self.start + timedelta(minutes=offset + minute)).timestamp()
+            for minute in range(len(positions))
+        ]
+        return self.engine.process(
+            [self.vehicle.id] * len(positions),
+            timestamps,
+            [x for x, _ in positions],
+            [y for _, y in positions],
+        )
+
+    def test_enter_and_exit(self):
+        changes = self.process(
+            OUTSIDE_POINT, self.inside, self.inside, OUTSIDE_POINT, self.inside
+        )
+
+        self.assertEqual(
+            [(change.location_id, change.kind) for change in changes],
+            [
+                (self.location.id, "enter"),
+                (self.location.id, "exit"),
+                (self.location.id, "enter"),
+            ],
+        )
+        self.assertEqual(
+            list(
+                LocationHistory.objects.order_by("duration").values_list(
+                    "duration", flat=True
+                )
+            ),
+            [
+                DateTimeTZRange(
+                    self.start + timedelta(minutes=1),
+                    self.start + timedelta(minutes=3),
+                ),
+                DateTimeTZRange(self.start + timedelta(minutes=4), None),
+            ],
+        )
+
+        # late readings are ignored, the open history is closed
+        self.assertEqual(self.process(OUTSIDE_POINT, offset=2), [])
+        self.process(OUTSIDE_POINT, offset=10)
+        self.assertFalse(
+            LocationHistory.objects.filter(
+                duration__endswith__isnull=True
+            ).exists()
+        )
+
+    def test_state_from_database(self):
+        LocationHistory.objects.create(
+            vehicle=self.vehicle,
+            location=self.location,
+            duration=DateTimeTZRange(self.start, None),
+        )
+
+        changes = self.process(self.inside, OUTSIDE_POINT, offset=5)
+
+        self.assertEqual([change.kind for change in changes], ["exit"])
+        history = LocationHistory.objects.get()
+        self.assertEqual(
+            history.get_duration_upper(), self.start + timedelta(minutes=6)
+        )
+
+    def test_locations_reloaded_on_change(self):
+        self.process(OUTSIDE_POINT)
+
+        # the area change also starts a backfill of the location
+        with mock.patch.object(
+            start_location_backfill, "delay"
+        ) as backfill, self.captureOnCommitCallbacks(execute=True):
+            self.location.area = FORT_MILL_GEOMETRY
+            self.location.save()
+        backfill.assert_called_once()
+        fort_mill = FORT_MILL_GEOMETRY.point_on_surface
+
+        changes = self.process((fort_mill.x, fort_mill.y), offset=1)
+        self.assertEqual([change.kind for change in changes], ["enter"])
+
+        # deleting its histories refreshes the rollups
+        with mock.patch.object(
+            update_location_rollups, "delay"
+        ), self.captureOnCommitCallbacks(execute=True):
+            self.location.delete()
+        other = VehicleRecipe.make(customer=self.customer)
+        changes = self.engine.process(
+            [other.id],
+            [(self.start + timedelta(minutes=2)).timestamp()],
+            [fort_mill.x],
+            [fort_mill.y],
+        )
+        self.assertEqual(changes, [])
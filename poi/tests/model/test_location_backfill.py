@@ -0,0 +1,175 @@
+from datetime import datetime, timedelta
+
+import pytz
+from django.contrib.gis.geos import Point
+from django.utils import timezone
+from psycopg2._range import DateTimeTZRange
+from rest_framework.test import APIClient
+
+from authentication.baker_recipes import UserRecipe
+from core.local import local_state
+from core.tests.base import FCTestCase
+from poi.baker_recipes import LocationHistoryRecipe, LocationRecipe
+from poi.geofence import subtract_intervals
+from poi.models import BACKFILL_STATUS, LocationBackfill, LocationHistory
+from poi.tasks import (
+    backfill_location_vehicles,
+    create_histories_inside_location,
+)
+from poi.tests.geojson_locations import CHARLOTTE_GEOMETRY
+from telemetry.baker_recipes import ReadingRecipe
+from telemetry.models.bt.reading import Reading
+from vehicle.baker_recipes import VehicleRecipe
+
+
+class LocationBackfillTestCase(FCTestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        super().setUp()
+
+        self.user = UserRecipe.make()
+        local_state.customer = self.user.customer
+        self.vehicle = VehicleRecipe.make(customer=self.user.customer)
+        self.now = timezone.now().replace(microsecond=0)
+        inside = CHARLOTTE_GEOMETRY.point_on_surface
+        for hours, point in (
+            (5, Point(0, 0)),
+            (4, inside),
+            (3, inside),
+            (2, Point(0, 0)),
+            (1, inside),
+        ):
+            ReadingRecipe.make(
+                vehicle_id=self.vehicle.id,
+                status=Reading.STATUS_CHOICES.valid,
+                movement_type=Reading.MOVEMENT_TYPES.traveling,
+                point=point,
+                datetime=self.now - timedelta(hours=hours),
+            )
+        self.location = LocationRecipe.make(
+            fc_owner=self.user.customer, area=CHARLOTTE_GEOMETRY
+        )
+
+    def tearDown(self):
+        local_state.clear()
+
+    def hours_ago(self, hours):
+        return self.now - timedelta(hours=hours)
+
+    def test_subtract_intervals(self):
+        start = datetime(2021, 1, 1, tzinfo=pytz.UTC)
+        at = [start + timedelta(hours=hour) for hour in range(10)]
+        self.assertEqual(
+            subtract_intervals(
+                [(at[0], at[5]), (at[6], None)],
+                [(at[1], at[2]), (at[4], at[7]), (at[8], None)],
+            ),
+            [(at[0], at[1]), (at[2], at[4]), (at[7], at[8])],
+        )
+
+    def test_backfill_replays_readings(self):
+        backfill = self.location.backfills.get()
+        self.assertEqual(backfill.status, BACKFILL_STATUS.pending)
+        LocationBackfill.objects.filter(pk=backfill.pk).update(
+            status=BACKFILL_STATUS.running, vehicles_total=1
+        )
+        # replaced by the backfill
+        LocationHistoryRecipe.make(
+            vehicle=self.vehicle,
+            location=self.location,
+            duration=DateTimeTZRange(self.hours_ago(4.5), self.hours_ago(4.2)),
+        )
+        # the vehicle is somewhere else since, the last visit is dropped
+        other = LocationHistoryRecipe.make(
+            vehicle=self.vehicle,
+            duration=DateTimeTZRange(self.hours_ago(1.5), None),
+        )
+
+        self.assertEqual(
+            backfill_location_vehicles(backfill.pk, [self.vehicle.id]), 1
+        )
+
+        history = LocationHistory.objects.get(location=self.location)
+        self.assertEqual(
+            history.duration,
+            DateTimeTZRange(self.hours_ago(4), self.hours_ago(2)),
+        )
+        self.assertTrue(history.created_by_replace)
+        self.assertTrue(LocationHistory.objects.filter(pk=other.pk).exists())
+        backfill.refresh_from_db()
+        self.assertEqual(backfill.status, BACKFILL_STATUS.done)
+        self.assertEqual(
+            (backfill.vehicles_done, backfill.histories_created), (1, 1)
+        )
+
+    def test_backfill_keeps_later_histories(self):
+        backfill = self.location.backfills.get()
+        LocationBackfill.objects.filter(pk=backfill.pk).update(
+            status=BACKFILL_STATUS.running,
+            vehicles_total=1,
+            period_end=self.hours_ago(0.5),
+        )
+        # opened by ingestion after the period of the backfill
+        live = LocationHistoryRecipe.make(
+            vehicle=self.vehicle,
+            location=self.location,
+            duration=DateTimeTZRange(self.hours_ago(0.2), None),
+        )
+
+        self.assertEqual(
+            backfill_location_vehicles(backfill.pk, [self.vehicle.id]), 2
+        )
+
+        # the last visit is clipped by the kept history
+        self.assertEqual(
+            list(
+                LocationHistory.objects.order_by("duration").values_list(
+                    "duration", flat=True
+                )
+            ),
+            [
+                DateTimeTZRange(self.hours_ago(4), self.hours_ago(2)),
+                DateTimeTZRange(self.hours_ago(1), self.hours_ago(0.2)),
+                DateTimeTZRange(self.hours_ago(0.2), None),
+            ],
+        )
+        self.assertTrue(LocationHistory.objects.filter(pk=live.pk).exists())
+
+    def test_backfill_then_histories_inside(self):
+        backfill = self.location.backfills.get()
+        LocationBackfill.objects.filter(pk=backfill.pk).update(
+            status=BACKFILL_STATUS.running, vehicles_total=1
+        )
+        backfill_location_vehicles(backfill.pk, [self.vehicle.id])
+
+        # the open visit of the backfill is not split in two
+        self.assertEqual(create_histories_inside_location(self.location.id), 0)
+        self.assertEqual(
+            list(
+                LocationHistory.objects.order_by("duration").values_list(
+                    "duration", flat=True
+                )
+            ),
+            [
+                DateTimeTZRange(self.hours_ago(4), self.hours_ago(2)),
+                DateTimeTZRange(self.hours_ago(1), None),
+            ],
+        )
+
+    def test_backfill_api(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = f"/api/locations/{self.location.id}/backfill/"
+
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], BACKFILL_STATUS.pending)
+
+        response = client.post(url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(
+            list(self.location.backfills.values_list("status", flat=True)),
+            [BACKFILL_STATUS.pending, BACKFILL_STATUS.cancelled],
+        )
+        self.assertEqual(client.get(url).data["id"], response.data["id"])
@@ -100,3 +100,32 @@ class LocationTestCase(FCTestCase):
         self.assertEqual(loc_history.duration_in_seconds(end, end), 0)
         # When Filters not correct
         self.assertEqual(loc_history.duration_in_seconds(end, start), 0)
+
+    def test_dwell_stats(self):
+        loc = Location(
+            area=CHARLOTTE_GEOMETRY, fc_owner=self.customer, type=self.type
+        )
+        loc.save()
+        start = self.datetime_now - timedelta(days=3)
+        for lower, upper in (
+            (start, start + timedelta(hours=2)),
+            (start + timedelta(days=1), start + timedelta(days=1, hours=1)),
+            (start + timedelta(days=2), None),
+        ):
+            LocationHistory.objects.create(
+                location=loc,
+                duration=DateTimeTZRange(lower, upper),
+                vehicle=self.vehicle,
+            )
+        histories = LocationHistory.objects.filter(vehicle=self.vehicle)
+        period = (start + timedelta(hours=1), start + timedelta(days=2, hours=3))
+
+        stats = histories.dwell_stats(*period).get()
+
+        self.assertEqual(stats["vehicle_id"], self.vehicle.id)
+        self.assertAlmostEqual(
+            stats["total_inside_time"],
+            sum(history.duration_in_seconds(*period) for history in histories),
+        )
+        self.assertEqual(stats["ingress_count"], 3)
+        self.assertEqual(stats["egress_count"], 2)
@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pytz
+from psycopg2._range import DateTimeTZRange
+from rest_framework.test import APIClient
+
+from authentication.baker_recipes import UserRecipe
+from core.local import local_state
+from core.tests.base import FCTestCase
+from poi.baker_recipes import LocationHistoryRecipe, LocationRecipe
+from poi.histogram import location_presence, state_durations
+from poi.models import LocationHistory, LocationHourlyRollup
+from poi.rollups import rollup_histogram, rollup_location, rollup_period
+from poi.tasks import rollup_last_hour
+from tracker.baker_recipes import vehicle_state_recipe
+from tracker.models import VehicleState
+from utils.dates import days_into_hours
+from vehicle.baker_recipes import VehicleRecipe
+
+
+class LocationRollupTestCase(FCTestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        super().setUp()
+
+        self.user = UserRecipe.make()
+        local_state.customer = self.user.customer
+        self.location = LocationRecipe.make(fc_owner=self.user.customer)
+        self.start = datetime(2020, 1, 1, 10, tzinfo=pytz.UTC)
+        self.end = self.start + timedelta(hours=6)
+        for lower, upper in (
+            (self.start + timedelta(minutes=5), self.start + timedelta(hours=1)),
+            (self.start + timedelta(minutes=20), None),
+        ):
+            vehicle = VehicleRecipe.make(customer=self.user.customer)
+            LocationHistoryRecipe.make(
+                vehicle=vehicle,
+                location=self.location,
+                duration=DateTimeTZRange(lower, upper),
+            )
+            vehicle_state_recipe(
+                vehicle,
+                lower,
+                duration=timedelta(hours=2),
+                type=VehicleState.TYPES.stopped,
+            ).make()
+        self.hours = days_into_hours(
+            self.start.strftime("%Y-%m-%dT%H:%M:%S"),
+            self.end.strftime("%Y-%m-%dT%H:%M:%S"),
+        )
+        self.params = {
+            "duration__range_lower": self.start.isoformat(),
+            "duration__range_upper": self.end.isoformat(),
+        }
+
+    def tearDown(self):
+        local_state.clear()
+
+    def test_rollups_match_histogram(self):
+        self.assertIsNone(
+            rollup_histogram(
+                self.location.id, self.user.customer, self.params, self.hours
+            )
+        )
+
+        rollup_location(self.location.id, self.start, self.end)
+
+        l_history = LocationHistory.objects.filter(location=self.location)
+        expected = [
+            {**counts, **seconds}
+            for counts, seconds in zip(
+                location_presence(l_history, self.hours),
+                state_durations(l_history, self.hours),
+            )
+        ]
+        self.assertEqual(
+            rollup_histogram(
+                self.location.id, self.user.customer, self.params, self.hours
+            ),
+            expected,
+        )
+        first = LocationHourlyRollup.objects.filter(location=self.location)[0]
+        self.assertEqual(first.occupancy, 55 * 60 + 40 * 60)
+
+        # filters the rollups do not have
+        params = {**self.params, "vehicle": "1"}
+        self.assertIsNone(
+            rollup_histogram(
+                self.location.id, self.user.customer, params, self.hours
+            )
+        )
+        # another customer
+        self.assertIsNone(
+            rollup_histogram(
+                self.location.id, UserRecipe.make().customer, self.params, self.hours
+            )
+        )
+
+    def test_rollups_of_empty_locations(self):
+        empty = LocationRecipe.make(fc_owner=self.user.customer)
+        rollup_period(self.start, self.end)
+
+        histogram = rollup_histogram(
+            empty.id, self.user.customer, self.params, self.hours
+        )
+        self.assertEqual(len(histogram), len(self.hours))
+        self.assertFalse(any(any(row.values()) for row in histogram))
+        self.assertTrue(
+            LocationHourlyRollup.objects.filter(
+                location=self.location, inside__gt=0
+            ).exists()
+        )
+
+    def test_last_hour_rolls_up_late_states(self):
+        hour = self.start + timedelta(hours=2)
+        with mock.patch(
+            "django.utils.timezone.now", return_value=hour + timedelta(hours=1)
+        ):
+            rollup_last_hour()
+        rollup = LocationHourlyRollup.objects.get(
+            location=self.location, vehicle_group="", start=hour
+        )
+        self.assertEqual(rollup.towed, 0)
+
+        # ingested after the hour was rolled up
+        vehicle = LocationHistory.objects.get(
+            duration__endswith__isnull=True
+        ).vehicle
+        vehicle_state_recipe(
+            vehicle,
+            hour + timedelta(minutes=30),
+            duration=timedelta(minutes=10),
+            type=VehicleState.TYPES.towed,
+        ).make()
+        with mock.patch(
+            "django.utils.timezone.now", return_value=hour + timedelta(hours=2)
+        ):
+            rollup_last_hour()
+        rollup.refresh_from_db()
+        self.assertEqual(rollup.towed, 600)
+
+    def test_histogram_reads_rollups(self):
+        rollup_location(self.location.id, self.start, self.end)
+        LocationHourlyRollup.objects.filter(location=self.location).update(
+            entered=42
+        )
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(
+            f"/api/locations/{self.location.id}/histogram/", self.params
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {row["entered"] for row in response.json().values()}, {42}
+        )
@@ -0,0 +1,134 @@
+"""
+Query budgets of API views, checked in tests.
+
+Views declare ``query_budget``, the most SQL queries one GET may run (a dict
+by action for viewsets whose actions differ).
+``QueryBudgetTestMixin.assertQueryBudget`` requests a view with growing
+amounts of data and fails when a request goes over the budget or when the
+number of queries grows with the page size (N+1), listing the offending SQL
+with the application code that ran it.
+"""
+import re
+import traceback
+import typing as t
+from collections import Counter
+from urllib.parse import urlparse
+
+from django.core.cache import cache
+from django.db import connection
+from django.urls import resolve
+
+# frames from these paths are never blamed for a query
+LIBRARY_PATHS = (
+    "site-packages",
+    "dist-packages",
+    "/django/",
+    "/rest_framework/",
+    __file__,
+)
+# IN (%s, %s, ...) has one placeholder per id
+IN_PLACEHOLDERS = re.compile(r"IN \(%s(?:, %s)*\)")
+
+
+class RecordedQuery(t.NamedTuple):
+    sql: str
+    # "path:line in function", innermost application frame first
+    stack: tuple
+
+    @property
+    def shape(self) -> str:
+        """SQL without its parameters, equal for the repeated queries of an N+1."""
+        return IN_PLACEHOLDERS.sub("IN (...)", self.sql)
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` recording queries with their callers."""
+
+    stack_depth = 3
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        stack = tuple(
+            f"{frame.filename}:{frame.lineno} in {frame.name}"
+            for frame in reversed(traceback.extract_stack()[:-1])
+            if not any(path in frame.filename for path in LIBRARY_PATHS)
+        )
+        self.queries.append(RecordedQuery(sql, stack[: self.stack_depth]))
+        return execute(sql, params, many, context)
+
+    def shapes(self) -> Counter:
+        return Counter(query.shape for query in self.queries)
+
+    def report(self, queries: t.Iterable[RecordedQuery] = None) -> str:
+        lines = []
+        for query in self.queries if queries is None else queries:
+            lines.append(query.sql)
+            callers = query.stack or ("(no application frame)",)
+            lines += [f"    {caller}" for caller in callers]
+        return "\n".join(lines)
+
+
+def view_query_budget(url: str) -> int:
+    """``query_budget`` of the view at ``url``, per action when a dict."""
+    view = resolve(urlparse(url).path).func
+    budget = view.cls.query_budget
+    if isinstance(budget, dict):
+        budget = budget[view.actions["get"]]
+    return budget
+
+
+class QueryBudgetTestMixin:
+    """For ``TestCase`` classes requesting views with ``self.client``."""
+
+    def record_queries(self, url: str, params: dict = None) -> QueryRecorder:
+        # cached responses would hide the queries
+        cache.clear()
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.client.get(url, params)
+        self.assertEqual(
+            response.status_code, 200, f"{url}: {response.status_code}"
+        )
+        return recorder
+
+    def assertQueryBudget(
+        self,
+        url: str,
+        params: dict = None,
+        populate: t.Callable[[int], None] = None,
+        sizes=(1, 3, 6),
+    ):
+        """
+        Requests ``url`` once ``populate(n)`` added objects up to each of
+        ``sizes`` (without ``populate`` once). Every size is requested twice
+        and the second request measured, so objects created lazily on first
+        read are not counted.
+        """
+        budget = view_query_budget(url)
+        recorders = []
+        populated = 0
+        for size in sizes if populate else (None,):
+            if populate:
+                populate(size - populated)
+                populated = size
+            self.record_queries(url, params)
+            recorder = self.record_queries(url, params)
+            if len(recorder.queries) > budget:
+                self.fail(
+                    f"{url} ran {len(recorder.queries)} queries with {size} "
+                    f"objects, budget {budget}:\n{recorder.report()}"
+                )
+            recorders.append(recorder)
+
+        first, last = recorders[0], recorders[-1]
+        grown = last.shapes() - first.shapes()
+        if grown:
+            self.fail(
+                f"{url} queries grow with the page size "
+                f"({len(first.queries)} -> {len(last.queries)}):\n"
+                + last.report(
+                    query for query in last.queries if query.shape in grown
+                )
+            )
@@ -0,0 +1,93 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+from django.contrib.gis.geos import Point
+from django.test import SimpleTestCase
+
+from poi.tracks import (
+    douglas_peucker,
+    encode_polyline,
+    exclude_not_traveling,
+    pack_track,
+    simplify,
+    time_buckets,
+    track_columns,
+)
+
+FakeReading = namedtuple(
+    "FakeReading", "pk datetime point is_traveling movement_type"
+)
+
+
+def make_readings(points, traveling=True):
+    start = datetime(2021, 1, 1, tzinfo=pytz.UTC)
+    return [
+        FakeReading(
+            pk,
+            start + timedelta(seconds=10 * pk),
+            point and Point(*point),
+            traveling,
+            "traveling" if traveling else "stopped",
+        )
+        for pk, point in enumerate(points)
+    ]
+
+
+class TracksTestCase(SimpleTestCase):
+    def test_douglas_peucker(self):
+        points = np.array([(0, 0), (1, 0.1), (2, -0.1), (3, 5), (4, 6), (5, 7)])
+        kept = douglas_peucker(points, tolerance=1)
+        self.assertEqual(kept.tolist(), [True, False, True, True, False, True])
+        self.assertTrue(douglas_peucker(points[:2], tolerance=1).all())
+
+    def test_simplify_straight_line(self):
+        # less than a meter off a straight line
+        readings = make_readings(
+            [(30.5 + (i % 2) * 0.00001, 50.4 + i * 0.001) for i in range(10)]
+        )
+        simplified = list(simplify(iter(readings), tolerance=5, keep={4}))
+        self.assertEqual([reading.pk for reading in simplified], [0, 4, 9])
+
+    def test_time_buckets(self):
+        readings = make_readings([(0, 0)] * 10)
+        kept = list(time_buckets(iter(readings), 30, keep={5}))
+        self.assertEqual([reading.pk for reading in kept], [0, 3, 5, 6, 9])
+
+    def test_exclude_not_traveling(self):
+        readings = [
+            reading._replace(is_traveling=traveling)
+            for reading, traveling in zip(
+                make_readings([(0, 0)] * 6),
+                (False, True, True, False, False, False),
+            )
+        ]
+        kept = exclude_not_traveling(iter(readings))
+        self.assertEqual([reading.pk for reading in kept], [0, 1, 2, 3])
+
+    def test_encode_polyline(self):
+        self.assertEqual(
+            encode_polyline(
+                [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+            ),
+            "_p~iF~ps|U_ulLnnqC_mqNvxq`@",
+        )
+
+    def test_track_columns(self):
+        readings = make_readings([(-120.2, 38.5), None, (-120.95, 40.7)])
+        readings[1] = readings[1]._replace(movement_type="stopped")
+
+        columns = track_columns(readings, expanded_ids=[2, None])
+
+        self.assertEqual(columns["start"], 1609459200000)
+        self.assertEqual(columns["time"], [0, 10000, 10000])
+        self.assertEqual(columns["path"], "_p~iF~ps|U??_ulLnnqC")
+        self.assertEqual(columns["states"], ["traveling", "stopped"])
+        self.assertEqual(columns["state"], [0, 1, 0])
+        self.assertEqual(columns["expanded"], [2])
+        self.assertEqual(columns["unlocated"], [1])
+
+        packed = pack_track(columns)
+        self.assertTrue(packed.startswith(b"TRK\x01\x05\x03"))
+        self.assertIn(columns["path"].encode(), packed)
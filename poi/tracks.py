@@ -0,0 +1,280 @@
+"""
+Tracks of location histories.
+
+The readings of a history are consumed as an iterator in datetime order, so
+a track is filtered and downsampled while it is read instead of being loaded
+whole:
+
+- ``exclude_not_traveling`` drops stopped readings that follow stopped ones,
+- ``time_buckets`` keeps the first reading of every bucket of seconds,
+- ``simplify`` runs Douglas-Peucker on windows of positions, with a
+  tolerance in meters.
+
+Readings in ``keep`` (the expanded ones) and the last reading of a track are
+never dropped.
+
+``track_columns`` encodes a track as columns instead of one object per
+reading: timestamps as millisecond deltas, positions as a Google encoded
+polyline and movement types as indexes of a ``states`` table.
+``pack_track`` is the binary variant of the same columns.
+"""
+import math
+import struct
+import typing as t
+from datetime import timedelta
+from itertools import chain, islice
+
+import numpy as np
+
+READINGS_CHUNK_SIZE = 1000
+# positions simplified at once, bounds the memory of ``simplify``
+SIMPLIFY_WINDOW = 5000
+METERS_PER_DEGREE = 111_320
+POLYLINE_PRECISION = 5
+TRACK_MAGIC = b"TRK"
+TRACK_VERSION = 1
+
+
+def chunked(iterable: t.Iterable, size: int) -> t.Iterator[list]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def chain_readings(readings, lower=None, upper=None) -> t.Iterator:
+    """Readings with the expanded readings before and after them."""
+    return chain(
+        [lower] if lower else [], readings, [upper] if upper else []
+    )
+
+
+def merge_windows(windows, max_gap=timedelta(0)) -> t.List[tuple]:
+    """
+    Union of ``(start, end)`` windows, joining windows less than
+    ``max_gap`` apart.
+    """
+    merged = []
+    for start, end in sorted(windows):
+        if merged and start - merged[-1][1] <= max_gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def exclude_not_traveling(readings) -> t.Iterator:
+    """Readings that are traveling or follow a traveling reading."""
+    previous = None
+    for reading in readings:
+        if reading.is_traveling or not previous or previous.is_traveling:
+            yield reading
+        previous = reading
+
+
+def time_buckets(readings, seconds: int, keep=()) -> t.Iterator:
+    """First reading of every ``seconds`` long bucket."""
+    bucket = last = None
+    emitted = False
+    for reading in readings:
+        current = int(reading.datetime.timestamp() // seconds)
+        emitted = current != bucket or reading.pk in keep
+        if emitted:
+            bucket = current
+            yield reading
+        last = reading
+    if last is not None and not emitted:
+        yield last
+
+
+def douglas_peucker(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Mask of the ``(n, 2)`` points kept by Douglas-Peucker."""
+    keep = np.zeros(len(points), dtype=bool)
+    if len(points) < 3:
+        keep[:] = True
+        return keep
+
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start = points[first]
+        segment = points[last] - start
+        inner = points[first + 1:last] - start
+        length = np.hypot(*segment)
+        if length:
+            distances = (
+                np.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0])
+                / length
+            )
+        else:
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            middle = first + 1 + index
+            keep[middle] = True
+            stack.extend(((first, middle), (middle, last)))
+    return keep
+
+
+def _meters(points) -> np.ndarray:
+    """Longitude/latitude points projected to meters around the first one."""
+    coordinates = np.array(
+        [(point.x, point.y) for point in points], dtype=float
+    )
+    scale = math.cos(math.radians(coordinates[0, 1]))
+    return coordinates * [METERS_PER_DEGREE * scale, METERS_PER_DEGREE]
+
+
+def simplify(readings, tolerance: float, keep=()) -> t.Iterator:
+    """Readings whose positions are kept by Douglas-Peucker."""
+    for window in chunked(readings, SIMPLIFY_WINDOW):
+        located = [
+            index
+            for index, reading in enumerate(window)
+            if getattr(reading, "point", None) is not None
+        ]
+        kept = np.ones(len(window), dtype=bool)
+        if len(located) > 2:
+            points = _meters(window[index].point for index in located)
+            kept[located] = douglas_peucker(points, tolerance)
+        for reading, is_kept in zip(window, kept):
+            if is_kept or reading.pk in keep:
+                yield reading
+
+
+def downsample(
+    readings, tolerance: float = 0, bucket: int = 0, keep=()
+) -> t.Iterator:
+    """Readings downsampled by time ``bucket`` then by ``tolerance``."""
+    if bucket:
+        readings = time_buckets(readings, bucket, keep)
+    if tolerance:
+        readings = simplify(readings, tolerance, keep)
+    return readings
+
+
+def _polyline_value(value: int) -> str:
+    value = ~(value << 1) if value < 0 else value << 1
+    chars = []
+    while value >= 0x20:
+        chars.append(chr((0x20 | (value & 0x1F)) + 63))
+        value >>= 5
+    chars.append(chr(value + 63))
+    return "".join(chars)
+
+
+def encode_polyline(coordinates, precision: int = POLYLINE_PRECISION) -> str:
+    """Google encoded polyline of ``(lat, lng)`` coordinates."""
+    factor = 10 ** precision
+    encoded = []
+    previous_lat = previous_lng = 0
+    for lat, lng in coordinates:
+        lat, lng = round(lat * factor), round(lng * factor)
+        encoded.append(_polyline_value(lat - previous_lat))
+        encoded.append(_polyline_value(lng - previous_lng))
+        previous_lat, previous_lng = lat, lng
+    return "".join(encoded)
+
+
+def track_columns(readings: t.Sequence, expanded_ids=()) -> dict:
+    """
+    Columnar track of ``readings``. Readings without a position repeat the
+    previous one in ``path`` and are listed in ``unlocated``.
+    """
+    expanded_ids = {pk for pk in expanded_ids if pk}
+    milliseconds = [
+        round(reading.datetime.timestamp() * 1000) for reading in readings
+    ]
+    states = {}
+    coordinates = []
+    unlocated = []
+    position = (0.0, 0.0)
+    for index, reading in enumerate(readings):
+        point = getattr(reading, "point", None)
+        if point is None:
+            unlocated.append(index)
+        else:
+            position = (point.y, point.x)
+        coordinates.append(position)
+        states.setdefault(reading.movement_type, len(states))
+
+    return {
+        "count": len(readings),
+        "ids": [reading.pk for reading in readings],
+        "start": milliseconds[0] if milliseconds else None,
+        "time": [
+            current - previous
+            for previous, current in zip(
+                milliseconds[:1] + milliseconds, milliseconds
+            )
+        ],
+        "precision": POLYLINE_PRECISION,
+        "path": encode_polyline(coordinates),
+        "states": list(states),
+        "state": [states[reading.movement_type] for reading in readings],
+        "expanded": [
+            index
+            for index, reading in enumerate(readings)
+            if reading.pk in expanded_ids
+        ],
+        "unlocated": unlocated,
+    }
+
+
+def _varint(value: int) -> bytes:
+    encoded = bytearray()
+    while value >= 0x80:
+        encoded.append(0x80 | (value & 0x7F))
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _string(value) -> bytes:
+    encoded = str(value).encode()
+    return _varint(len(encoded)) + encoded
+
+
+def _varints(values, zigzag=False) -> bytes:
+    return _varint(len(values)) + b"".join(
+        _varint(_zigzag(value) if zigzag else value) for value in values
+    )
+
+
+def pack_track(columns: dict) -> bytes:
+    """
+    Binary ``track_columns``: ``TRK``, version and polyline precision bytes,
+    then the count and start (zigzag) varints and the columns. Lists are
+    prefixed by their varint length, strings by their length in bytes:
+
+    - ``time`` (zigzag varints), ``state`` (one byte each),
+    - ``states``, ``ids`` (strings), ``path`` (ASCII polyline),
+    - ``expanded``, ``unlocated`` (varints).
+    """
+    return b"".join(
+        (
+            TRACK_MAGIC,
+            struct.pack("BB", TRACK_VERSION, columns["precision"]),
+            _varint(columns["count"]),
+            _varint(_zigzag(columns["start"] or 0)),
+            _varints(columns["time"], zigzag=True),
+            _varint(len(columns["state"])),
+            bytes(columns["state"]),
+            _varint(len(columns["states"])),
+            *(_string(state) for state in columns["states"]),
+            _varint(len(columns["ids"])),
+            *(_string(pk) for pk in columns["ids"]),
+            _string(columns["path"]),
+            _varints(columns["expanded"]),
+            _varints(columns["unlocated"]),
+        )
+    )
@@ -5,7 +5,13 @@ from mapwidgets.widgets import GooglePointFieldWidget
 from django.conf import settings
 
 from pgr_django.properties.forms import PropertyForm
+from pgr_django.properties.instrumentation import (
+    PHASE_GOOGLE_GEOCODING,
+    PHASE_GOOGLE_STREET_VIEW,
+    timed,
+)
 from pgr_django.properties.models import (
+    ExchangeRate,
     Property,
     PropertyPhoto,
     PropertyFile,
@@ -113,13 +119,19 @@ class PropertyAdmin(admin.ModelAdmin):
     inlines = [PropertyPhotoInline, PropertyFileInline]
 
     def silent_delete(self, request, queryset):
-        queryset.delete()
+        queryset.tracked_delete()
 
     def delete_scraped_only(self, request, queryset):
         queryset = queryset.filter(scraped=True)
         while queryset.exists():
             ids = queryset[:25000].values_list("id", flat=True)
-            queryset.filter(id__in=ids).delete()
+            queryset.filter(id__in=ids).tracked_delete()
+
+    def get_search_results(self, request, queryset, search_term):
+        # indexed full-text/trigram search instead of ILIKE over search_fields
+        if not search_term:
+            return queryset, False
+        return queryset.search(search_term), False
 
     def get_agent(self, obj):
         return obj.agent
@@ -205,16 +217,18 @@ class PropertyAdmin(admin.ModelAdmin):
             obj.location.x, obj.location.y = obj.location.y, obj.location.x
 
         try:
-            gg = GoogleGeocoding(obj, reverse=reverse)
-            gg.save_geocoding_data()
+            with timed(PHASE_GOOGLE_GEOCODING):
+                gg = GoogleGeocoding(obj, reverse=reverse)
+                gg.save_geocoding_data()
         except GoogleGeocodingException:
             pass
 
         # address has been changed, we have to look for a new picture in google street view
         if not reverse or 'location' in form.changed_data:
             try:
-                gs = GoogleStreetView(property_obj=obj, google_geocoding_obj=gg)
-                gs.save_property_street_view_photo()
+                with timed(PHASE_GOOGLE_STREET_VIEW):
+                    gs = GoogleStreetView(property_obj=obj, google_geocoding_obj=gg)
+                    gs.save_property_street_view_photo()
             except GoogleStreetViewException:
                 pass
 
@@ -234,3 +248,9 @@ class PropertyDescTranslationAdmin(admin.ModelAdmin):
 @admin.register(ScrapedPropertiesFile)
 class ScrapedPropertiesFileAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = "currency", "rate_to_usd", "updated_at"
+    search_fields = "currency",
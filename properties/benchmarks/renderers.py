@@ -0,0 +1,76 @@
+"""
+Compares ``JSONRenderer`` and ``ORJSONRenderer`` on real serializer outputs.
+
+Payloads are built from properties already in the database, so run it
+against a copy of production data for meaningful numbers.
+"""
+import timeit
+import typing as t
+
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from ..models import Property, PropertyPhoto, PropertyFile
+from ..renderers import ORJSONRenderer
+from ..row_serializers import PropertySearchRowSerializer
+from ..serializers import (
+    PropertyDetailSerializer,
+    PropertyListSerializer,
+    PropertyLocationSerializer,
+)
+
+
+class RendererResult(t.NamedTuple):
+    payload: str
+    size: int
+    json_ms: float
+    orjson_ms: float
+    identical: bool
+
+    @property
+    def speedup(self) -> float:
+        return self.json_ms / self.orjson_ms if self.orjson_ms else 0
+
+
+def build_payloads(limit: int) -> dict:
+    """Serializer outputs of the heaviest property endpoints."""
+    queryset = Property.objects.order_by('id')[:limit]
+    payloads = {
+        'search': PropertySearchRowSerializer(
+            PropertySearchRowSerializer.get_rows(queryset)
+        ).data,
+        'list': PropertyListSerializer(
+            queryset.select_related('agent').prefetch_related('photos'), many=True
+        ).data,
+        'area-search': PropertyLocationSerializer(
+            queryset.values('id', 'location', 'status'), many=True
+        ).data,
+    }
+    detailed = queryset.select_related(
+        'agent', 'agent__user', 'agent__broker', 'description_translation',
+    ).prefetch_related(
+        Prefetch('photos', queryset=PropertyPhoto.objects.order_by('order')),
+        Prefetch('files', queryset=PropertyFile.objects.order_by('order')),
+    ).first()
+    if detailed is not None:
+        payloads['detail'] = PropertyDetailSerializer(detailed).data
+    return payloads
+
+
+def benchmark_renderers(payloads: dict, repeat: int) -> t.List[RendererResult]:
+    json_renderer = JSONRenderer()
+    orjson_renderer = ORJSONRenderer()
+
+    results = []
+    for name, data in payloads.items():
+        expected = json_renderer.render(data)
+        json_time = timeit.timeit(lambda: json_renderer.render(data), number=repeat)
+        orjson_time = timeit.timeit(lambda: orjson_renderer.render(data), number=repeat)
+        results.append(RendererResult(
+            payload=name,
+            size=len(expected),
+            json_ms=json_time * 1000 / repeat,
+            orjson_ms=orjson_time * 1000 / repeat,
+            identical=orjson_renderer.render(data) == expected,
+        ))
+    return results
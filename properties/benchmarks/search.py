@@ -0,0 +1,325 @@
+"""
+Load benchmark of the property search endpoints on synthetic data.
+
+``generate_properties`` bulk inserts agents, properties and photos clustered
+around real cities, ``run_scenarios`` replays a fixed mix of query strings
+against the views in-process and reports latency percentiles, queries per
+request and rows scanned (from ``EXPLAIN ANALYZE`` of every SELECT).
+
+Generated rows are marked with ``BENCHMARK_RUN_TOKEN`` so they can be removed
+again. Never run it against a database that matters.
+"""
+import json
+import math
+import random
+import time
+import typing as t
+from decimal import Decimal
+
+from django.contrib.gis.geos import Point
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from moneyed import Money
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from pgr_django.users.models import Agent
+from pgr_django.users.tests.baker_recipes import AgentRecipe, BrokerRecipe
+from pgr_django.utils.properties_parser import BUY_TYPE, RENT_TYPE
+
+from ..constants import (
+    STATUS_ACTIVE,
+    STATUS_INACTIVE,
+    STATUS_SOLD,
+    TYPE_COMMERCIAL,
+    TYPE_RESIDENTIAL,
+    TYPE_SUBTYPE_MAP,
+)
+from ..models import ExchangeRate, Property, PropertyPhoto
+from ..tasks import (
+    reconcile_property_counters,
+    update_property_prices_usd,
+    update_property_search_vectors,
+)
+
+BENCHMARK_RUN_TOKEN = 'benchmark'
+BATCH_SIZE = 5000
+PROPERTIES_PER_AGENT = 500
+# explained per scenario, EXPLAIN ANALYZE runs the query once more
+EXPLAIN_SAMPLES = 1
+
+# city, country, lat, lng, spread in degrees, share of properties, currency
+CITIES = (
+    ('New York', 'United States', 40.71, -74.01, 0.15, 0.20, 'USD'),
+    ('Los Angeles', 'United States', 34.05, -118.24, 0.25, 0.15, 'USD'),
+    ('Miami', 'United States', 25.76, -80.19, 0.12, 0.10, 'USD'),
+    ('London', 'United Kingdom', 51.51, -0.13, 0.15, 0.12, 'GBP'),
+    ('Berlin', 'Germany', 52.52, 13.40, 0.12, 0.08, 'EUR'),
+    ('Kyiv', 'Ukraine', 50.45, 30.52, 0.10, 0.10, 'UAH'),
+    ('Lviv', 'Ukraine', 49.84, 24.03, 0.06, 0.05, 'UAH'),
+    ('Warsaw', 'Poland', 52.23, 21.01, 0.10, 0.08, 'PLN'),
+    ('Dubai', 'United Arab Emirates', 25.20, 55.27, 0.15, 0.07, 'AED'),
+    ('Lisbon', 'Portugal', 38.72, -9.14, 0.08, 0.05, 'EUR'),
+)
+# approximate, only to turn synthetic USD prices into local ones
+USD_RATES = {
+    'USD': Decimal('1'), 'EUR': Decimal('1.08'), 'GBP': Decimal('1.27'),
+    'UAH': Decimal('0.027'), 'PLN': Decimal('0.25'), 'AED': Decimal('0.27'),
+}
+STATUS_WEIGHTS = ((STATUS_ACTIVE, 0.7), (STATUS_INACTIVE, 0.2), (STATUS_SOLD, 0.1))
+
+
+class Scenario(t.NamedTuple):
+    name: str
+    path: str
+    params: dict
+    # requests of the replayed mix
+    weight: int = 1
+    as_agent: bool = False
+
+
+SCENARIOS = (
+    Scenario('search-city', '/properties/search', {'cities': 'New York', 'buyrent': BUY_TYPE}, 5),
+    Scenario('search-country-price', '/properties/search', {
+        'countries': 'Ukraine', 'minprice': 50000, 'maxprice': 250000,
+    }, 4),
+    Scenario('search-usd-price-beds', '/properties/search', {
+        'minpriceusd': 200000, 'maxpriceusd': 800000, 'minbeds': 2, 'type': TYPE_RESIDENTIAL,
+    }, 3),
+    Scenario('search-bbox', '/properties/search', {'bbox': '51.3,-0.4,51.7,0.2'}, 4),
+    Scenario('search-near', '/properties/search', {
+        'near': '50.45,30.52', 'buyrent': RENT_TYPE,
+    }, 2),
+    Scenario('search-price-order', '/properties/search', {
+        'cities': 'Miami,Los Angeles', 'ordering': '-price_usd',
+    }, 2),
+    Scenario('search-deep-page', '/properties/search', {'countries': 'United States', 'page': 50}, 1),
+    Scenario('my-properties', '/properties/my-properties', {}, 3, as_agent=True),
+    Scenario('my-properties-filtered', '/properties/my-properties', {
+        'status': STATUS_ACTIVE, 'ordering': '-price_avg',
+    }, 2, as_agent=True),
+    Scenario('list', '/properties/list', {}, 3),
+    Scenario('list-deep-page', '/properties/list', {'page': 200}, 1),
+    Scenario('area-search-radius', '/properties/properties-area-search/', {
+        'location': 'POINT(40.71 -74.01)', 'radius': 0.05,
+    }, 3),
+    Scenario('area-search-polygon', '/properties/properties-area-search/', {
+        'points': '52.45, 13.30, 52.60, 13.30, 52.60, 13.50, 52.45, 13.50',
+        'buyrent': BUY_TYPE,
+    }, 2),
+)
+
+
+class ScenarioResult(t.NamedTuple):
+    name: str
+    requests: int
+    status_code: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    queries: float
+    rows_scanned: int
+
+
+def generate_properties(count: int, photos_per_property: int = 3, seed: int = 1,
+                        batch_size: int = BATCH_SIZE, log=None) -> Agent:
+    """
+    Bulk inserts ``count`` properties and their agents and photos, then fills
+    what signals would have (counters, search vectors, USD prices).
+
+    Returns the agent used by the my-properties scenarios: it belongs to a
+    broker, so the broker-wide queryset is measured.
+    """
+    rng = random.Random(seed)
+    # without signals, existing rates are kept
+    ExchangeRate.objects.bulk_create([
+        ExchangeRate(currency=currency, rate_to_usd=rate) for currency, rate in USD_RATES.items()
+    ], ignore_conflicts=True)
+    broker = BrokerRecipe.make(user__is_broker=True)
+    agents_count = max(1, count // PROPERTIES_PER_AGENT)
+    agents = [AgentRecipe.make(user__is_agent=True, broker=broker)]
+    agents += AgentRecipe.make(user__is_agent=True, _quantity=agents_count - 1) if agents_count > 1 else []
+    agent_ids = [agent.id for agent in agents]
+
+    city_weights = [city[5] for city in CITIES]
+    statuses, status_weights = zip(*STATUS_WEIGHTS)
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        properties = Property.objects.bulk_create([
+            _make_property(rng, rng.choices(CITIES, city_weights)[0],
+                           rng.choices(statuses, status_weights)[0], agent_ids)
+            for _ in range(size)
+        ], batch_size=batch_size)
+        PropertyPhoto.objects.bulk_create([
+            PropertyPhoto(property=prop, photo=f'{prop.id}/{order}.jpg', order=order)
+            for prop in properties
+            for order in range(rng.randint(0, photos_per_property * 2))
+        ], batch_size=batch_size)
+        created += size
+        if log:
+            log(f'{created}/{count} properties')
+
+    reconcile_property_counters()
+    update_property_search_vectors()
+    update_property_prices_usd(only_missing=True)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE properties_property; ANALYZE properties_propertyphoto')
+    return agents[0]
+
+
+def _make_property(rng: random.Random, city: tuple, status: str, agent_ids: list) -> Property:
+    name, country, lat, lng, spread, _share, currency = city
+    property_type = rng.choices((TYPE_RESIDENTIAL, TYPE_COMMERCIAL), (0.85, 0.15))[0]
+    buy_rent = rng.choices((BUY_TYPE, RENT_TYPE), (0.7, 0.3))[0]
+    # log-normal USD prices, rents are monthly
+    amount = rng.lognormvariate(math.log(350000 if buy_rent == BUY_TYPE else 2000), 0.6)
+    amount = round(amount / float(USD_RATES[currency]), -2 if buy_rent == BUY_TYPE else 0)
+    price = Money(Decimal(amount).quantize(Decimal('0.01')), currency)
+    street = f'{rng.choice(("Main", "Park", "Oak", "Lake", "Hill", "Central"))} Street'
+    number = rng.randint(1, 300)
+    return Property(
+        property_type=property_type,
+        property_subtype=rng.choice(TYPE_SUBTYPE_MAP[property_type]),
+        status=status,
+        price=price,
+        calculated_price_avg=price.amount,
+        address=f'{street} {number}, {name}, {country}',
+        country=country,
+        city=name,
+        street=street,
+        zip_code=f'{rng.randint(10000, 99999)}',
+        location=Point(rng.gauss(lat, spread / 2), rng.gauss(lng, spread / 2), srid=4326),
+        beds=rng.randint(0, 6),
+        baths=rng.randint(1, 4),
+        size=Decimal(rng.randint(30, 400)),
+        build_year=rng.randint(1900, 2023),
+        agent_id=rng.choice(agent_ids),
+        buy_rent=buy_rent,
+        run_token=BENCHMARK_RUN_TOKEN,
+    )
+
+
+def delete_generated() -> int:
+    """Removes generated properties (photos cascade) and refreshes counters."""
+    deleted, _ = Property.objects.filter(run_token=BENCHMARK_RUN_TOKEN).tracked_delete()
+    return deleted
+
+
+def percentile(values: t.Sequence[float], percent: float) -> float:
+    """Nearest-rank percentile of ``values``."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def rows_scanned(plan: dict) -> int:
+    """Rows read by the scan nodes of a ``EXPLAIN (ANALYZE, FORMAT JSON)`` plan."""
+    total = 0
+    if 'Scan' in plan.get('Node Type', ''):
+        read = plan.get('Actual Rows', 0) + plan.get('Rows Removed by Filter', 0) \
+            + plan.get('Rows Removed by Index Recheck', 0)
+        total += read * plan.get('Actual Loops', 1)
+    for child in plan.get('Plans', ()):
+        total += rows_scanned(child)
+    return total
+
+
+def explain_rows_scanned(queries: t.Iterable[dict]) -> int:
+    total = 0
+    with connection.cursor() as cursor:
+        for query in queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            total += rows_scanned(plan[0]['Plan'])
+    return total
+
+
+def run_scenarios(scenarios: t.Sequence[Scenario] = SCENARIOS, repeat: int = 10,
+                  agent: t.Optional[Agent] = None) -> t.List[ScenarioResult]:
+    """
+    Replays each scenario ``weight * repeat`` times.
+
+    Every request gets a unique ``_run`` parameter, ignored by the filters, so
+    the response caches of the views are always missed and the database and
+    serialization work is what gets measured.
+    """
+    factory = APIRequestFactory()
+    results = []
+    run = 0
+    for scenario in scenarios:
+        view = resolve(scenario.path).func
+        timings, query_counts = [], []
+        status_code = None
+        explained = scanned = 0
+        for _ in range(scenario.weight * repeat):
+            run += 1
+            request = factory.get(scenario.path, {**scenario.params, '_run': run})
+            if scenario.as_agent:
+                force_authenticate(request, user=agent.user)
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = view(request)
+                if hasattr(response, 'render'):
+                    response.render()
+                timings.append((time.perf_counter() - started) * 1000)
+            query_counts.append(len(context.captured_queries))
+            status_code = response.status_code
+            if explained < EXPLAIN_SAMPLES:
+                scanned = explain_rows_scanned(context.captured_queries)
+                explained += 1
+
+        results.append(ScenarioResult(
+            name=scenario.name,
+            requests=len(timings),
+            status_code=status_code,
+            p50_ms=percentile(timings, 50),
+            p95_ms=percentile(timings, 95),
+            p99_ms=percentile(timings, 99),
+            queries=sum(query_counts) / len(query_counts),
+            rows_scanned=scanned,
+        ))
+    return results
+
+
+def save_baseline(path: str, results: t.Sequence[ScenarioResult], properties: int):
+    data = {
+        'properties': properties,
+        'scenarios': {result.name: result._asdict() for result in results},
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def load_baseline(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results: t.Sequence[ScenarioResult], baseline: dict,
+            tolerance: float = 0.2) -> t.List[str]:
+    """
+    Regressions against ``baseline``: p95 latency or rows scanned grown by
+    more than ``tolerance``, or more queries per request.
+    """
+    regressions = []
+    for result in results:
+        before = baseline['scenarios'].get(result.name)
+        if not before:
+            continue
+        if result.p95_ms > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{result.name}: p95 {before["p95_ms"]:.1f} -> {result.p95_ms:.1f} ms')
+        if result.queries > before['queries']:
+            regressions.append(f'{result.name}: queries {before["queries"]:g} -> {result.queries:g}')
+        if result.rows_scanned > before['rows_scanned'] * (1 + tolerance):
+            regressions.append(
+                f'{result.name}: rows scanned {before["rows_scanned"]} -> {result.rows_scanned}'
+            )
+    return regressions
@@ -0,0 +1,92 @@
+"""
+Consumers of the PropertyChangeEvent outbox.
+
+``dispatch_property_change_events`` passes every batch of events to the
+handlers of ``CHANGE_EVENT_HANDLERS`` and then to the callables named in the
+``PROPERTY_CHANGE_EVENT_HANDLERS`` setting (dotted paths). Delivery is at
+least once: a batch whose handler failed is passed again to every handler,
+so handlers must be idempotent.
+
+CDN purge hooks are callables named in ``PROPERTY_CDN_PURGE_HOOKS``, they get
+the API paths of the changed properties.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from pgr_django.properties.constants import EVENT_DELETED
+from pgr_django.properties.models import SEARCH_FIELDS, SEARCH_VECTOR, Property
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION_KEY = 'properties:cache-version'
+
+
+def property_cache_version() -> int:
+    """Part of the keys of cached property results, bumped on every change."""
+    version = cache.get(CACHE_VERSION_KEY)
+    if version is None:
+        cache.add(CACHE_VERSION_KEY, 1, None)
+        version = cache.get(CACHE_VERSION_KEY, 1)
+    return version
+
+
+def invalidate_property_caches(events: list):
+    # responses cached by ETag (conditional.py) invalidate themselves
+    cache.add(CACHE_VERSION_KEY, 1, None)
+    cache.incr(CACHE_VERSION_KEY)
+
+
+def refresh_search_vectors(events: list):
+    """Updates search_vector of rows changed without signals (``tracked_update``)."""
+    ids = {
+        event.property_id for event in events
+        if event.kind != EVENT_DELETED
+        and (not event.fields or set(event.fields) & set(SEARCH_FIELDS))
+    }
+    if ids:
+        Property.objects.filter(id__in=ids).update(search_vector=SEARCH_VECTOR)
+
+
+def property_paths(property_id: int) -> list:
+    return [
+        reverse('properties:get', kwargs={'pk': property_id}),
+        reverse('properties:property-low-detailed', kwargs={'pk': property_id}),
+        reverse('properties:photo-list', kwargs={'property_id': property_id}),
+        reverse('properties:file-list', kwargs={'property_id': property_id}),
+    ]
+
+
+def purge_cdn(events: list):
+    hooks = getattr(settings, 'PROPERTY_CDN_PURGE_HOOKS', ())
+    if not hooks:
+        return
+    paths = [
+        path
+        for property_id in sorted({event.property_id for event in events})
+        for path in property_paths(property_id)
+    ]
+    for hook in hooks:
+        import_string(hook)(paths)
+
+
+CHANGE_EVENT_HANDLERS = (
+    invalidate_property_caches,
+    refresh_search_vectors,
+    purge_cdn,
+)
+
+
+def change_event_handlers() -> list:
+    return [
+        *CHANGE_EVENT_HANDLERS,
+        *(import_string(path) for path in getattr(settings, 'PROPERTY_CHANGE_EVENT_HANDLERS', ())),
+    ]
+
+
+def handle_change_events(events: list):
+    for handler in change_event_handlers():
+        handler(events)
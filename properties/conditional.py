@@ -0,0 +1,222 @@
+"""
+Conditional GET (ETag / Last-Modified) for property endpoints.
+
+Validators are read with one lightweight query before the view runs, so a
+matching ``If-None-Match``/``If-Modified-Since`` is answered with 304 without
+serializing anything. Rendered 200 responses are cached per version (the ETag
+is part of the cache key), so a cached body never outlives its validators.
+
+Last-Modified only moves on saves and new attachments; deleted attachments,
+translation, status and agent changes are covered by the ETag, which clients
+send in preference to If-Modified-Since.
+"""
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max, OuterRef, Subquery, TextField, Value, Window
+from django.db.models.functions import MD5, Cast, Coalesce, Concat
+from django.utils import translation
+from django.utils.cache import get_conditional_response, patch_response_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.pagination import PageNumberPagination
+
+from .instrumentation import record_cache
+from .models import PropertyPhoto, PropertyFile
+
+ATTACHMENTS = {
+    'photos': (PropertyPhoto, 'photo'),
+    'files': (PropertyFile, 'file'),
+}
+TRANSLATION_FIELDS = (
+    'description_translation__translation_status',
+    'description_translation__translations',
+)
+# fields read by AgentSearchSerializer
+AGENT_FIELDS = (
+    'agent__first_name',
+    'agent__last_name',
+    'agent__rating_avg',
+    'agent__description',
+    'agent__photo',
+    'agent__additional_photo',
+    'agent__additional_photo_two',
+    'agent__user__is_active',
+    'agent__broker__owner_name',
+)
+CACHE_KEY_PREFIX = 'properties:conditional'
+
+
+def _fingerprint(*fields):
+    parts = []
+    for field in fields:
+        parts += [Coalesce(Cast(field, TextField()), Value('')), Value('|')]
+    return MD5(Concat(*parts, output_field=TextField()))
+
+
+class PropertyVersion:
+    """
+    Columns that identify the serialized state of a property.
+
+    ``updated_at`` and ``status`` (changed by bulk updates) are always read,
+    related data is added on demand.
+    """
+    def __init__(self, attachments=False, translation=False, agent=False):
+        self.attachments = attachments
+        self.translation = translation
+        self.agent = agent
+
+    @property
+    def changed_at_columns(self) -> list:
+        columns = ['updated_at']
+        if self.attachments:
+            columns += [f'{name}_changed_at' for name in ATTACHMENTS]
+        return columns
+
+    def rows(self, queryset, *columns):
+        annotations = {}
+        if self.attachments:
+            for name, (model, file_field) in ATTACHMENTS.items():
+                attachments = model.objects.filter(
+                    property_id=OuterRef('pk')
+                ).order_by().values('property_id')
+                annotations[f'{name}_signature'] = Subquery(attachments.annotate(
+                    signature=StringAgg(
+                        Concat(
+                            Cast('id', TextField()), Value(':'),
+                            Coalesce(Cast('order', TextField()), Value('')), Value(':'),
+                            file_field,
+                            output_field=TextField(),
+                        ),
+                        delimiter=',',
+                        ordering='id',
+                    )
+                ).values('signature'))
+                annotations[f'{name}_changed_at'] = Subquery(
+                    attachments.annotate(changed_at=Max('created_at')).values('changed_at')
+                )
+        if self.translation:
+            annotations['translation_fingerprint'] = _fingerprint(*TRANSLATION_FIELDS)
+        if self.agent:
+            annotations['agent_fingerprint'] = _fingerprint(*AGENT_FIELDS)
+
+        return queryset.annotate(**annotations).values_list(
+            'pk', 'updated_at', 'status', 'agent_id', *annotations, *columns, named=True
+        )
+
+    def validators(self, request, rows, *extra) -> tuple:
+        """``(etag, last_modified)`` of ``rows`` rendered for ``request``."""
+        digest = hashlib.md5()
+        for value in (request.accepted_renderer.format, translation.get_language(), *extra):
+            digest.update(f'{value}|'.encode())
+        for row in rows:
+            digest.update(repr(tuple(row)).encode())
+
+        timestamps = [
+            getattr(row, column) for row in rows for column in self.changed_at_columns
+        ]
+        last_modified = max(filter(None, timestamps), default=None)
+        return quote_etag(digest.hexdigest()), last_modified
+
+
+def detail_validators(version: PropertyVersion):
+    def validators(view, request, *args, **kwargs):
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        queryset = view.get_queryset().select_related(None).prefetch_related(None)
+        try:
+            row = version.rows(
+                queryset.filter(**{view.lookup_field: kwargs[lookup_url_kwarg]})
+            ).first()
+        except (TypeError, ValueError, ValidationError):
+            row = None
+        # missing objects are left to the view (404)
+        return row and version.validators(request, [row])
+    return validators
+
+
+def list_validators(version: PropertyVersion):
+    """Validators of the requested page (and total count) of a paginated list."""
+    def validators(view, request, *args, **kwargs):
+        paginator = view.paginator
+        if not isinstance(paginator, PageNumberPagination):
+            return None
+        page_size = paginator.get_page_size(request)
+        try:
+            page_number = int(request.query_params.get(paginator.page_query_param, 1))
+        except ValueError:
+            return None
+        if not page_size or page_number < 1:
+            return None
+
+        queryset = view.filter_queryset(view.get_queryset())
+        queryset = queryset.select_related(None).prefetch_related(None).annotate(
+            total=Window(Count('pk'))
+        )
+        offset = (page_number - 1) * page_size
+        rows = list(version.rows(queryset, 'total')[offset:offset + page_size])
+        if not rows:
+            return None
+        return version.validators(request, rows, page_size)
+    return validators
+
+
+def conditional_get(validators, cache_timeout=None):
+    """
+    View method decorator answering conditional GETs from ``validators``.
+
+    ``validators(view, request, *args, **kwargs)`` returns ``(etag,
+    last_modified)`` or ``None`` to skip conditional handling. With
+    ``cache_timeout`` rendered responses are cached per path and ETag and
+    sent with the same caching headers as ``cache_page``.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            found = validators(view, request, *args, **kwargs)
+            if not found:
+                return method(view, request, *args, **kwargs)
+
+            etag, last_modified = found
+            response = get_conditional_response(
+                request,
+                etag=etag,
+                last_modified=last_modified and timegm(last_modified.utctimetuple()),
+            )
+            if response is None:
+                response = _cached_response(
+                    method, etag, cache_timeout, view, request, *args, **kwargs
+                )
+            if response.status_code in (200, 304):
+                if not response.has_header('ETag'):
+                    response['ETag'] = etag
+                if last_modified and not response.has_header('Last-Modified'):
+                    response['Last-Modified'] = http_date(timegm(last_modified.utctimetuple()))
+                if cache_timeout is not None:
+                    patch_response_headers(response, cache_timeout)
+            return response
+        return wrapper
+    return decorator
+
+
+def _cached_response(method, etag, cache_timeout, view, request, *args, **kwargs):
+    if cache_timeout is None:
+        return method(view, request, *args, **kwargs)
+
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    cache_key = f'{CACHE_KEY_PREFIX}:{path}:{etag}'
+    response = cache.get(cache_key)
+    record_cache(response is not None)
+    if response is None:
+        response = method(view, request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        if hasattr(response, 'render') and callable(response.render):
+            response.add_post_render_callback(
+                lambda rendered: cache.set(cache_key, rendered, cache_timeout)
+            )
+        else:
+            cache.set(cache_key, response, cache_timeout)
+    return response
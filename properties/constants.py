@@ -75,6 +75,9 @@ TRANSLATION_CHOICES = (
     (TRANSLATION_SCHEDULED, "Scheduled"),
     (TRANSLATION_PROCESSING, "Processing"),
 )
+# Google translations of PropertyDescTranslation
+SOURCE_LANGUAGE = 'en'
+NEW_LANGUAGES = ['ko', 'fr']
 
 # Translations
 RENT = 'rent'
@@ -97,6 +100,18 @@ PROPERTIES_FILE_STATUSES = (
     (FILE_STATUS_ERROR, 'error')
 )
 
+# PropertyChangeEvent kinds
+EVENT_CREATED = 'created'
+EVENT_UPDATED = 'updated'
+EVENT_DELETED = 'deleted'
+EVENT_MEDIA = 'media'
+EVENT_KIND_CHOICES = (
+    (EVENT_CREATED, 'Created'),
+    (EVENT_UPDATED, 'Updated'),
+    (EVENT_DELETED, 'Deleted'),
+    (EVENT_MEDIA, 'Photos or files changed'),
+)
+
 # Countries lists for advanced search
 MULTI_COUNTRY_NAMES = {
     'United States': ['USA', 'United States', 'US', 'America'],
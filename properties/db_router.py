@@ -0,0 +1,159 @@
+"""
+Read replica routing for public property reads.
+
+Views opt in with ``ReplicaReadMixin``: their safe requests read from one of
+``DATABASE_REPLICAS`` (database aliases), everything else keeps using the
+primary. Reads fall back to the primary when
+
+- no replica is within ``REPLICA_MAX_LAG`` seconds of it (checked at most
+  every ``REPLICA_LAG_CHECK_INTERVAL`` seconds per alias),
+- the request has already written something, or runs inside a transaction,
+- the user wrote through a ``PinPrimaryAfterWriteMixin`` view less than
+  ``REPLICA_PIN_SECONDS`` ago, so agents see their own edits.
+
+Enable with ``DATABASE_ROUTERS = ['pgr_django.properties.db_router.ReplicaRouter']``.
+Locally a replica alias may point at the primary server (its lag is 0), with
+``'TEST': {'MIRROR': 'default'}`` so tests share the test database.
+"""
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_LAG = 5
+DEFAULT_LAG_CHECK_INTERVAL = 5
+DEFAULT_PIN_SECONDS = 30
+PIN_CACHE_KEY = 'db-router:primary-pin:{}'
+
+LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+class ReplicaReads:
+    """Replica routing state of one request."""
+
+    def __init__(self):
+        self.wrote = False
+
+
+_replica_reads = ContextVar('replica_reads', default=None)
+# alias -> (monotonic time of the check, lag in seconds or None when unreachable)
+_lag_checks = {}
+
+
+def replicas() -> list:
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def replica_lag(alias: str):
+    """Replication lag of ``alias`` in seconds, ``None`` when it can't be read."""
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            return float(cursor.fetchone()[0])
+    except DatabaseError:
+        logger.warning('Replica %s is unreachable, reading from the primary.', alias, exc_info=True)
+        return None
+
+
+def replica_is_fresh(alias: str) -> bool:
+    interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', DEFAULT_LAG_CHECK_INTERVAL)
+    checked_at, lag = _lag_checks.get(alias, (None, None))
+    now = time.monotonic()
+    if checked_at is None or now - checked_at >= interval:
+        lag = replica_lag(alias)
+        _lag_checks[alias] = (now, lag)
+    return lag is not None and lag <= getattr(settings, 'REPLICA_MAX_LAG', DEFAULT_MAX_LAG)
+
+
+@contextmanager
+def replica_reads():
+    """Lets reads in the block go to a replica."""
+    token = _replica_reads.set(ReplicaReads())
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def pin_to_primary(user_id: int):
+    """Reads of ``user_id`` stay on the primary until replicas caught up."""
+    cache.set(
+        PIN_CACHE_KEY.format(user_id), True,
+        getattr(settings, 'REPLICA_PIN_SECONDS', DEFAULT_PIN_SECONDS),
+    )
+
+
+def is_pinned_to_primary(user) -> bool:
+    return bool(user and user.is_authenticated and cache.get(PIN_CACHE_KEY.format(user.pk)))
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _replica_reads.get()
+        if state is None or state.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        fresh = [alias for alias in replicas() if replica_is_fresh(alias)]
+        return random.choice(fresh) if fresh else None
+
+    def db_for_write(self, model, **hints):
+        state = _replica_reads.get()
+        if state is not None:
+            # read your writes for the rest of the request
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Serves safe requests of an API view from a replica. Users pinned by
+    ``PinPrimaryAfterWriteMixin`` keep reading from the primary.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not is_pinned_to_primary(request.user):
+            self._replica_reads_token = _replica_reads.set(ReplicaReads())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_reads_token', None)
+        if token is not None:
+            self._replica_reads_token = None
+            _replica_reads.reset(token)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class PinPrimaryAfterWriteMixin:
+    """Pins the user of a successful unsafe request to the primary."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in SAFE_METHODS and response.status_code < 400 \
+                and request.user.is_authenticated:
+            pin_to_primary(request.user.pk)
+        return response
@@ -0,0 +1,168 @@
+"""
+Streaming CSV and XLSX exports of the property list views.
+
+Rows are read through a server-side cursor (``QuerySet.iterator``) and
+serialized a chunk at a time by the view's row serializer, so agents, photos
+and payments are loaded once per chunk. Memory use does not grow with the
+number of exported properties:
+
+- CSV lines are sent as they are produced,
+- XLSX needs xlsxwriter (optional), its ``constant_memory`` mode keeps one
+  row in memory and the workbook in a temporary file, which is streamed once
+  complete.
+"""
+import csv
+import tempfile
+from datetime import date
+
+from django.http import FileResponse, StreamingHttpResponse
+from rest_framework import serializers, status
+from rest_framework.negotiation import BaseContentNegotiation
+
+try:
+    import xlsxwriter
+except ImportError:  # pragma: no cover
+    xlsxwriter = None
+
+from .filters import BadParametersException
+
+EXPORT_CHUNK_SIZE = 2000
+# nested representations exported as one column per key
+SPLIT_COLUMNS = {
+    'location': ('lat', 'lng'),
+    'agent': ('id', 'first_name', 'last_name'),
+    'payment': ('id',),
+    'subscription': ('id',),
+}
+NUMERIC_FIELDS = (serializers.DecimalField, serializers.FloatField, serializers.IntegerField)
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# text starting with these runs as a formula in spreadsheet applications
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class ExportContentNegotiation(BaseContentNegotiation):
+    """Exports are files whatever the client accepts, errors use the first renderer."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class Echo:
+    """File-like object returning what is written, for ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def export_columns(row_serializer_class, annotations=()) -> tuple:
+    """Header and ``(field, key, numeric)`` of every exported column."""
+    header = []
+    columns = []
+    for name, field in row_serializer_class.serializer_class().fields.items():
+        if name in SPLIT_COLUMNS:
+            for key in SPLIT_COLUMNS[name]:
+                header.append(f'{name}_{key}')
+                columns.append((name, key, name == 'location'))
+        else:
+            header.append(name)
+            columns.append((name, None, isinstance(field, NUMERIC_FIELDS)))
+    for name in annotations:
+        header.append(name)
+        columns.append((name, None, True))
+    return header, columns
+
+
+def cell(value, numeric=False):
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        value = '\n'.join(str(item) for item in value)
+    if not numeric and isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # user text (titles, addresses, names) is quoted to stay text
+        return f"'{value}"
+    return value
+
+
+def export_rows(view, queryset, columns, max_rows=None):
+    """Cells of every property of ``queryset``, serialized per chunk."""
+    row_serializer_class = view.row_serializer_class
+    annotations = row_serializer_class.get_annotations(queryset)
+    rows = row_serializer_class.get_rows(queryset)
+    if max_rows:
+        rows = rows[:max_rows]
+
+    def serialize(chunk):
+        for item in row_serializer_class(chunk, annotations).data:
+            yield [
+                cell(item[name] if key is None else (item[name] or {}).get(key), numeric)
+                for name, key, numeric in columns
+            ]
+
+    chunk = []
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) == EXPORT_CHUNK_SIZE:
+            yield from serialize(chunk)
+            chunk = []
+    if chunk:
+        yield from serialize(chunk)
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def xlsx_file(header, rows, numeric):
+    output = tempfile.TemporaryFile()
+    workbook = xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'strings_to_urls': False,
+        'strings_to_formulas': False,
+    })
+    sheet = workbook.add_worksheet()
+    sheet.write_row(0, 0, header)
+    for index, row in enumerate(rows, start=1):
+        for column, value in enumerate(row):
+            if numeric[column] and value != '':
+                sheet.write_number(index, column, float(value))
+            elif isinstance(value, str):
+                sheet.write_string(index, column, value)
+            else:
+                sheet.write(index, column, value)
+    workbook.close()
+    output.seek(0)
+    return output
+
+
+def export_formats() -> tuple:
+    return ('csv', 'xlsx') if xlsxwriter is not None else ('csv',)
+
+
+def export_response(view, file_format: str, max_rows: int = None):
+    """Whole filtered queryset of a view with a ``row_serializer_class`` as a file."""
+    if file_format not in export_formats():
+        raise BadParametersException(f'one of {", ".join(export_formats())}', 'file_format',
+                                     status_code=status.HTTP_400_BAD_REQUEST)
+
+    queryset = view.filter_queryset(view.get_queryset())
+    header, columns = export_columns(
+        view.row_serializer_class, view.row_serializer_class.get_annotations(queryset)
+    )
+    rows = export_rows(view, queryset, columns, max_rows)
+    filename = f'{view.export_name}-{date.today().isoformat()}.{file_format}'
+
+    if file_format == 'xlsx':
+        numeric = [is_numeric for _, _, is_numeric in columns]
+        return FileResponse(
+            xlsx_file(header, rows, numeric), as_attachment=True, filename=filename,
+            content_type=XLSX_CONTENT_TYPE,
+        )
+    response = StreamingHttpResponse(csv_lines(header, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -1,6 +1,8 @@
 import typing as t
-from django.db.models import F, Case, When, Value, DecimalField
-from django.contrib.gis.geos import GEOSGeometry
+from django.db.models import F, Case, When, Value, DecimalField, FloatField, Func
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.geos import GEOSGeometry, Point
 from django.utils.encoding import force_text
 from rest_framework import filters, status
 from rest_framework.exceptions import APIException
@@ -13,6 +15,7 @@ from .constants import (
     STATUS_DELETED,
     MULTI_COUNTRY_NAMES,
 )
+from .models import as_geography
 
 
 class NoParametersException(APIException):
@@ -66,6 +69,37 @@ class BboxGEOSGeometry(GEOSGeometry):
         super().__init__(bbox.as_linestring(), srid=4326)
 
 
+class NearPoint(Point):
+    """near=lon,lat (same axis order as bbox)"""
+
+    def __init__(self, near: str):
+        if not isinstance(near, str):
+            raise ValueError("missing or invalid near input")
+
+        try:
+            x, y = [float(value) for value in near.split(',')]
+        except ValueError as e:
+            raise ValueError(str(e))
+        super().__init__(x, y, srid=4326)
+
+
+class KNNDistance(Func):
+    """
+    ``<->`` distance of geographies, answered in order by the GiST index of
+    ``field::geography``. Geographies, unlike 4326 geometries compared in
+    degrees, are ordered by the spherical meters ``Distance`` returns.
+    """
+    arg_joiner = ' <-> '
+    template = '%(expressions)s'
+    output_field = FloatField()
+
+    def __init__(self, field: str, point: Point):
+        super().__init__(
+            as_geography(field),
+            Value(point, output_field=PointField(geography=True, srid=point.srid)),
+        )
+
+
 def validate_property_search_statuses(statuses: t.List):
     not_allowed = set(statuses).difference({STATUS_ACTIVE, STATUS_SOLD})
     if not_allowed:
@@ -94,6 +128,9 @@ BASE_SEARCH_FILTERS = {
     'buyrent': (str, None, 'buy_rent__exact', None),
     'minprice': (float, None, 'price_avg__gte', None),
     'maxprice': (float, None, 'price_avg__lte', None),
+    # same as minprice/maxprice, in USD for all currencies
+    'minpriceusd': (float, None, 'price_usd__gte', None),
+    'maxpriceusd': (float, None, 'price_usd__lte', None),
     'minarea': (float, None, 'size__gte', None),
     'maxarea': (float, None, 'size__lte', None),
     'minbaths': (int, None, 'baths__gte', None),
@@ -118,6 +155,15 @@ SEARCH_MY_PROPERTIES_FILTERS['status'] = (
 )
 
 
+def search_param_values(main_type, value):
+    """Values a search param filters on: stripped, split into a list for lists."""
+    if main_type is list:
+        if isinstance(value, (list, set)):
+            return list(value)
+        return [val.strip() for val in value.split(',')]
+    return value.strip()
+
+
 class PropertySearchFilterBackend(filters.BaseFilterBackend):
     """
     Filter properties by fixed fields.
@@ -125,6 +171,8 @@ class PropertySearchFilterBackend(filters.BaseFilterBackend):
     default_status_filter = {STATUS_ACTIVE}
     require_filters = True  # status filter excluded
     type_conversion = SEARCH_FILTERS
+    # handled by other backends, but enough to not require filters
+    other_filter_params = ('near',)
 
     def filter_queryset(self, request, queryset, view):
         queryset = queryset.annotate(
@@ -158,11 +206,9 @@ class PropertySearchFilterBackend(filters.BaseFilterBackend):
             if not field_def:
                 continue
             main_type, secondary_type, drf_search_field, validator = field_def
+            value = search_param_values(main_type, value)
             if main_type is list:
-                if not isinstance(value, (list, set)):
-                    split_vals = value.split(',')
-                else:
-                    split_vals = value
+                split_vals = value
                 try:
                     if '__upper' in drf_search_field:
                         search_val = [secondary_type(val).upper() for val in split_vals]
@@ -186,6 +232,9 @@ class PropertySearchFilterBackend(filters.BaseFilterBackend):
 
             queryset = queryset.filter(**{drf_search_field: search_val})
 
+        filters_applied = filters_applied or any(
+            param in query_params for param in self.other_filter_params
+        )
         if self.require_filters and not filters_applied:
             raise NoParametersException()
 
@@ -196,3 +245,60 @@ class PropertySearchMyPropertiesFilterBackend(PropertySearchFilterBackend):
     default_status_filter = None
     require_filters = False
     type_conversion = SEARCH_MY_PROPERTIES_FILTERS
+
+
+class PropertyNearFilterBackend(filters.BaseFilterBackend):
+    """
+    Orders properties by distance to ``near`` and annotates the distance.
+
+    Must come after OrderingFilter: nearest first replaces any other ordering,
+    so the location geography index can return the page without sorting all matches.
+    """
+    near_param = 'near'
+
+    def filter_queryset(self, request, queryset, view):
+        near = request.query_params.get(self.near_param)
+        if not near:
+            return queryset
+
+        try:
+            point = NearPoint(near)
+        except ValueError as e:
+            raise BadParametersException(f'Invalid parameter type: {str(e)}', self.near_param,
+                                         status_code=status.HTTP_400_BAD_REQUEST)
+
+        return queryset.annotate(
+            distance=Distance('location', point)
+        ).order_by(KNNDistance('location', point), 'pk')
+
+
+PRICE_FILTERS = ('minprice', 'maxprice', 'minpriceusd', 'maxpriceusd')
+
+
+class PropertyPriceHistogramFilterBackend(PropertySearchFilterBackend):
+    """
+    Search filters without the price range, so a price slider shows the
+    whole distribution of the current search.
+    """
+    require_filters = False
+    type_conversion = {
+        key: value for key, value in SEARCH_FILTERS.items() if key not in PRICE_FILTERS
+    }
+
+    def get_signature(self, request) -> dict:
+        """Canonical form of the filters applied to ``request``."""
+        signature = {}
+        for key, value in request.GET.items():
+            field_def = self.type_conversion.get(key)
+            if not field_def:
+                continue
+            main_type, _secondary_type, drf_search_field, _validator = field_def
+            values = search_param_values(main_type, value)
+            if main_type is list:
+                values = set(values)
+                if '__upper' in drf_search_field:
+                    values = {val.upper() for val in values}
+                signature[key] = sorted(values)
+            else:
+                signature[key] = values
+        return signature
@@ -0,0 +1,193 @@
+"""
+Per-request timings of the property API hot path.
+
+``ServerTimingMiddleware`` samples requests (``SERVER_TIMING_SAMPLE_RATE``,
+0 to 1, off by default) and records for sampled ones the time spent in SQL,
+serializers, caches, Rosetta translations and external APIs. Every sampled
+request is logged as one structured record and, with ``SERVER_TIMING_HEADER``
+(defaults to ``DEBUG``), the timings are sent in a ``Server-Timing`` header.
+
+Code marks its phases with ``timed(phase)``, which is a no-op outside of a
+sampled request. Phases may overlap: SQL run by a serializer is counted both
+in ``db`` and in ``serialize``.
+
+Enable with ``pgr_django.properties.instrumentation.ServerTimingMiddleware``
+first in ``MIDDLEWARE``, so its total includes the other middlewares.
+"""
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.middleware.cache import CacheMiddleware
+from django.utils.decorators import decorator_from_middleware_with_args
+
+logger = logging.getLogger(__name__)
+
+PHASE_DB = 'db'
+PHASE_SERIALIZE = 'serialize'
+PHASE_CACHE = 'cache'
+PHASE_ROSETTA = 'rosetta'
+PHASE_GOOGLE_TRANSLATE = 'google-translate'
+PHASE_GOOGLE_GEOCODING = 'google-geocoding'
+PHASE_GOOGLE_STREET_VIEW = 'google-street-view'
+PHASE_STRIPE = 'stripe'
+
+_request_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Total milliseconds and number of calls per phase of one request."""
+
+    def __init__(self):
+        self.phases = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # phases being timed, nested calls of the same phase are not added twice
+        self.running = set()
+
+    def add(self, phase: str, duration_ms: float):
+        totals = self.phases.setdefault(phase, [0.0, 0])
+        totals[0] += duration_ms
+        totals[1] += 1
+
+    def as_dict(self, total_ms: float) -> dict:
+        data = {
+            phase: {'ms': round(duration_ms, 2), 'count': count}
+            for phase, (duration_ms, count) in self.phases.items()
+        }
+        data['total'] = {'ms': round(total_ms, 2)}
+        if self.cache_hits or self.cache_misses:
+            data[PHASE_CACHE] = {
+                **data.get(PHASE_CACHE, {}),
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+            }
+        return data
+
+    def server_timing(self, total_ms: float) -> str:
+        metrics = [
+            f'{phase};dur={duration_ms:.1f};desc="{count}"'
+            for phase, (duration_ms, count) in self.phases.items()
+            if phase != PHASE_CACHE
+        ]
+        if self.cache_hits or self.cache_misses:
+            cache_ms = self.phases.get(PHASE_CACHE, [0.0])[0]
+            metrics.append(
+                f'{PHASE_CACHE};dur={cache_ms:.1f};'
+                f'desc="{self.cache_hits} hit {self.cache_misses} miss"'
+            )
+        metrics.append(f'total;dur={total_ms:.1f}')
+        return ', '.join(metrics)
+
+
+def current_timings():
+    """Timings of the running request, ``None`` when it is not sampled."""
+    return _request_timings.get()
+
+
+@contextmanager
+def timed(phase: str):
+    """Adds the duration of the block (or decorated function) to ``phase``."""
+    timings = _request_timings.get()
+    if timings is None or phase in timings.running:
+        yield
+        return
+
+    timings.running.add(phase)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.running.discard(phase)
+        timings.add(phase, (time.perf_counter() - started) * 1000)
+
+
+def record_cache(hit: bool):
+    timings = _request_timings.get()
+    if timings is None:
+        return
+    if hit:
+        timings.cache_hits += 1
+    else:
+        timings.cache_misses += 1
+
+
+def _db_timer(timings: RequestTimings):
+    def execute_wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            timings.add(PHASE_DB, (time.perf_counter() - started) * 1000)
+    return execute_wrapper
+
+
+class ServerTimingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'SERVER_TIMING_SAMPLE_RATE', 0.0)
+        self.send_header = getattr(settings, 'SERVER_TIMING_HEADER', settings.DEBUG)
+
+    def __call__(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_db_timer(timings)))
+                response = self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        logger.info(
+            'Request timings %s %s: %.1f ms', request.method, request.path, total_ms,
+            extra={
+                'path': request.path,
+                'method': request.method,
+                'status_code': response.status_code,
+                'timings': timings.as_dict(total_ms),
+            },
+        )
+        if self.send_header:
+            response['Server-Timing'] = timings.server_timing(total_ms)
+        return response
+
+
+class TimedCacheMiddleware(CacheMiddleware):
+    """``CacheMiddleware`` recording page cache hits and misses."""
+
+    def process_request(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return super().process_request(request)
+        with timed(PHASE_CACHE):
+            response = super().process_request(request)
+        record_cache(response is not None)
+        return response
+
+
+def timed_cache_page(timeout, *, cache=None, key_prefix=None):
+    """``cache_page`` with hits and misses in the request timings."""
+    return decorator_from_middleware_with_args(TimedCacheMiddleware)(
+        page_timeout=timeout, cache_alias=cache, key_prefix=key_prefix,
+    )
+
+
+class TimedSerializerMixin:
+    """
+    Adds ``to_representation`` time to the ``serialize`` phase, once per
+    object for ``many=True``.
+    """
+
+    def to_representation(self, instance):
+        with timed(PHASE_SERIALIZE):
+            return super().to_representation(instance)
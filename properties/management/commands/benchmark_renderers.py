@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from pgr_django.properties.benchmarks.renderers import (
+    benchmark_renderers,
+    build_payloads,
+)
+
+
+class Command(BaseCommand):
+    help = 'Compares JSONRenderer and ORJSONRenderer on property API payloads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500,
+                            help='Properties per list payload.')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Renders per payload and renderer.')
+
+    def handle(self, *args, **options):
+        payloads = build_payloads(options['limit'])
+        results = benchmark_renderers(payloads, options['repeat'])
+
+        self.stdout.write(
+            f'{"payload":<12} {"bytes":>10} {"json ms":>10} {"orjson ms":>10} '
+            f'{"speedup":>8}  identical'
+        )
+        for result in results:
+            line = (
+                f'{result.payload:<12} {result.size:>10} {result.json_ms:>10.2f} '
+                f'{result.orjson_ms:>10.2f} {result.speedup:>7.1f}x  {result.identical}'
+            )
+            if result.identical:
+                self.stdout.write(line)
+            else:
+                self.stdout.write(self.style.WARNING(line))
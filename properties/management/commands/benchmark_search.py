@@ -0,0 +1,92 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pgr_django.properties.benchmarks.search import (
+    BENCHMARK_RUN_TOKEN,
+    SCENARIOS,
+    compare,
+    delete_generated,
+    generate_properties,
+    load_baseline,
+    run_scenarios,
+    save_baseline,
+)
+from pgr_django.properties.models import Property
+from pgr_django.users.models import Agent
+
+
+class Command(BaseCommand):
+    help = 'Load benchmark of the property search endpoints on synthetic data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--generate', type=int, default=0,
+                            help='Properties to bulk insert before the run.')
+        parser.add_argument('--repeat', type=int, default=10,
+                            help='Requests per scenario weight unit.')
+        parser.add_argument('--scenario', action='append', default=[],
+                            help='Run only these scenarios.')
+        parser.add_argument('--baseline',
+                            help='Baseline JSON file to compare with. None is committed, the '
+                                 'numbers depend on the machine: create it first with '
+                                 '--save-baseline on the same machine and data size.')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Write the results to --baseline instead of comparing.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed p95 and rows scanned growth against the baseline.')
+        parser.add_argument('--cleanup', action='store_true',
+                            help='Delete generated properties and exit.')
+
+    def handle(self, *args, **options):
+        if settings.WORKING_ENV == 'prod':
+            raise CommandError('Refusing to run the search benchmark on production.')
+
+        if options['cleanup']:
+            self.stdout.write(f'Deleted {delete_generated()} objects.')
+            return
+
+        if options['generate']:
+            agent = generate_properties(options['generate'], log=self.stdout.write)
+        else:
+            agent = Agent.objects.filter(
+                properties__run_token=BENCHMARK_RUN_TOKEN, broker__isnull=False
+            ).first()
+            if agent is None:
+                raise CommandError('No generated properties, run with --generate first.')
+
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if not options['scenario'] or scenario.name in options['scenario']
+        ]
+        results = run_scenarios(scenarios, repeat=options['repeat'], agent=agent)
+
+        self.stdout.write(
+            f'{"scenario":<24} {"status":>6} {"requests":>8} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"p99 ms":>8} {"queries":>8} {"rows scanned":>13}'
+        )
+        for result in results:
+            self.stdout.write(
+                f'{result.name:<24} {result.status_code:>6} {result.requests:>8} '
+                f'{result.p50_ms:>8.1f} {result.p95_ms:>8.1f} {result.p99_ms:>8.1f} '
+                f'{result.queries:>8.1f} {result.rows_scanned:>13}'
+            )
+
+        if not options['baseline']:
+            return
+        if options['save_baseline']:
+            save_baseline(options['baseline'], results, Property.objects.count())
+            self.stdout.write(f'Baseline saved to {options["baseline"]}.')
+            return
+
+        if not os.path.exists(options['baseline']):
+            raise CommandError(
+                f'No baseline at {options["baseline"]}, run with --save-baseline first.'
+            )
+        baseline = load_baseline(options['baseline'])
+        regressions = compare(results, baseline, tolerance=options['tolerance'])
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(regression))
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}.')
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
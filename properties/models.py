@@ -1,7 +1,24 @@
+import re
+import typing as t
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import ROUND_HALF_UP, Decimal
+
 from django.contrib.gis.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    SearchVectorField,
+    TrigramSimilarity,
+)
 from django.contrib.gis.geos import Point
 from django.contrib.sites.models import Site
-from django.db import transaction
+from django.db import connections, router, transaction
+from django.db.models.functions import Cast, Coalesce, Greatest
 from django.utils import translation
 from django.utils.functional import cached_property
 from django.utils.translation import gettext, gettext_lazy
@@ -17,6 +34,8 @@ from pgr_django.properties.constants import (
     TRANSLATION_OUTDATED,
     PROPERTIES_FILE_STATUSES,
     STATUS_PENDING,
+    EVENT_KIND_CHOICES,
+    EVENT_UPDATED,
 )
 from pgr_django.users.models import Agent
 from config.constants import LANGUAGE_CHOICES
@@ -25,6 +44,113 @@ from pgr_django.properties.constants import (
     RENT, TR_FOR_SALE_IN, TR_FOR_RENT_IN, TR_WITH_DASHES,
 )
 
+# addresses are multilingual, so no stemming
+SEARCH_CONFIG = 'simple'
+SEARCH_VECTOR = (
+    SearchVector('address', 'street', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('city', 'zip_code', weight='B', config=SEARCH_CONFIG)
+    + SearchVector('region', 'country', weight='C', config=SEARCH_CONFIG)
+    + SearchVector('description', weight='D', config=SEARCH_CONFIG)
+)
+SEARCH_FIELDS = (
+    'address', 'street', 'city', 'zip_code', 'region', 'country', 'description',
+)
+# columns with a trigram index, for misspelled input
+TRIGRAM_SEARCH_FIELDS = ('address', 'street', 'city', 'zip_code')
+
+
+def as_geography(field: str) -> Cast:
+    """``field::geography``, distances on it are spherical meters."""
+    return Cast(field, output_field=models.PointField(geography=True, srid=4326))
+
+
+def prefix_search_query(text: str) -> t.Optional[SearchQuery]:
+    """Query matching every word of ``text`` as a prefix ("kyiv khre" -> kyiv:* & khre:*)."""
+    words = re.findall(r'\w+', text.lower())
+    if not words:
+        return None
+    return SearchQuery(
+        ' & '.join(f'{word}:*' for word in words), search_type='raw', config=SEARCH_CONFIG
+    )
+
+
+# set while bulk operations maintain PropertyCounter themselves
+counter_signals_suspended = ContextVar('counter_signals_suspended', default=False)
+
+
+@contextmanager
+def suspend_counter_signals():
+    token = counter_signals_suspended.set(True)
+    try:
+        yield
+    finally:
+        counter_signals_suspended.reset(token)
+
+
+class PropertyQuerySet(models.QuerySet):
+
+    def search(self, text: str):
+        """
+        Properties matching ``text`` by word prefixes (search_vector) or by
+        trigram similarity of the address columns, annotated with
+        ``search_rank`` and ordered best first.
+        """
+        query = prefix_search_query(text)
+        if query is None:
+            return self.none()
+
+        matches = models.Q(search_vector=query)
+        for field in TRIGRAM_SEARCH_FIELDS:
+            matches |= models.Q(**{f'{field}__trigram_similar': text})
+        similarity = Greatest(*[TrigramSimilarity(field, text) for field in TRIGRAM_SEARCH_FIELDS])
+        return self.filter(matches).annotate(
+            search_rank=Coalesce(SearchRank(models.F('search_vector'), query), 0.0)
+            + Coalesce(similarity, 0.0)
+        ).order_by('-search_rank')
+
+    def counter_groups(self) -> list:
+        """Number of properties per PropertyCounter key."""
+        return list(
+            self.order_by().values(*PropertyCounter.KEY_FIELDS).annotate(
+                total=models.Count('id')
+            )
+        )
+
+    def tracked_update(self, **kwargs) -> int:
+        """
+        ``update()`` that keeps PropertyCounter in sync and records a
+        PropertyChangeEvent per row in the same transaction. Rows changed
+        concurrently between grouping and updating are fixed by
+        ``reconcile_property_counters``.
+        """
+        changed_fields = set(kwargs) & set(PropertyCounter.KEY_FIELDS)
+        with transaction.atomic():
+            # before updating, the update may move rows out of the queryset
+            PropertyChangeEvent.record_queryset(self, EVENT_UPDATED, kwargs)
+            if not changed_fields:
+                return self.update(**kwargs)
+
+            groups = self.counter_groups()
+            updated = self.update(**kwargs)
+            deltas = Counter()
+            for group in groups:
+                new_group = {**group, **{field: kwargs[field] for field in changed_fields}}
+                deltas[PropertyCounter.key(group)] -= group['total']
+                deltas[PropertyCounter.key(new_group)] += group['total']
+            PropertyCounter.apply(deltas)
+        return updated
+
+    def tracked_delete(self) -> tuple:
+        """``delete()`` with one counter update per key instead of one per row."""
+        with transaction.atomic(), suspend_counter_signals():
+            groups = self.counter_groups()
+            deleted = self.delete()
+            deltas = Counter()
+            for group in groups:
+                deltas[PropertyCounter.key(group)] -= group['total']
+            PropertyCounter.apply(deltas)
+        return deleted
+
 
 class Property(models.Model):
     property_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
@@ -35,6 +161,10 @@ class Property(models.Model):
     price_min = MoneyField(max_digits=15, decimal_places=2, default_currency="USD", null=True, blank=True)
     price_max = MoneyField(max_digits=15, decimal_places=2, default_currency="USD", null=True, blank=True)
     calculated_price_avg = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
+    # calculated_price_avg converted with ExchangeRate, for cross-currency search
+    price_usd = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True, editable=False, db_index=True
+    )
     monthly_hoa_fee = MoneyField(
         max_digits=10, decimal_places=2, default_currency="USD", null=True, blank=True)
     monthly_hoa_fee_min = MoneyField(
@@ -98,6 +228,12 @@ class Property(models.Model):
             "monthly_hoa_fee", "monthly_hoa_fee_min", "monthly_hoa_fee_max"
         ]
     )
+    # PropertyCounter key of the stored row
+    counter_tracker = FieldTracker(["status", "country", "property_type"])
+    search_vector = SearchVectorField(null=True, editable=False)
+    search_tracker = FieldTracker(SEARCH_FIELDS)
+
+    objects = PropertyQuerySet.as_manager()
 
     # helpers to determine if translation need to be updated
     __initial_description = None
@@ -107,6 +243,14 @@ class Property(models.Model):
 
     class Meta:
         verbose_name_plural = "Properties"
+        indexes = [
+            GinIndex(fields=['search_vector'], name='property_search_vector_gin'),
+            # KNN ordering of the near search, see KNNDistance
+            GistIndex(as_geography('location'), name='property_location_geography_gist'),
+        ] + [
+            GinIndex(fields=[field], name=f'property_{field}_trgm', opclasses=['gin_trgm_ops'])
+            for field in TRIGRAM_SEARCH_FIELDS
+        ]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -129,17 +273,16 @@ class Property(models.Model):
         return bool(fields)
 
     def save(self, force_insert=False, force_update=False, *args, **kwargs):
-        # for new/prior properties there will be no corresponding translation
-        # hasattr is safe and will not raise PropertyDescTranslation.DoesNotExist:
-        if self.needs_translation_update and hasattr(self, 'description_translation'):
-            with transaction.atomic():
+        # atomic, so post_save writes PropertyChangeEvent in the transaction of the row
+        with transaction.atomic():
+            # for new/prior properties there will be no corresponding translation
+            # hasattr is safe and will not raise PropertyDescTranslation.DoesNotExist:
+            if self.needs_translation_update and hasattr(self, 'description_translation'):
                 self.description_translation.translation_status = TRANSLATION_OUTDATED
                 # TODO: try to cancel pending job if TRANSLATION_PROCESSING and clear job_id regardless
                 self.description_translation.job_id = None
                 self.description_translation.save(update_fields=['translation_status', 'job_id'])
 
-                super().save(force_insert, force_update, *args, **kwargs)
-        else:
             super().save(force_insert, force_update, *args, **kwargs)
 
         self.__initial_description = self.description
@@ -148,11 +291,17 @@ class Property(models.Model):
 
     @cached_property
     def full_address(self) -> str:
-        address = ", ".join(str(column) for column in [
+        return self.build_full_address(
             self.country, self.region, self.city, self.district,
-            self.street, self.zip_code] if column) or "Address unknown"
+            self.street, self.zip_code
+        )
 
-        return address
+    @staticmethod
+    def build_full_address(*columns) -> str:
+        """Joins address columns (country first, zip code last)."""
+        return ", ".join(
+            str(column) for column in columns if column
+        ) or "Address unknown"
 
     @property
     def lat(self) -> float:
@@ -251,15 +400,17 @@ class Property(models.Model):
 
         return res
 
+    @staticmethod
+    def get_price_fields(buy_rent: str) -> tuple:
+        """(fixed, min, max) money fields the average price is calculated from."""
+        if buy_rent == RENT:
+            return 'monthly_hoa_fee', 'monthly_hoa_fee_min', 'monthly_hoa_fee_max'
+        return 'price', 'price_min', 'price_max'
+
     def calculate_and_set_price_avg(self):
-        if self.buy_rent == RENT:
-            fixed_price = self.monthly_hoa_fee
-            min_price = self.monthly_hoa_fee_min
-            max_price = self.monthly_hoa_fee_max
-        else:
-            fixed_price = self.price
-            min_price = self.price_min
-            max_price = self.price_max
+        fixed_price, min_price, max_price = [
+            getattr(self, field) for field in self.get_price_fields(self.buy_rent)
+        ]
 
         if fixed_price is not None:
             self.calculated_price_avg = fixed_price.amount
@@ -271,6 +422,24 @@ class Property(models.Model):
         else:
             self.calculated_price_avg = 0
 
+    def calculate_and_set_price_usd(self, rates: dict):
+        """Average price in USD, ``None`` without price or exchange rate."""
+        def to_usd(money):
+            rate = rates.get(money.currency.code)
+            return None if rate is None else money.amount * rate
+
+        fixed_price, min_price, max_price = [
+            getattr(self, field) for field in self.get_price_fields(self.buy_rent)
+        ]
+        price_usd = None
+        if fixed_price is not None:
+            price_usd = to_usd(fixed_price)
+        elif min_price is not None and max_price is not None:
+            min_usd, max_usd = to_usd(min_price), to_usd(max_price)
+            if min_usd is not None and max_usd is not None:
+                price_usd = (min_usd + max_usd) / 2
+        self.price_usd = None if price_usd is None else price_usd.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
 
 class PropertyMediaAttachment(models.Model):
     def get_target_path(self, filename):
@@ -287,6 +456,11 @@ class PropertyMediaAttachment(models.Model):
     class Meta:
         abstract = True
 
+    def save(self, *args, **kwargs):
+        # atomic, so post_save writes PropertyChangeEvent in the transaction of the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class PropertyPhoto(PropertyMediaAttachment):
     def get_target_path(self, filename):
@@ -318,6 +492,28 @@ class PropertyDescTranslation(TranslationAbstractModel):
     property = models.OneToOneField("Property", on_delete=models.CASCADE, related_name="description_translation")
 
 
+class TranslationMemory(models.Model):
+    """Machine translations of strings, reused by ``backfill_translations``."""
+    source_language = models.CharField(max_length=10)
+    target_language = models.CharField(max_length=10)
+    # md5 of source_text, texts are too long for a unique index
+    source_hash = models.CharField(max_length=32)
+    source_text = models.TextField()
+    translated_text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source_language', 'target_language', 'source_hash'],
+                name='uq_translation_memory',
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.source_language}->{self.target_language}: {self.source_text[:50]}"
+
+
 class UserSavedProperty(models.Model):
     user = models.ForeignKey("users.User", related_name="saved_properties", on_delete=models.CASCADE)
     property = models.ForeignKey("Property", on_delete=models.CASCADE)
@@ -335,6 +531,98 @@ class UserSavedProperty(models.Model):
         ]
 
 
+class PropertyCounter(models.Model):
+    """
+    Number of properties per status, country and type.
+
+    Maintained by Property signals and the ``tracked_*`` queryset methods,
+    rebuilt periodically by ``reconcile_property_counters``.
+    """
+    KEY_FIELDS = ('status', 'country', 'property_type')
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    # empty for properties without country
+    country = models.CharField(max_length=100, blank=True, default='')
+    property_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['status', 'country', 'property_type'], name='uq_property_counter'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.status} / {self.country or '-'} / {self.property_type}: {self.count}"
+
+    @staticmethod
+    def key(values) -> tuple:
+        """Counter key of a property values dict."""
+        return values['status'], values['country'] or '', values['property_type']
+
+    @classmethod
+    def apply(cls, deltas: dict):
+        """Adds ``{key: delta}`` to the counters."""
+        for (status, country, property_type), delta in deltas.items():
+            if not delta:
+                continue
+            counters = cls.objects.filter(
+                status=status, country=country, property_type=property_type
+            )
+            if not counters.update(count=models.F('count') + delta):
+                cls.objects.get_or_create(
+                    status=status, country=country, property_type=property_type
+                )
+                counters.update(count=models.F('count') + delta)
+
+
+class PropertyChangeEvent(models.Model):
+    """
+    Transactional outbox of property changes.
+
+    Written in the transaction of the change by Property and attachment
+    signals and by ``tracked_update``, fanned out to caches, the search index
+    and CDN purge hooks by ``dispatch_property_change_events``.
+    """
+    # not a foreign key, events of deleted properties are kept
+    property_id = models.IntegerField(db_index=True)
+    kind = models.CharField(max_length=10, choices=EVENT_KIND_CHOICES)
+    # changed fields when known, empty means any field may have changed
+    fields = ArrayField(models.CharField(max_length=50), default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['id'], name='property_event_pending',
+                condition=models.Q(processed_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} property {self.property_id}"
+
+    @classmethod
+    def record(cls, property_id: int, kind: str, fields=()):
+        return cls.objects.create(property_id=property_id, kind=kind, fields=sorted(fields))
+
+    @classmethod
+    def record_queryset(cls, queryset, kind: str, fields=()) -> int:
+        """Records an event per property of ``queryset`` in one INSERT ... SELECT."""
+        sql, params = queryset.order_by().values('id').query.sql_with_params()
+        table = cls._meta.db_table
+        with connections[router.db_for_write(cls)].cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (property_id, kind, fields, created_at, attempts) '
+                f'SELECT changed.id, %s, %s, now(), 0 FROM ({sql}) AS changed',
+                [kind, sorted(fields), *params],
+            )
+            return cursor.rowcount
+
+
 class ScrapedPropertiesFile(models.Model):
     file = models.FileField(upload_to='scraped_data/%d_%m_%Y/')
     status = models.CharField(max_length=20, choices=PROPERTIES_FILE_STATUSES, default=STATUS_PENDING)
@@ -346,3 +634,50 @@ class ScrapedPropertiesFile(models.Model):
     def __str__(self):
         return self.file.name
 
+
+class ExchangeRate(models.Model):
+    """USD value of one unit of ``currency``, used for ``Property.price_usd``."""
+    currency = models.CharField(max_length=3, unique=True)
+    rate_to_usd = models.DecimalField(max_digits=18, decimal_places=8)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.currency}: {self.rate_to_usd}"
+
+    @classmethod
+    def rates(cls) -> dict:
+        rates = dict(cls.objects.values_list('currency', 'rate_to_usd'))
+        rates.setdefault('USD', Decimal(1))
+        return rates
+
+    @staticmethod
+    def price_usd_expression(rates: dict):
+        """SQL version of ``Property.calculate_and_set_price_usd``."""
+        output_field = models.DecimalField(max_digits=15, decimal_places=2)
+
+        def to_usd(field):
+            return models.Case(
+                *[
+                    models.When(**{f'{field}_currency': currency}, then=models.F(field) * rate)
+                    for currency, rate in rates.items()
+                ],
+                default=None,
+                output_field=output_field,
+            )
+
+        def average(fixed_price, min_price, max_price):
+            return models.Case(
+                models.When(**{f'{fixed_price}__isnull': False}, then=to_usd(fixed_price)),
+                models.When(
+                    **{f'{min_price}__isnull': False, f'{max_price}__isnull': False},
+                    then=(to_usd(min_price) + to_usd(max_price)) / 2
+                ),
+                default=None,
+                output_field=output_field,
+            )
+
+        return models.Case(
+            models.When(buy_rent=RENT, then=average(*Property.get_price_fields(RENT))),
+            default=average(*Property.get_price_fields(None)),
+            output_field=output_field,
+        )
@@ -0,0 +1,87 @@
+"""
+Price distribution of a property queryset, computed in SQL.
+
+Two queries: bounds, count and percentiles in one aggregate, then the
+number of properties per ``width_bucket``.
+"""
+import typing as t
+
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import Aggregate, Count, F, FloatField, Func, IntegerField, Max, Min
+from django.db.models.functions import Least
+
+# price param -> column
+PRICE_FIELDS = {
+    'avg': 'calculated_price_avg',
+    'usd': 'price_usd',
+}
+DEFAULT_BINS = 20
+MAX_BINS = 100
+
+
+class WidthBucket(Func):
+    function = 'WIDTH_BUCKET'
+    output_field = IntegerField()
+
+
+class PercentileCont(Aggregate):
+    """Continuous percentiles (0..1) of an expression, as an array."""
+    function = 'PERCENTILE_CONT'
+    template = '%(function)s(ARRAY[%(fractions)s]) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = ArrayField(FloatField())
+
+    def __init__(self, expression, fractions: t.Sequence[float], **extra):
+        # floats only, so safe to inline
+        fractions = ', '.join(repr(float(fraction)) for fraction in fractions)
+        super().__init__(expression, fractions=fractions, **extra)
+
+
+def price_histogram(queryset, field: str, bins: int = DEFAULT_BINS,
+                    percentiles: t.Sequence[float] = ()) -> dict:
+    """
+    ``bins`` equal width bins between the lowest and highest ``field`` value
+    and the requested ``percentiles`` (0..100) of it.
+    """
+    queryset = queryset.filter(**{f'{field}__isnull': False}).order_by()
+    aggregates = {'low': Min(field), 'high': Max(field), 'count': Count('pk')}
+    if percentiles:
+        aggregates['percentiles'] = PercentileCont(
+            F(field), [percentile / 100 for percentile in percentiles]
+        )
+    stats = queryset.aggregate(**aggregates)
+
+    data = {
+        'count': stats['count'],
+        'min': None if stats['low'] is None else float(stats['low']),
+        'max': None if stats['high'] is None else float(stats['high']),
+        'bins': [],
+    }
+    if percentiles:
+        data['percentiles'] = {
+            f'{percentile:g}': value
+            for percentile, value in zip(percentiles, stats['percentiles'] or [])
+        }
+    if not stats['count']:
+        return data
+
+    low, high = data['min'], data['max']
+    if low == high:
+        data['bins'] = [{'from': low, 'to': high, 'count': stats['count']}]
+        return data
+
+    # the highest value falls into bucket bins + 1, move it into the last bin
+    counts = dict(
+        queryset.annotate(
+            bucket=Least(WidthBucket(F(field), low, high, bins), bins)
+        ).values('bucket').annotate(count=Count('pk')).values_list('bucket', 'count')
+    )
+    width = (high - low) / bins
+    data['bins'] = [
+        {
+            'from': low + width * bucket,
+            'to': high if bucket == bins - 1 else low + width * (bucket + 1),
+            'count': counts.get(bucket + 1, 0),
+        }
+        for bucket in range(bins)
+    ]
+    return data
@@ -0,0 +1,72 @@
+"""
+orjson based renderer with the output of DRF's ``JSONRenderer``.
+
+orjson is optional: without it (or when the request asks for indented or
+ASCII-only output) rendering falls back to ``JSONRenderer``.
+
+Enable per view with ``renderer_classes = FAST_RENDERER_CLASSES`` or
+globally by putting ``pgr_django.properties.renderers.ORJSONRenderer`` first
+in ``REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']``.
+"""
+from django.contrib.gis.geos import GEOSGeometry, Point
+from moneyed import Money
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders, json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+from .serializers import MoneyFieldSerializer, PointFieldSerializer
+
+# JSONRenderer escapes these for JavaScript compatibility
+LINE_SEPARATORS = (
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+)
+
+_drf_default = encoders.JSONEncoder().default
+_point_representation = PointFieldSerializer().to_representation
+_money_representation = MoneyFieldSerializer().to_representation
+
+
+def default(obj):
+    """Types orjson does not handle (or formats differently than DRF)."""
+    if isinstance(obj, Point):
+        return _point_representation(obj)
+    if isinstance(obj, GEOSGeometry):
+        return json.loads(obj.geojson)
+    if isinstance(obj, Money):
+        return _money_representation(obj)
+    # datetime, Decimal, lazy strings, querysets, ...
+    return _drf_default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    # datetimes go through ``default`` to keep DRF's "Z" suffix
+    options = 0 if orjson is None else (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or self.get_indent(
+            accepted_media_type, renderer_context or {}
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        ret = orjson.dumps(data, default=default, option=self.options)
+        for char, escaped in LINE_SEPARATORS:
+            if char in ret:
+                ret = ret.replace(char, escaped)
+        return ret
+
+
+FAST_RENDERER_CLASSES = [ORJSONRenderer] + [
+    renderer for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+    if renderer not in (JSONRenderer, ORJSONRenderer)
+]
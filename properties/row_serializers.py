@@ -0,0 +1,224 @@
+"""
+Read-optimized serializers for property list endpoints.
+
+Row serializers produce the same JSON as their DRF counterparts but work on
+``values_list`` tuples instead of ``Property`` instances, so neither the model
+``__init__`` nor DRF field binding runs per row. Related data (photos, files,
+agents, payments) is loaded once per page.
+"""
+from collections import defaultdict
+
+from pgr_django.payments.serializers import (
+    PaymentReadOnlySerializer,
+    SubscriptionReadOnlySerializer,
+)
+from pgr_django.users.models import Agent
+from .instrumentation import PHASE_SERIALIZE, timed
+from .models import Property, PropertyPhoto, PropertyFile
+from .serializers import (
+    AgentSearchSerializer,
+    PropertySearchSerializer,
+    PropertySearchMyPropertiesSerializer,
+)
+
+FULL_ADDRESS_COLUMNS = (
+    'country', 'region', 'city', 'district', 'street', 'zip_code',
+)
+
+
+class PropertyRowSerializer:
+    """
+    Serializes rows of ``get_columns()`` into the output of ``serializer_class``.
+
+    Plain fields reuse the ``to_representation`` of the DRF field they mirror,
+    fields listed in ``related_fields`` are resolved by a bulk loader method.
+    """
+    serializer_class = None
+    # field name -> (source column, loader method name)
+    related_fields = {}
+    # queryset annotations added to the output when present -> representation
+    annotation_fields = {}
+
+    def __init__(self, rows, annotations=()):
+        self.rows = rows
+        self.annotations = annotations
+
+    @classmethod
+    def get_columns(cls) -> tuple:
+        return cls._compile()[0]
+
+    @classmethod
+    def get_annotations(cls, queryset) -> tuple:
+        return tuple(
+            name for name in cls.annotation_fields if name in queryset.query.annotations
+        )
+
+    @classmethod
+    def get_rows(cls, queryset):
+        """``values_list`` of the columns needed to serialize ``queryset``."""
+        return queryset.select_related(None).prefetch_related(None).values_list(
+            *cls.get_columns(), *cls.get_annotations(queryset)
+        )
+
+    @classmethod
+    def _compile(cls):
+        # compiled once per class, the first time a page is serialized
+        compiled = cls.__dict__.get('_compiled')
+        if compiled is None:
+            compiled = cls._compiled = cls._build()
+        return compiled
+
+    @classmethod
+    def _build(cls):
+        columns = ['id']
+
+        def column_index(column):
+            if column not in columns:
+                columns.append(column)
+            return columns.index(column)
+
+        getters = []
+        loaders = []
+        for name, field in cls.serializer_class().fields.items():
+            if name in cls.related_fields:
+                column, loader = cls.related_fields[name]
+                index = column_index(column)
+                loaders.append((name, index, loader))
+                getters.append((name, cls._related_getter(name, index)))
+            elif name == 'full_address':
+                indexes = [column_index(column) for column in FULL_ADDRESS_COLUMNS]
+                getters.append((name, cls._full_address_getter(indexes)))
+            else:
+                index = column_index(field.source)
+                getters.append((name, cls._column_getter(index, field.to_representation)))
+
+        def to_dict(row, related):
+            return {name: getter(row, related) for name, getter in getters}
+
+        return tuple(columns), loaders, to_dict
+
+    @staticmethod
+    def _column_getter(index, to_representation):
+        def getter(row, related):
+            value = row[index]
+            return None if value is None else to_representation(value)
+        return getter
+
+    @staticmethod
+    def _related_getter(name, index):
+        def getter(row, related):
+            return related[name][row[index]]
+        return getter
+
+    @staticmethod
+    def _full_address_getter(indexes):
+        def getter(row, related):
+            return Property.build_full_address(*[row[index] for index in indexes])
+        return getter
+
+    @property
+    @timed(PHASE_SERIALIZE)
+    def data(self) -> list:
+        columns, loaders, to_dict = self._compile()
+        rows = list(self.rows)
+        related = {
+            name: getattr(self, loader)({row[index] for row in rows})
+            for name, index, loader in loaders
+        }
+        data = [to_dict(row, related) for row in rows]
+
+        # annotations follow the compiled columns
+        for index, name in enumerate(self.annotations, start=len(columns)):
+            to_representation = self.annotation_fields[name]
+            for item, row in zip(data, rows):
+                item[name] = None if row[index] is None else to_representation(row[index])
+        return data
+
+    @staticmethod
+    def _load_attachments(model, file_field: str, property_ids) -> dict:
+        storage = model._meta.get_field(file_field).storage
+        urls = defaultdict(list)
+        attachments = model.objects.filter(
+            property_id__in=property_ids
+        ).order_by('order').values_list('property_id', file_field)
+        for property_id, name in attachments:
+            if name:
+                urls[property_id].append(storage.url(name))
+        return urls
+
+    def load_photos(self, property_ids) -> dict:
+        return self._load_attachments(PropertyPhoto, 'photo', property_ids)
+
+    def load_files(self, property_ids) -> dict:
+        return self._load_attachments(PropertyFile, 'file', property_ids)
+
+    @staticmethod
+    def _load_serialized(queryset, serializer_class, ids) -> dict:
+        """Serializes every distinct related object once."""
+        data = defaultdict(lambda: None)
+        for obj in queryset.filter(id__in=[pk for pk in ids if pk is not None]):
+            data[obj.id] = serializer_class(obj).data
+        return data
+
+    def load_payments(self, payment_ids) -> dict:
+        model = Property._meta.get_field('payment').related_model
+        return self._load_serialized(
+            model.objects.all(), PaymentReadOnlySerializer, payment_ids
+        )
+
+    def load_subscriptions(self, subscription_ids) -> dict:
+        model = Property._meta.get_field('subscription').related_model
+        return self._load_serialized(
+            model.objects.all(), SubscriptionReadOnlySerializer, subscription_ids
+        )
+
+
+class AgentRowSerializerMixin:
+    # search results fall back to the default agent, like Property._agent
+    use_default_agent = True
+
+    def load_agents(self, agent_ids) -> dict:
+        agents = self._load_serialized(
+            Agent.objects.select_related('broker', 'user', 'description_translation'),
+            AgentSearchSerializer,
+            agent_ids,
+        )
+        if self.use_default_agent:
+            default_data = []
+
+            def default():
+                if not default_data:
+                    default_data.append(AgentSearchSerializer(Agent.default_agent()).data)
+                return default_data[0]
+
+            agents.default_factory = default
+        return agents
+
+
+class PropertySearchRowSerializer(AgentRowSerializerMixin, PropertyRowSerializer):
+    serializer_class = PropertySearchSerializer
+    related_fields = {
+        'photos': ('id', 'load_photos'),
+        'agent': ('agent_id', 'load_agents'),
+    }
+    annotation_fields = {
+        # meters, from PropertyNearFilterBackend
+        'distance': lambda distance: round(distance.m, 1),
+    }
+
+
+class FeaturedPropertyRowSerializer(PropertySearchRowSerializer):
+    # featured properties never had the default agent filled in
+    use_default_agent = False
+
+
+class PropertySearchMyPropertiesRowSerializer(AgentRowSerializerMixin, PropertyRowSerializer):
+    serializer_class = PropertySearchMyPropertiesSerializer
+    use_default_agent = False
+    related_fields = {
+        'photos': ('id', 'load_photos'),
+        'files': ('id', 'load_files'),
+        'agent': ('agent_id', 'load_agents'),
+        'payment': ('payment_id', 'load_payments'),
+        'subscription': ('subscription_id', 'load_subscriptions'),
+    }
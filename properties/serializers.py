@@ -2,6 +2,13 @@ from django.contrib.gis.geos import Point
 from rest_framework import serializers
 from rest_framework.generics import get_object_or_404
 from pgr_django.payments.serializers import PaymentReadOnlySerializer, SubscriptionReadOnlySerializer
+from .instrumentation import (
+    PHASE_GOOGLE_GEOCODING,
+    PHASE_GOOGLE_TRANSLATE,
+    PHASE_ROSETTA,
+    TimedSerializerMixin,
+    timed,
+)
 from .models import (
     Property,
     PropertyPhoto,
@@ -19,12 +26,24 @@ from pgr_django.properties.constants import (
     RENT, TR_FOR_SALE_IN, TR_FOR_RENT_IN, TR_WITH_DASHES,
     TR_DEFAULT_DESCRIPTION,
 )
-from .constants import STATUS_ACTIVE, TYPE_RESIDENTIAL
+from .constants import NEW_LANGUAGES, SOURCE_LANGUAGE, STATUS_ACTIVE, TYPE_RESIDENTIAL
 
 
 DEFAULT_LANGUAGES = "English"
-SOURCE_LANGUAGE = 'en'
-NEW_LANGUAGES = ['ko', 'fr']
+
+
+def ordered_attachments(obj: Property, related_name: str):
+    """
+    Photos or files of ``obj`` by ``order``. Prefetched attachments are sorted
+    in Python, ``order_by`` on them would run one query per property.
+    """
+    attachments = getattr(obj, related_name)
+    if related_name in getattr(obj, '_prefetched_objects_cache', {}):
+        return sorted(
+            attachments.all(),
+            key=lambda attachment: (attachment.order is None, attachment.order or 0),
+        )
+    return attachments.order_by('order')
 
 
 class PointFieldSerializer(serializers.Field):
@@ -83,8 +102,9 @@ class AgentSearchSerializer(serializers.Serializer):
     def get_description_translation(obj):
         # Creates AgentDescTranslation
         if not hasattr(obj, 'description_translation'):
-            prop_translation = GoogleTranslate(obj)
-            prop_translation.save_translation()
+            with timed(PHASE_GOOGLE_TRANSLATE):
+                prop_translation = GoogleTranslate(obj)
+                prop_translation.save_translation()
         return AgentDescTranslationSerializer(obj.description_translation).data
 
     def get_is_active(self, obj):
@@ -148,25 +168,26 @@ class PropertyDescTranslationSerializer(serializers.ModelSerializer):
             self.update_desc_translations(new_langs_trans)
             translations.update(new_langs_trans)
 
-        for lang in translations:
-            trans_fields = {
-                field: get_translation_in(val, lang)
-                for field, val in fields_vals.items()
-            }
-            trans_fields.update({
-                'prop_site_desc': get_translation_in(
-                    'propertySiteDescription', lang
+        with timed(PHASE_ROSETTA):
+            for lang in translations:
+                trans_fields = {
+                    field: get_translation_in(val, lang)
+                    for field, val in fields_vals.items()
+                }
+                trans_fields.update({
+                    'prop_site_desc': get_translation_in(
+                        'propertySiteDescription', lang
+                    )
+                })
+                trans_fields = self.set_default_description(
+                    prop_obj, lang, trans_fields
                 )
-            })
-            trans_fields = self.set_default_description(
-                prop_obj, lang, trans_fields
-            )
-            # Update fields with default values
-            for field in ['city', 'region', 'country']:
-                if field not in translations[lang].keys():
-                    trans_fields[field] = getattr(prop_obj, field, '')
+                # Update fields with default values
+                for field in ['city', 'region', 'country']:
+                    if field not in translations[lang].keys():
+                        trans_fields[field] = getattr(prop_obj, field, '')
 
-            translations[lang].update(trans_fields)
+                translations[lang].update(trans_fields)
 
         return translations
 
@@ -197,13 +218,14 @@ class PropertyDescTranslationSerializer(serializers.ModelSerializer):
     @staticmethod
     def update_new_languages(prop: Property, prop_info: dict):
         """Translate prop info with new languages"""
-        prop_translate = GoogleTranslate(prop)
-        return prop_translate.retrieve_google_translations(
-            SOURCE_LANGUAGE,
-            NEW_LANGUAGES,
-            list(prop_info.values()),
-            tuple(prop_info.keys())
-        ) or {}
+        with timed(PHASE_GOOGLE_TRANSLATE):
+            prop_translate = GoogleTranslate(prop)
+            return prop_translate.retrieve_google_translations(
+                SOURCE_LANGUAGE,
+                NEW_LANGUAGES,
+                list(prop_info.values()),
+                tuple(prop_info.keys())
+            ) or {}
 
     def update_desc_translations(self, translations: dict):
         """Update description property obj with new languages translations"""
@@ -211,24 +233,24 @@ class PropertyDescTranslationSerializer(serializers.ModelSerializer):
         self.instance.save()
 
 
-class PropertyListSerializer(serializers.ModelSerializer):
+class PropertyListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     location = PointFieldSerializer()
     photos = serializers.SerializerMethodField()
     files = serializers.SerializerMethodField()
 
     class Meta:
         model = Property
-        exclude = ['org_property_type', 'org_property_subtype']
+        exclude = ['org_property_type', 'org_property_subtype', 'search_vector', 'price_usd']
 
     def get_photos(self, obj):
-        return [photo.photo.url for photo in obj.photos.all().order_by('order')]
+        return [photo.photo.url for photo in ordered_attachments(obj, 'photos')]
 
     @staticmethod
     def get_files(obj):
-        return [file.file.url for file in obj.files.all().order_by('order')]
+        return [file.file.url for file in ordered_attachments(obj, 'files')]
 
 
-class PropertyDetailSerializer(serializers.ModelSerializer):
+class PropertyDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     location = PointFieldSerializer()
     photos = serializers.SerializerMethodField()
     files = serializers.SerializerMethodField()
@@ -238,14 +260,14 @@ class PropertyDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Property
-        exclude = ['org_property_type', 'org_property_subtype']
+        exclude = ['org_property_type', 'org_property_subtype', 'search_vector', 'price_usd']
 
     def get_photos(self, obj):
-        return [photo.photo.url for photo in obj.photos.all().order_by('order')]
+        return [photo.photo.url for photo in ordered_attachments(obj, 'photos')]
 
     @staticmethod
     def get_files(obj):
-        return [file.file.url for file in obj.files.all().order_by('order')]
+        return [file.file.url for file in ordered_attachments(obj, 'files')]
 
     @staticmethod
     def get_agent(obj):
@@ -262,8 +284,9 @@ class PropertyDetailSerializer(serializers.ModelSerializer):
     def get_description_translation(obj):
         # Creates PropertyDescTranslation with property title translations
         if not hasattr(obj, 'description_translation'):
-            prop_translation = GoogleTranslate(obj)
-            prop_translation.save_translation()
+            with timed(PHASE_GOOGLE_TRANSLATE):
+                prop_translation = GoogleTranslate(obj)
+                prop_translation.save_translation()
         return PropertyDescTranslationSerializer(obj.description_translation).\
             data
 
@@ -333,7 +356,7 @@ class PropertyInsertUpdateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Property
-        exclude = ['org_property_type', 'org_property_subtype']
+        exclude = ['org_property_type', 'org_property_subtype', 'search_vector', 'price_usd']
         extra_kwargs = {
             'id': {'read_only': True},
             'updated_at': {'read_only': True},
@@ -346,8 +369,9 @@ class PropertyInsertUpdateSerializer(serializers.ModelSerializer):
 
     def save(self, **kwargs):
         instance = super().save(**kwargs)
-        gg = GoogleGeocoding(instance, reverse=False)
-        gg.save_geocoding_data()
+        with timed(PHASE_GOOGLE_GEOCODING):
+            gg = GoogleGeocoding(instance, reverse=False)
+            gg.save_geocoding_data()
         instance.refresh_from_db()
         return instance
 
@@ -401,7 +425,7 @@ class PropertyPhotoUploadSerializer(serializers.ModelSerializer):
         fields = ["photo", "order"]
 
 
-class PropertyPhotoSerializer(serializers.ModelSerializer):
+class PropertyPhotoSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = PropertyPhoto
         fields = "__all__"
@@ -413,7 +437,7 @@ class PropertyFileUploadSerializer(serializers.ModelSerializer):
         fields = ["file", "order"]
 
 
-class PropertyFileSerializer(serializers.ModelSerializer):
+class PropertyFileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = PropertyFile
         fields = "__all__"
@@ -439,7 +463,7 @@ class UserSavedPropertyPostSerializer(serializers.Serializer):
         return obj
 
 
-class UserSavedPropertySerializer(serializers.ModelSerializer):
+class UserSavedPropertySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     property_updated_at = serializers.DateTimeField(source='property.updated_at', read_only=True)
     property_status = serializers.CharField(source='property.status', read_only=True)
     is_changed = serializers.SerializerMethodField()
@@ -487,7 +511,7 @@ class PropertiesFileUpdateRentSerializer(serializers.ModelSerializer):
         return instance
 
 
-class PropertyLocationSerializer(serializers.ModelSerializer):
+class PropertyLocationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     location = PointFieldSerializer()
 
     class Meta:
@@ -495,7 +519,26 @@ class PropertyLocationSerializer(serializers.ModelSerializer):
         fields = ['id', 'location', "status"]
 
 
-class PropertyLowDetailedSerializer(serializers.ModelSerializer):
+class PropertyAutocompleteSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Autocomplete suggestion built from a ``values()`` row."""
+    id = serializers.IntegerField()
+    address = serializers.SerializerMethodField()
+    city = serializers.CharField()
+    country = serializers.CharField()
+    location = PointFieldSerializer()
+
+    @staticmethod
+    def get_address(obj):
+        if not obj['address']:
+            return Property.build_full_address(
+                obj['country'], obj['region'], obj['city'], obj['district'],
+                obj['street'], obj['zip_code'],
+            )
+
+        return obj['address']
+
+
+class PropertyLowDetailedSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     location = PointFieldSerializer()
     address = serializers.SerializerMethodField()
 
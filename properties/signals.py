@@ -1,6 +1,26 @@
-from django.db.models.signals import pre_delete, pre_save
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from pgr_django.properties.models import Property
+from pgr_django.properties.constants import (
+    EVENT_CREATED,
+    EVENT_DELETED,
+    EVENT_MEDIA,
+    EVENT_UPDATED,
+)
+from pgr_django.properties.models import (
+    SEARCH_VECTOR,
+    ExchangeRate,
+    Property,
+    PropertyChangeEvent,
+    PropertyCounter,
+    PropertyFile,
+    PropertyPhoto,
+    counter_signals_suspended,
+)
+from pgr_django.properties.instrumentation import PHASE_STRIPE, timed
+from pgr_django.properties.tasks import update_property_prices_usd
 from pgr_django.payments.constants import ITEM_STATUS_ACTIVE
 from pgr_django.utils.stripe import Stripe
 
@@ -9,11 +29,85 @@ from pgr_django.utils.stripe import Stripe
 def cancel_property_subscription(sender, instance, using, **kwargs):
     subscription = instance.subscription
     if subscription and subscription.item_status == ITEM_STATUS_ACTIVE:
-        stripe = Stripe()
-        stripe.deactivate_property_subscription(instance)
+        with timed(PHASE_STRIPE):
+            stripe = Stripe()
+            stripe.deactivate_property_subscription(instance)
 
 
 @receiver(pre_save, sender=Property, dispatch_uid='property_price_avg_calc')
 def calculate_property_price_avg(sender, instance, using, **kwargs):
     if instance.field_tracker.changed():
         instance.calculate_and_set_price_avg()
+
+
+@receiver(pre_save, sender=Property, dispatch_uid='property_price_usd_calc')
+def calculate_property_price_usd(sender, instance, using, **kwargs):
+    if instance.field_tracker.changed():
+        instance.calculate_and_set_price_usd(ExchangeRate.rates())
+
+
+@receiver(post_save, sender=ExchangeRate, dispatch_uid='exchange_rate_save')
+@receiver(post_delete, sender=ExchangeRate, dispatch_uid='exchange_rate_delete')
+def update_prices_usd_on_rate_change(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: update_property_prices_usd.delay(currencies=[instance.currency])
+    )
+
+
+def _current_counter_key(instance: Property) -> tuple:
+    return PropertyCounter.key({
+        field: getattr(instance, field) for field in PropertyCounter.KEY_FIELDS
+    })
+
+
+def _stored_counter_key(instance: Property) -> tuple:
+    tracker = instance.counter_tracker
+    return PropertyCounter.key({
+        field: tracker.previous(field) for field in PropertyCounter.KEY_FIELDS
+    })
+
+
+@receiver(post_save, sender=Property, dispatch_uid='property_counter_save')
+def update_property_counter_on_save(sender, instance, created, **kwargs):
+    if counter_signals_suspended.get():
+        return
+    if not created and not instance.counter_tracker.changed():
+        return
+
+    deltas = Counter({_current_counter_key(instance): 1})
+    if not created:
+        deltas[_stored_counter_key(instance)] -= 1
+    PropertyCounter.apply(deltas)
+
+
+@receiver(post_delete, sender=Property, dispatch_uid='property_counter_delete')
+def update_property_counter_on_delete(sender, instance, **kwargs):
+    if counter_signals_suspended.get():
+        return
+    PropertyCounter.apply({_stored_counter_key(instance): -1})
+
+
+@receiver(post_save, sender=Property, dispatch_uid='property_search_vector')
+def update_property_search_vector(sender, instance, created, **kwargs):
+    if created or instance.search_tracker.changed():
+        Property.objects.filter(pk=instance.pk).update(search_vector=SEARCH_VECTOR)
+
+
+@receiver(post_save, sender=Property, dispatch_uid='property_change_event_save')
+def record_property_change_on_save(sender, instance, created, update_fields=None, **kwargs):
+    kind = EVENT_CREATED if created else EVENT_UPDATED
+    PropertyChangeEvent.record(instance.pk, kind, update_fields or ())
+
+
+@receiver(post_delete, sender=Property, dispatch_uid='property_change_event_delete')
+def record_property_change_on_delete(sender, instance, **kwargs):
+    PropertyChangeEvent.record(instance.pk, EVENT_DELETED)
+
+
+@receiver(post_save, sender=PropertyPhoto, dispatch_uid='property_photo_change_event_save')
+@receiver(post_delete, sender=PropertyPhoto, dispatch_uid='property_photo_change_event_delete')
+@receiver(post_save, sender=PropertyFile, dispatch_uid='property_file_change_event_save')
+@receiver(post_delete, sender=PropertyFile, dispatch_uid='property_file_change_event_delete')
+def record_property_media_change(sender, instance, **kwargs):
+    related_name = 'photos' if sender is PropertyPhoto else 'files'
+    PropertyChangeEvent.record(instance.property_id, EVENT_MEDIA, [related_name])
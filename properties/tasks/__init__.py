@@ -3,6 +3,14 @@ from .import_properties import (
     update_rent_properties_from_file
 )
 from .property_status_update import update_expired_properties_status
+from .property_counters import reconcile_property_counters
+from .property_search import update_property_search_vectors
+from .property_prices import update_property_prices_usd
+from .property_events import (
+    dispatch_property_change_events,
+    delete_processed_property_change_events
+)
+from .property_translations import backfill_property_translations
 from .calculate_price_for_properties import (
     update_calculated_price_avg_for_properties
 )
@@ -1,15 +1,47 @@
 import traceback
 
+from django.db import transaction
+from django.utils import timezone
+
 from config import celery_app
 from pgr_django.properties.constants import (
+    EVENT_UPDATED,
     FILE_STATUS_UPLOADED,
     STATUS_UPLOADING,
     FILE_STATUS_ERROR
 )
-from pgr_django.properties.models import ScrapedPropertiesFile
+from pgr_django.properties.models import (
+    Property,
+    PropertyChangeEvent,
+    ScrapedPropertiesFile,
+)
+from pgr_django.properties.tasks.property_counters import (
+    reconcile_property_counters
+)
+from pgr_django.properties.tasks.property_prices import (
+    update_property_prices_usd
+)
+from pgr_django.properties.tasks.property_search import (
+    update_property_search_vectors
+)
 from pgr_django.utils.properties_parser import PropertiesParser
 
 
+def record_imported_properties(started):
+    """
+    Change events of the properties written in bulk by an import since
+    ``started``. Properties saved one by one, by the import or meanwhile,
+    already have an event from the post_save receiver and are skipped.
+    """
+    recorded = PropertyChangeEvent.objects.filter(
+        created_at__gte=started
+    ).values('property_id')
+    return PropertyChangeEvent.record_queryset(
+        Property.objects.filter(updated_at__gte=started).exclude(id__in=recorded),
+        EVENT_UPDATED,
+    )
+
+
 @celery_app.task
 def import_properties_from_file(object_id):
     """Import file with properties."""
@@ -19,10 +51,14 @@ def import_properties_from_file(object_id):
     else:
         file_obj.status = STATUS_UPLOADING
         file_obj.save()
+    started = timezone.now()
 
     try:
         parser = PropertiesParser(file_obj.file.url)
-        parser.populate_db()
+        # imported rows and their change events are committed together
+        with transaction.atomic():
+            parser.populate_db()
+            record_imported_properties(started)
     except Exception:
         file_obj.status = FILE_STATUS_ERROR
         file_obj.error = traceback.format_exc()
@@ -32,6 +68,10 @@ def import_properties_from_file(object_id):
         file_obj.rows_total = parser.rows_total
         file_obj.rows_uploaded = parser.rows_uploaded
         file_obj.save()
+    finally:
+        reconcile_property_counters.delay()
+        update_property_search_vectors.delay()
+        update_property_prices_usd.delay(only_missing=True)
 
 
 @celery_app.task
@@ -43,9 +83,13 @@ def update_rent_properties_from_file(object_id):
     else:
         file_obj.status = STATUS_UPLOADING
         file_obj.save()
+    started = timezone.now()
     try:
         parser = PropertiesParser(file_obj.file.url)
-        parser.update_rent_properties()
+        # imported rows and their change events are committed together
+        with transaction.atomic():
+            parser.update_rent_properties()
+            record_imported_properties(started)
     except Exception:
         file_obj.status = FILE_STATUS_ERROR
         file_obj.error = traceback.format_exc()
@@ -55,3 +99,7 @@ def update_rent_properties_from_file(object_id):
         file_obj.rows_total = parser.rows_total
         file_obj.rows_uploaded = parser.rows_uploaded
         file_obj.save()
+    finally:
+        reconcile_property_counters.delay()
+        update_property_search_vectors.delay()
+        update_property_prices_usd.delay(only_missing=True)
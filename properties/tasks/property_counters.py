@@ -0,0 +1,62 @@
+import logging
+from collections import Counter
+
+from django.db import connection, transaction
+
+from config import celery_app
+from pgr_django.properties.models import Property, PropertyCounter
+
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL = 60 * 60  # seconds
+
+
+@celery_app.task
+def reconcile_property_counters():
+    """
+    Rebuilds PropertyCounter from the properties table.
+
+    Counter writers are blocked while properties are counted, so changes
+    committed meanwhile are applied on top of the recounted values.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'LOCK TABLE {PropertyCounter._meta.db_table} IN EXCLUSIVE MODE'
+            )
+        actual = Counter({
+            PropertyCounter.key(group): group['total']
+            for group in Property.objects.counter_groups()
+        })
+        counters = {
+            (counter.status, counter.country, counter.property_type): counter
+            for counter in PropertyCounter.objects.all()
+        }
+
+        fixed = []
+        for key, counter in counters.items():
+            if counter.count != actual[key]:
+                logger.warning(
+                    "Property counter %s drifted: %s instead of %s.",
+                    key, counter.count, actual[key]
+                )
+                counter.count = actual[key]
+                fixed.append(counter)
+        PropertyCounter.objects.bulk_update(fixed, ['count'])
+        PropertyCounter.objects.bulk_create([
+            PropertyCounter(
+                status=status, country=country, property_type=property_type, count=count
+            )
+            for (status, country, property_type), count in actual.items()
+            if (status, country, property_type) not in counters
+        ])
+
+
+@celery_app.on_after_finalize.connect
+def schedule_property_counters_reconcile(sender, **kwargs):
+    sender.add_periodic_task(
+        RECONCILE_INTERVAL,
+        reconcile_property_counters.s(),
+        name='reconcile property counters',
+    )
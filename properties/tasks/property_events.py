@@ -0,0 +1,85 @@
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from config import celery_app
+from pgr_django.properties.change_events import handle_change_events
+from pgr_django.properties.models import PropertyChangeEvent
+
+
+logger = logging.getLogger(__name__)
+
+EVENT_BATCH_SIZE = 500
+EVENT_MAX_BATCHES = 20
+EVENT_MAX_ATTEMPTS = 10
+DISPATCH_INTERVAL = 10  # seconds
+CLEANUP_INTERVAL = 24 * 60 * 60  # seconds
+EVENT_RETENTION = timedelta(days=7)
+
+
+@celery_app.task
+def dispatch_property_change_events(batch_size=EVENT_BATCH_SIZE, max_batches=EVENT_MAX_BATCHES):
+    """
+    Passes pending PropertyChangeEvent batches to the change event handlers.
+
+    Batches are locked with SKIP LOCKED, so concurrent workers take different
+    events. Events are marked processed only after every handler succeeded,
+    a failed batch is retried by the next run and given up after
+    ``EVENT_MAX_ATTEMPTS``.
+    """
+    dispatched = 0
+    for _ in range(max_batches):
+        with transaction.atomic():
+            events = list(
+                PropertyChangeEvent.objects.filter(processed_at__isnull=True)
+                .select_for_update(skip_locked=True)
+                .order_by('id')[:batch_size]
+            )
+            if not events:
+                break
+            pending = PropertyChangeEvent.objects.filter(id__in=[event.id for event in events])
+
+            try:
+                with transaction.atomic():
+                    handle_change_events(events)
+            except Exception:
+                logger.exception("Failed to dispatch %s property change events.", len(events))
+                pending.update(attempts=F('attempts') + 1)
+                given_up = pending.filter(attempts__gte=EVENT_MAX_ATTEMPTS).update(
+                    processed_at=timezone.now()
+                )
+                if given_up:
+                    logger.error("Gave up on %s property change events.", given_up)
+                break
+
+            pending.update(processed_at=timezone.now())
+            dispatched += len(events)
+
+    if dispatched:
+        logger.info("Dispatched %s property change events.", dispatched)
+    return dispatched
+
+
+@celery_app.task
+def delete_processed_property_change_events():
+    deleted, _ = PropertyChangeEvent.objects.filter(
+        processed_at__lt=timezone.now() - EVENT_RETENTION
+    ).delete()
+    logger.info("Deleted %s processed property change events.", deleted)
+
+
+@celery_app.on_after_finalize.connect
+def schedule_property_change_events(sender, **kwargs):
+    sender.add_periodic_task(
+        DISPATCH_INTERVAL,
+        dispatch_property_change_events.s(),
+        name='dispatch property change events',
+    )
+    sender.add_periodic_task(
+        CLEANUP_INTERVAL,
+        delete_processed_property_change_events.s(),
+        name='delete processed property change events',
+    )
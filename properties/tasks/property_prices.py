@@ -0,0 +1,51 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Max, Min, Q
+
+from config import celery_app
+from pgr_django.properties.constants import EVENT_UPDATED
+from pgr_django.properties.models import ExchangeRate, Property, PropertyChangeEvent
+
+
+logger = logging.getLogger(__name__)
+
+PRICE_USD_BATCH_SIZE = 50000
+PRICE_CURRENCY_FIELDS = (
+    'price_currency', 'price_min_currency', 'price_max_currency',
+    'monthly_hoa_fee_currency', 'monthly_hoa_fee_min_currency',
+    'monthly_hoa_fee_max_currency',
+)
+
+
+@celery_app.task
+def update_property_prices_usd(currencies=None, only_missing=False,
+                               batch_size=PRICE_USD_BATCH_SIZE):
+    """
+    Recomputes ``price_usd`` in SQL, one UPDATE per id range.
+
+    ``currencies`` limits it to properties priced in them (changed rates),
+    ``only_missing`` to rows written without signals (imports).
+    """
+    queryset = Property.objects.all()
+    if currencies:
+        currency_filter = Q()
+        for field in PRICE_CURRENCY_FIELDS:
+            currency_filter |= Q(**{f'{field}__in': currencies})
+        queryset = queryset.filter(currency_filter)
+    if only_missing:
+        queryset = queryset.filter(price_usd__isnull=True)
+
+    price_usd = ExchangeRate.price_usd_expression(ExchangeRate.rates())
+    bounds = Property.objects.aggregate(first=Min('id'), last=Max('id'))
+    if bounds['first'] is None:
+        return
+
+    updated = 0
+    for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+        batch = queryset.filter(id__gte=start, id__lt=start + batch_size)
+        with transaction.atomic():
+            PropertyChangeEvent.record_queryset(batch, EVENT_UPDATED, ['price_usd'])
+            updated += batch.update(price_usd=price_usd)
+
+    logger.info("Updated USD price of %s properties.", updated)
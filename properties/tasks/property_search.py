@@ -0,0 +1,30 @@
+import logging
+
+from config import celery_app
+from pgr_django.properties.models import SEARCH_VECTOR, Property
+
+
+logger = logging.getLogger(__name__)
+
+SEARCH_VECTOR_BATCH_SIZE = 5000
+
+
+@celery_app.task
+def update_property_search_vectors(only_missing=True, batch_size=SEARCH_VECTOR_BATCH_SIZE):
+    """Fills search_vector for rows written without signals (backfill, bulk imports)."""
+    queryset = Property.objects.order_by('id')
+    if only_missing:
+        queryset = queryset.filter(search_vector__isnull=True)
+
+    last_id = 0
+    updated = 0
+    while True:
+        ids = list(
+            queryset.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        updated += Property.objects.filter(id__in=ids).update(search_vector=SEARCH_VECTOR)
+        last_id = ids[-1]
+
+    logger.info("Updated search vector of %s properties.", updated)
@@ -20,4 +20,4 @@ def update_expired_properties_status():
 
     logger.info("Disabling %s expired properties.", expired_properties.count())
 
-    expired_properties.update(status=STATUS_INACTIVE)
+    expired_properties.tracked_update(status=STATUS_INACTIVE)
@@ -0,0 +1,11 @@
+from config import celery_app
+from pgr_django.properties.translation_backfill import backfill_translations
+
+
+@celery_app.task
+def backfill_property_translations(languages=None):
+    """
+    Translates outdated PropertyDescTranslation rows and rows missing one of
+    ``languages`` (``NEW_LANGUAGES`` by default), e.g. after adding a language.
+    """
+    return dict(backfill_translations(languages))
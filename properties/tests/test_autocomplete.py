@@ -0,0 +1,55 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .baker_recipes import PropertyRecipe
+from ..constants import STATUS_ACTIVE, STATUS_INACTIVE
+from ..models import Property
+
+
+class TestPropertiesAutocomplete(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("properties:autocomplete")
+        self.prop = PropertyRecipe.make(
+            status=STATUS_ACTIVE,
+            address="Khreshchatyk Street 22, Kyiv",
+            street="Khreshchatyk Street",
+            city="Kyiv",
+            zip_code="01001",
+        )
+        PropertyRecipe.make(
+            status=STATUS_ACTIVE,
+            address="Rynok Square 1, Lviv",
+            street="Rynok Square",
+            city="Lviv",
+            zip_code="79000",
+        )
+        PropertyRecipe.make(
+            status=STATUS_INACTIVE,
+            address="Khreshchatyk Street 1, Kyiv",
+            street="Khreshchatyk Street",
+            city="Kyiv",
+        )
+
+    def test_prefix_match(self):
+        response = self.client.get(self.url, {"q": "kyiv khresh"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row["id"] for row in response.data], [self.prop.id])
+        self.assertEqual(response.data[0]["address"], self.prop.address)
+
+    def test_misspelled_input(self):
+        response = self.client.get(self.url, {"q": "Khreshatyk Street"})
+        self.assertEqual([row["id"] for row in response.data], [self.prop.id])
+
+    def test_short_input(self):
+        response = self.client.get(self.url, {"q": "ky"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+
+    def test_search_vector_follows_address_changes(self):
+        self.prop.city = "Odesa"
+        self.prop.save()
+        self.assertTrue(Property.objects.search("odesa").filter(pk=self.prop.pk).exists())
@@ -0,0 +1,64 @@
+from django.test import TestCase
+
+from ..benchmarks.search import (
+    SCENARIOS,
+    ScenarioResult,
+    compare,
+    delete_generated,
+    generate_properties,
+    percentile,
+    rows_scanned,
+    run_scenarios,
+)
+from ..models import Property
+
+
+class TestSearchBenchmarkHelpers(TestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_rows_scanned(self):
+        plan = {
+            "Node Type": "Nested Loop",
+            "Plans": [
+                {"Node Type": "Seq Scan", "Actual Rows": 10, "Rows Removed by Filter": 90,
+                 "Actual Loops": 1},
+                {"Node Type": "Index Scan", "Actual Rows": 1, "Actual Loops": 10},
+            ],
+        }
+        self.assertEqual(rows_scanned(plan), 110)
+
+    def test_compare(self):
+        result = ScenarioResult("search", 10, 200, 5.0, 13.0, 20.0, 3.0, 1000)
+        baseline = {"scenarios": {"search": {
+            "p95_ms": 10.0, "queries": 2.0, "rows_scanned": 1000,
+        }}}
+        regressions = compare([result], baseline, tolerance=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith("search: p95"))
+
+
+class TestSearchBenchmarkRun(TestCase):
+
+    def test_generate_and_run(self):
+        agent = generate_properties(50, seed=2)
+        self.assertEqual(Property.objects.count(), 50)
+
+        # deep pages are out of range for 50 rows and would answer 404
+        scenarios = [
+            scenario._replace(params={**scenario.params, "page": 1})
+            if "page" in scenario.params else scenario
+            for scenario in SCENARIOS
+        ]
+        results = run_scenarios(scenarios, repeat=1, agent=agent)
+        self.assertEqual([result.name for result in results], [s.name for s in SCENARIOS])
+        for result in results:
+            self.assertEqual(result.status_code, 200, result.name)
+            self.assertGreater(result.queries, 0)
+
+        delete_generated()
+        self.assertFalse(Property.objects.exists())
@@ -0,0 +1,119 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from model_bakery import baker
+
+from .baker_recipes import PropertyRecipe
+from ..change_events import property_cache_version
+from ..constants import (
+    EVENT_CREATED,
+    EVENT_DELETED,
+    EVENT_MEDIA,
+    EVENT_UPDATED,
+    STATUS_ACTIVE,
+    STATUS_INACTIVE,
+)
+from ..models import Property, PropertyChangeEvent, PropertyPhoto
+from ..tasks import dispatch_property_change_events
+from ..tasks.import_properties import record_imported_properties
+from ..tasks.property_events import EVENT_MAX_ATTEMPTS
+
+purged_paths = []
+
+
+def purge_hook(paths):
+    purged_paths.extend(paths)
+
+
+class TestPropertyChangeEvents(TestCase):
+
+    def setUp(self):
+        self.prop = PropertyRecipe.make(status=STATUS_ACTIVE, city="Kyiv")
+
+    def events(self, **filters):
+        return list(
+            PropertyChangeEvent.objects.filter(**filters)
+            .order_by('id').values_list('property_id', 'kind', 'fields')
+        )
+
+    def test_save_and_delete(self):
+        self.prop.status = STATUS_INACTIVE
+        self.prop.save(update_fields=['status'])
+        prop_id = self.prop.pk
+        self.prop.delete()
+
+        self.assertEqual(self.events(), [
+            (prop_id, EVENT_CREATED, []),
+            (prop_id, EVENT_UPDATED, ['status']),
+            (prop_id, EVENT_DELETED, []),
+        ])
+
+    def test_tracked_update(self):
+        other = PropertyRecipe.make(status=STATUS_ACTIVE)
+        PropertyChangeEvent.objects.all().delete()
+
+        Property.objects.filter(status=STATUS_ACTIVE).tracked_update(status=STATUS_INACTIVE)
+
+        self.assertEqual(
+            sorted(self.events()),
+            [(self.prop.pk, EVENT_UPDATED, ['status']), (other.pk, EVENT_UPDATED, ['status'])],
+        )
+
+    def test_imported_properties(self):
+        started = timezone.now()
+        saved = PropertyRecipe.make(status=STATUS_ACTIVE)
+        # written in bulk, without signals
+        Property.objects.filter(pk=self.prop.pk).update(updated_at=timezone.now())
+
+        self.assertEqual(record_imported_properties(started), 1)
+        self.assertEqual(self.events(property_id=saved.pk), [(saved.pk, EVENT_CREATED, [])])
+        self.assertEqual(self.events(property_id=self.prop.pk, kind=EVENT_UPDATED), [
+            (self.prop.pk, EVENT_UPDATED, []),
+        ])
+
+    def test_photos(self):
+        photo = baker.make(PropertyPhoto, property=self.prop, photo="1/photo.jpg")
+        photo.delete()
+
+        self.assertEqual(self.events(kind=EVENT_MEDIA), [
+            (self.prop.pk, EVENT_MEDIA, ['photos']),
+            (self.prop.pk, EVENT_MEDIA, ['photos']),
+        ])
+
+
+@override_settings(
+    PROPERTY_CDN_PURGE_HOOKS=['pgr_django.properties.tests.test_change_events.purge_hook']
+)
+class TestDispatchPropertyChangeEvents(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        purged_paths.clear()
+        self.prop = PropertyRecipe.make(city="Kyiv")
+
+    def test_dispatch(self):
+        version = property_cache_version()
+        Property.objects.filter(pk=self.prop.pk).tracked_update(city="Lviv")
+
+        self.assertEqual(dispatch_property_change_events(batch_size=1), 2)
+
+        self.assertFalse(PropertyChangeEvent.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(property_cache_version(), version + 1)
+        self.assertIn(f"/get/{self.prop.pk}", purged_paths[0])
+        self.assertTrue(Property.objects.filter(search_vector="lviv").exists())
+        self.assertEqual(dispatch_property_change_events(), 0)
+
+    @patch("pgr_django.properties.tasks.property_events.handle_change_events",
+           side_effect=RuntimeError)
+    def test_failed_batch_is_retried(self, handle_change_events):
+        self.assertEqual(dispatch_property_change_events(), 0)
+
+        event = PropertyChangeEvent.objects.get()
+        self.assertIsNone(event.processed_at)
+        self.assertEqual(event.attempts, 1)
+
+        PropertyChangeEvent.objects.update(attempts=EVENT_MAX_ATTEMPTS - 1)
+        dispatch_property_change_events()
+        self.assertIsNotNone(PropertyChangeEvent.objects.get().processed_at)
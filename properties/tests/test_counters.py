@@ -0,0 +1,98 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .baker_recipes import PropertyRecipe
+from ..constants import (
+    STATUS_ACTIVE,
+    STATUS_DELETED,
+    STATUS_INACTIVE,
+    TYPE_COMMERCIAL,
+    TYPE_RESIDENTIAL,
+)
+from ..models import Property, PropertyCounter
+from ..tasks import reconcile_property_counters
+
+
+class TestPropertyCounters(TestCase):
+
+    def setUp(self):
+        self.prop = PropertyRecipe.make(
+            status=STATUS_ACTIVE, country="Ukraine", property_type=TYPE_RESIDENTIAL
+        )
+
+    @staticmethod
+    def count(status, country="Ukraine", property_type=TYPE_RESIDENTIAL):
+        counter = PropertyCounter.objects.filter(
+            status=status, country=country, property_type=property_type
+        ).first()
+        return counter.count if counter else 0
+
+    def test_save_moves_property_between_counters(self):
+        self.assertEqual(self.count(STATUS_ACTIVE), 1)
+
+        self.prop.status = STATUS_INACTIVE
+        self.prop.save()
+        self.assertEqual(self.count(STATUS_ACTIVE), 0)
+        self.assertEqual(self.count(STATUS_INACTIVE), 1)
+
+        self.prop.country = None
+        self.prop.save()
+        self.assertEqual(self.count(STATUS_INACTIVE), 0)
+        self.assertEqual(self.count(STATUS_INACTIVE, country=""), 1)
+
+    def test_delete(self):
+        self.prop.delete()
+        self.assertEqual(self.count(STATUS_ACTIVE), 0)
+
+    def test_tracked_update(self):
+        PropertyRecipe.make(
+            status=STATUS_ACTIVE, country="Ukraine", property_type=TYPE_COMMERCIAL
+        )
+        Property.objects.all().tracked_update(status=STATUS_INACTIVE)
+
+        self.assertEqual(self.count(STATUS_ACTIVE), 0)
+        self.assertEqual(self.count(STATUS_INACTIVE), 1)
+        self.assertEqual(self.count(STATUS_INACTIVE, property_type=TYPE_COMMERCIAL), 1)
+
+    def test_tracked_delete(self):
+        PropertyRecipe.make(
+            status=STATUS_ACTIVE, country="Ukraine", property_type=TYPE_RESIDENTIAL
+        )
+        self.assertEqual(self.count(STATUS_ACTIVE), 2)
+
+        Property.objects.all().tracked_delete()
+        self.assertEqual(self.count(STATUS_ACTIVE), 0)
+
+    def test_reconcile_fixes_drift(self):
+        Property.objects.update(status=STATUS_INACTIVE)
+        self.assertEqual(self.count(STATUS_ACTIVE), 1)
+
+        reconcile_property_counters()
+        self.assertEqual(self.count(STATUS_ACTIVE), 0)
+        self.assertEqual(self.count(STATUS_INACTIVE), 1)
+
+
+class TestPropertiesCountView(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("properties:count")
+        PropertyRecipe.make(status=STATUS_ACTIVE, country="Ukraine")
+        PropertyRecipe.make(status=STATUS_INACTIVE, country="Poland")
+        PropertyRecipe.make(status=STATUS_DELETED, country="Poland")
+
+    def test_total_excludes_deleted(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"total": 2})
+
+    def test_filters_and_groups(self):
+        response = self.client.get(self.url, {"country": "Poland", "group_by": "status"})
+        self.assertEqual(response.data["total"], 1)
+        self.assertEqual(response.data["groups"], {STATUS_INACTIVE: 1})
+
+        response = self.client.get(self.url, {"status": STATUS_DELETED})
+        self.assertEqual(response.data["total"], 1)
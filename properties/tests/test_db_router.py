@@ -0,0 +1,65 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from pgr_django.users.models import User
+from ..db_router import (
+    ReplicaRouter,
+    _lag_checks,
+    is_pinned_to_primary,
+    pin_to_primary,
+    replica_reads,
+)
+from ..models import Property
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_MAX_LAG=5)
+class TestReplicaRouter(SimpleTestCase):
+
+    def setUp(self):
+        _lag_checks.clear()
+        self.router = ReplicaRouter()
+
+    @patch("pgr_django.properties.db_router.replica_lag", return_value=0)
+    def test_reads_outside_opt_in_use_primary(self, replica_lag):
+        self.assertIsNone(self.router.db_for_read(Property))
+        replica_lag.assert_not_called()
+
+    @patch("pgr_django.properties.db_router.replica_lag", return_value=0.5)
+    def test_opted_in_reads_use_replica(self, replica_lag):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Property), "replica")
+            self.assertEqual(self.router.db_for_read(Property), "replica")
+        # lag is checked once per interval
+        replica_lag.assert_called_once_with("replica")
+
+    @patch("pgr_django.properties.db_router.replica_lag", return_value=30)
+    def test_lagging_replica_falls_back_to_primary(self, replica_lag):
+        with replica_reads():
+            self.assertIsNone(self.router.db_for_read(Property))
+
+    @patch("pgr_django.properties.db_router.replica_lag", return_value=None)
+    def test_unreachable_replica_falls_back_to_primary(self, replica_lag):
+        with replica_reads():
+            self.assertIsNone(self.router.db_for_read(Property))
+
+    @patch("pgr_django.properties.db_router.replica_lag", return_value=0)
+    def test_reads_after_write_use_primary(self, replica_lag):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_write(Property), "default")
+            self.assertIsNone(self.router.db_for_read(Property))
+
+    def test_no_migrations_on_replica(self):
+        self.assertFalse(self.router.allow_migrate("replica", "properties"))
+        self.assertIsNone(self.router.allow_migrate("default", "properties"))
+
+
+class TestPrimaryPin(SimpleTestCase):
+
+    def test_pin(self):
+        cache.clear()
+        user = User(pk=10)
+        self.assertFalse(is_pinned_to_primary(user))
+        pin_to_primary(user.pk)
+        self.assertTrue(is_pinned_to_primary(user))
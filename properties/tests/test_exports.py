@@ -0,0 +1,91 @@
+import csv
+import io
+from unittest.mock import patch
+
+from django.contrib.gis.geos import Point
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from pgr_django.users.tests import AgentRecipe, UserRecipe
+from .baker_recipes import PropertyRecipe
+from ..constants import STATUS_ACTIVE
+from ..exports import cell, xlsxwriter
+from ..models import PropertyPhoto
+
+
+class TestPropertyExports(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.agent = AgentRecipe.make(user__is_agent=True)
+        for city in ("Kyiv", "Lviv", "Kyiv"):
+            prop = PropertyRecipe.make(
+                status=STATUS_ACTIVE, city=city, location=Point(50.45, 30.52), agent=self.agent
+            )
+            PropertyPhoto.objects.create(property=prop, photo=f"{prop.id}/0.jpg", order=0)
+
+    def read_csv(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content).decode()
+        return list(csv.DictReader(io.StringIO(content)))
+
+    def test_my_properties_csv(self):
+        self.client.force_authenticate(user=self.agent.user)
+        url = reverse("properties:my-properties-export", kwargs={"file_format": "csv"})
+
+        # a chunk per property, photos and agents are still loaded per chunk
+        with patch("pgr_django.properties.exports.EXPORT_CHUNK_SIZE", 1):
+            rows = self.read_csv(self.client.get(url, {"cities": "Kyiv", "ordering": "id"}))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual({row["city"] for row in rows}, {"Kyiv"})
+        self.assertEqual(rows[0]["agent_id"], str(self.agent.id))
+        self.assertEqual(rows[0]["location_lat"], "50.45")
+        self.assertTrue(rows[0]["photos"].endswith(".jpg"))
+        self.assertNotIn("location", rows[0])
+
+    def test_csv_formulas_escaped(self):
+        PropertyRecipe.make(
+            status=STATUS_ACTIVE, city="=1+2", location=Point(50.45, 30.52), agent=self.agent
+        )
+        self.client.force_authenticate(user=self.agent.user)
+        url = reverse("properties:my-properties-export", kwargs={"file_format": "csv"})
+
+        rows = self.read_csv(self.client.get(url, {"cities": "=1+2"}))
+
+        self.assertEqual([row["city"] for row in rows], ["'=1+2"])
+
+    def test_cell(self):
+        self.assertEqual(cell("@SUM(A1)"), "'@SUM(A1)")
+        self.assertEqual(cell(["-1", "a"]), "'-1\na")
+        self.assertEqual(cell("-1.50", numeric=True), "-1.50")
+        self.assertEqual(cell("Kyiv"), "Kyiv")
+        self.assertEqual(cell(None), "")
+
+    def test_search_csv_requires_user(self):
+        url = reverse("properties:search-export", kwargs={"file_format": "csv"})
+        response = self.client.get(url, {"cities": "Kyiv"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(user=UserRecipe.make())
+        rows = self.read_csv(self.client.get(url, {"cities": "Lviv"}))
+        self.assertEqual([row["city"] for row in rows], ["Lviv"])
+
+    def test_xlsx(self):
+        if xlsxwriter is None:
+            self.skipTest("xlsxwriter is not installed")
+        self.client.force_authenticate(user=self.agent.user)
+        url = reverse("properties:my-properties-export", kwargs={"file_format": "xlsx"})
+        response = self.client.get(url, HTTP_ACCEPT="application/vnd.ms-excel")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("my-properties-", response["Content-Disposition"])
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"PK"))
+
+    def test_unknown_format(self):
+        self.client.force_authenticate(user=self.agent.user)
+        url = reverse("properties:my-properties-export", kwargs={"file_format": "pdf"})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.test import TestCase, modify_settings, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .baker_recipes import PropertyRecipe
+from ..constants import STATUS_ACTIVE
+from ..instrumentation import (
+    PHASE_SERIALIZE,
+    RequestTimings,
+    _request_timings,
+    current_timings,
+    timed,
+)
+
+
+class TestTimed(TestCase):
+
+    def test_noop_without_request(self):
+        with timed(PHASE_SERIALIZE):
+            pass
+        self.assertIsNone(current_timings())
+
+    def test_nested_phase_counted_once(self):
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        try:
+            with timed(PHASE_SERIALIZE):
+                with timed(PHASE_SERIALIZE):
+                    pass
+        finally:
+            _request_timings.reset(token)
+        self.assertEqual(timings.phases[PHASE_SERIALIZE][1], 1)
+
+
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1, SERVER_TIMING_HEADER=True)
+@modify_settings(MIDDLEWARE={
+    'prepend': 'pgr_django.properties.instrumentation.ServerTimingMiddleware',
+})
+class TestServerTimingMiddleware(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        PropertyRecipe.make(status=STATUS_ACTIVE, city="Kyiv")
+
+    def test_search_timings(self):
+        url = reverse("properties:search")
+        with self.assertLogs("pgr_django.properties.instrumentation", "INFO") as logs:
+            response = self.client.get(url, {"cities": "Kyiv"})
+        metrics = response["Server-Timing"]
+        self.assertIn("db;dur=", metrics)
+        self.assertIn("serialize;dur=", metrics)
+        self.assertIn("cache;dur=", metrics)
+        self.assertIn('desc="0 hit 1 miss"', metrics)
+        self.assertIn("total;dur=", metrics)
+        self.assertEqual(logs.records[0].timings["cache"]["misses"], 1)
+
+        response = self.client.get(url, {"cities": "Kyiv"})
+        self.assertIn('desc="1 hit 0 miss"', response["Server-Timing"])
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        response = self.client.get(reverse("properties:search"), {"cities": "Kyiv"})
+        self.assertFalse(response.has_header("Server-Timing"))
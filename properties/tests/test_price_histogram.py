@@ -0,0 +1,80 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from moneyed import Money
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from pgr_django.utils.properties_parser import BUY_TYPE
+from .baker_recipes import PropertyRecipe
+from ..constants import STATUS_ACTIVE, STATUS_INACTIVE
+
+
+class TestPropertyPriceHistogram(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse("properties:price-histogram")
+        for amount in ("100.00", "200.00", "300.00", "500.00"):
+            PropertyRecipe.make(
+                status=STATUS_ACTIVE,
+                buy_rent=BUY_TYPE,
+                city="Kyiv",
+                price=Money(amount=Decimal(amount), currency="USD"),
+            )
+        PropertyRecipe.make(
+            status=STATUS_INACTIVE,
+            buy_rent=BUY_TYPE,
+            city="Kyiv",
+            price=Money(amount=Decimal("900.00"), currency="USD"),
+        )
+
+    def test_histogram(self):
+        response = self.client.get(self.url, {"bins": 4, "percentiles": "50"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 4)
+        self.assertEqual(response.data["min"], 100)
+        self.assertEqual(response.data["max"], 500)
+        self.assertEqual([b["count"] for b in response.data["bins"]], [1, 1, 1, 1])
+        self.assertEqual(response.data["bins"][-1]["to"], 500)
+        self.assertEqual(response.data["percentiles"], {"50": 250})
+
+    def test_price_filters_ignored(self):
+        response = self.client.get(self.url, {"bins": 2, "maxprice": 150})
+        self.assertEqual(response.data["count"], 4)
+
+    def test_single_price(self):
+        response = self.client.get(self.url, {"status": STATUS_INACTIVE})
+        self.assertEqual(
+            response.data["bins"], [{"from": 900, "to": 900, "count": 1}]
+        )
+
+    def test_cached_by_filters(self):
+        self.client.get(self.url, {"cities": "kyiv", "bins": 4})
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {"bins": 4, "cities": "KYIV"})
+        self.assertEqual(response.data["count"], 4)
+
+    def test_cached_by_filter_values(self):
+        PropertyRecipe.make(
+            status=STATUS_ACTIVE,
+            buy_rent=BUY_TYPE,
+            city="Lviv",
+            price=Money(amount=Decimal("600.00"), currency="USD"),
+        )
+        spaced = self.client.get(self.url, {"cities": "Kyiv, Lviv"}).data
+        cache.clear()
+        compact = self.client.get(self.url, {"cities": "Kyiv,Lviv"}).data
+        self.assertEqual(compact["count"], 5)
+        self.assertEqual(spaced, compact)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {"cities": " Kyiv ,Lviv"})
+        self.assertEqual(response.data, compact)
+
+    def test_invalid_params(self):
+        for params in ({"bins": 0}, {"bins": "x"}, {"percentiles": "101"}, {"price": "eur"}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
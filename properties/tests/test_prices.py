@@ -0,0 +1,86 @@
+from decimal import Decimal
+
+from django.test import TestCase
+from moneyed import Money
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from pgr_django.properties.constants import STATUS_ACTIVE
+from pgr_django.properties.models import ExchangeRate, Property
+from pgr_django.properties.tasks import update_property_prices_usd
+from pgr_django.properties.tests.baker_recipes import PropertyRecipe
+from pgr_django.utils.properties_parser import BUY_TYPE, RENT_TYPE
+
+
+class PropertyPriceUSDTestCase(TestCase):
+
+    def setUp(self) -> None:
+        ExchangeRate.objects.create(currency="EUR", rate_to_usd=Decimal("1.10"))
+
+    def test_calculate_and_set_price_usd(self):
+        prop = Property(
+            buy_rent=BUY_TYPE,
+            price_min=Money(amount=Decimal("100.00"), currency="EUR"),
+            price_max=Money(amount=Decimal("300.00"), currency="USD"),
+        )
+        prop.calculate_and_set_price_usd(ExchangeRate.rates())
+        self.assertEqual(prop.price_usd, Decimal("205.00"))
+
+    def test_calculate_and_set_price_usd_rounds_half_up(self):
+        prop = Property(
+            buy_rent=BUY_TYPE,
+            price_min=Money(amount=Decimal("100.02"), currency="USD"),
+            price_max=Money(amount=Decimal("100.03"), currency="USD"),
+        )
+        prop.calculate_and_set_price_usd(ExchangeRate.rates())
+        # same as the numeric(15,2) cast of the batch update
+        self.assertEqual(prop.price_usd, Decimal("100.03"))
+
+    def test_price_usd_without_rate(self):
+        prop = Property(
+            buy_rent=BUY_TYPE,
+            price=Money(amount=Decimal("100.00"), currency="UAH"),
+        )
+        prop.calculate_and_set_price_usd(ExchangeRate.rates())
+        self.assertIsNone(prop.price_usd)
+
+    def test_price_usd_on_save(self):
+        prop = PropertyRecipe.make(
+            buy_rent=RENT_TYPE,
+            monthly_hoa_fee=Money(amount=Decimal("1000.00"), currency="EUR"),
+        )
+        self.assertEqual(prop.price_usd, Decimal("1100.00"))
+
+    def test_rate_change_recomputes_in_sql(self):
+        prop = PropertyRecipe.make(
+            buy_rent=BUY_TYPE,
+            price=Money(amount=Decimal("1000.00"), currency="EUR"),
+        )
+        usd_prop = PropertyRecipe.make(
+            buy_rent=BUY_TYPE,
+            price=Money(amount=Decimal("1000.00"), currency="USD"),
+        )
+        ExchangeRate.objects.filter(currency="EUR").update(rate_to_usd=Decimal("1.20"))
+
+        update_property_prices_usd(currencies=["EUR"])
+        prop.refresh_from_db()
+        usd_prop.refresh_from_db()
+        self.assertEqual(prop.price_usd, Decimal("1200.00"))
+        self.assertEqual(usd_prop.price_usd, Decimal("1000.00"))
+
+    def test_search_by_usd_price(self):
+        eur_prop = PropertyRecipe.make(
+            status=STATUS_ACTIVE,
+            buy_rent=BUY_TYPE,
+            price=Money(amount=Decimal("1000.00"), currency="EUR"),
+        )
+        PropertyRecipe.make(
+            status=STATUS_ACTIVE,
+            buy_rent=BUY_TYPE,
+            price=Money(amount=Decimal("1050.00"), currency="USD"),
+        )
+        response = APIClient().get("/properties/search?minpriceusd=1090")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["id"] for item in response.data["items"]], [eur_prop.id]
+        )
@@ -0,0 +1,77 @@
+from django.contrib.gis.geos import Point
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from pgr_django.users.tests import AgentRecipe, UserRecipe
+from .baker_recipes import PropertyRecipe
+from .query_budget import QueryBudgetTestMixin
+from ..constants import STATUS_ACTIVE
+from ..models import PropertyFile, PropertyPhoto, UserSavedProperty
+
+
+class TestPropertyQueryBudgets(QueryBudgetTestMixin, TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    @staticmethod
+    def make_properties(count, **kwargs):
+        properties = []
+        for _ in range(count):
+            prop = PropertyRecipe.make(
+                status=STATUS_ACTIVE, city="Kyiv", location=Point(50.45, 30.52), **kwargs
+            )
+            for order in range(2):
+                PropertyPhoto.objects.create(property=prop, photo=f"{prop.id}/{order}.jpg", order=order)
+            PropertyFile.objects.create(property=prop, file=f"{prop.id}/plan.pdf", order=0)
+            properties.append(prop)
+        return properties
+
+    def test_search(self):
+        self.assertQueryBudget(
+            reverse("properties:search"), {"cities": "Kyiv"}, populate=self.make_properties
+        )
+
+    def test_my_properties(self):
+        agent = AgentRecipe.make(user__is_agent=True)
+        self.client.force_authenticate(user=agent.user)
+        self.assertQueryBudget(
+            reverse("properties:my-properties"),
+            populate=lambda count: self.make_properties(count, agent=agent),
+        )
+
+    def test_list(self):
+        self.assertQueryBudget(reverse("properties:list"), populate=self.make_properties)
+
+    def test_detail(self):
+        prop, = self.make_properties(1)
+        self.assertQueryBudget(reverse("properties:get", kwargs={"pk": prop.pk}))
+
+    def test_photo_list(self):
+        prop = PropertyRecipe.make()
+
+        def populate(count):
+            for order in range(count):
+                PropertyPhoto.objects.create(property=prop, photo=f"{prop.id}/{order}.jpg", order=order)
+
+        self.assertQueryBudget(
+            reverse("properties:photo-list", kwargs={"property_id": prop.pk}), populate=populate
+        )
+
+    def test_user_saved_list(self):
+        user = UserRecipe.make()
+        self.client.force_authenticate(user=user)
+
+        def populate(count):
+            for prop in PropertyRecipe.make(_quantity=count):
+                UserSavedProperty.objects.create(user=user, property=prop, last_status=prop.status)
+
+        self.assertQueryBudget(reverse("properties:user-saved-list"), populate=populate)
+
+    def test_area_search(self):
+        self.assertQueryBudget(
+            reverse("properties:properties-area-search"),
+            {"location": "POINT(50.45 30.52)", "radius": 0.1},
+            populate=self.make_properties,
+        )
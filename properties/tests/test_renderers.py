@@ -0,0 +1,92 @@
+import io
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import pytz
+from django.contrib.gis.geos import Point, Polygon
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils.translation import gettext_lazy as _
+from moneyed import Money
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .baker_recipes import PropertyRecipe
+from ..parsers import ORJSONParser
+from ..renderers import ORJSONRenderer
+
+
+class TestORJSONRenderer(SimpleTestCase):
+
+    def test_matches_json_renderer(self):
+        data = {
+            'id': 1,
+            'price': Decimal('10.50'),
+            'created': datetime(2021, 5, 1, 10, 30, 15, 123456, tzinfo=pytz.UTC),
+            'day': date(2021, 5, 1),
+            'at': time(10, 30),
+            'took': timedelta(seconds=90),
+            'label': _('Address unknown'),
+            'tags': ('a', 'b'),
+            'text': 'line\u2028separator',
+            'nested': [{'empty': None, 'flag': True, 'ratio': 0.5}],
+        }
+        self.assertEqual(
+            ORJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+    def test_money_and_geometries(self):
+        polygon = Polygon(((0, 0), (0, 1), (1, 1), (0, 0)))
+        data = {
+            'price': Money('4.00', 'USD'),
+            'location': Point(1.5, 2.5),
+            'area': polygon,
+        }
+        self.assertEqual(
+            ORJSONRenderer().render(data),
+            b'{"price":"4 USD","location":{"lat":1.5,"lng":2.5},'
+            b'"area":{"type":"Polygon","coordinates":'
+            b'[[[0.0,0.0],[0.0,1.0],[1.0,1.0],[0.0,0.0]]]}}'
+        )
+
+    def test_indent_falls_back_to_json_renderer(self):
+        data = {'id': 1}
+        context = {'indent': 4}
+        self.assertEqual(
+            ORJSONRenderer().render(data, renderer_context=context),
+            JSONRenderer().render(data, renderer_context=context)
+        )
+
+    def test_none_renders_empty(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+
+class TestORJSONParser(SimpleTestCase):
+
+    def test_parse(self):
+        stream = io.BytesIO('{"city": "Kyiv", "beds": 3}'.encode())
+        self.assertEqual(
+            ORJSONParser().parse(stream), {'city': 'Kyiv', 'beds': 3}
+        )
+
+    def test_parse_error(self):
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"city": '))
+
+
+class TestORJSONViews(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.prop = PropertyRecipe.make(price=Money('4.00'))
+
+    def test_detail_is_rendered_with_orjson(self):
+        response = self.client.get(
+            reverse('properties:get', kwargs={'pk': self.prop.id})
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.accepted_renderer, ORJSONRenderer)
+        self.assertEqual(response.json()['id'], self.prop.id)
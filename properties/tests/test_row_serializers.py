@@ -0,0 +1,60 @@
+from django.test import TestCase
+from moneyed import Money
+
+from pgr_django.users.tests import AgentRecipe
+from .baker_recipes import PropertyRecipe
+from ..models import Property
+from ..row_serializers import (
+    FeaturedPropertyRowSerializer,
+    PropertySearchRowSerializer,
+    PropertySearchMyPropertiesRowSerializer,
+)
+from ..serializers import (
+    PropertySearchSerializer,
+    PropertySearchMyPropertiesSerializer,
+)
+
+
+class TestPropertyRowSerializers(TestCase):
+
+    def setUp(self):
+        agent = AgentRecipe.make(user__is_agent=True)
+        PropertyRecipe.make(
+            agent=agent,
+            country="United States",
+            city="Las Vegas",
+            price=Money("4.00"),
+            beds=3,
+        )
+        PropertyRecipe.make(
+            agent=agent,
+            country="United States",
+            region="Nevada",
+            price_min=Money("4.00"),
+            price_max=Money("8.00"),
+        )
+        self.queryset = Property.objects.order_by('id')
+
+    def assert_same_output(self, row_serializer_class, serializer_class):
+        rows = row_serializer_class.get_rows(self.queryset)
+        expected = serializer_class(self.queryset, many=True).data
+        self.assertEqual(row_serializer_class(rows).data, expected)
+
+    def test_search_row_serializer_matches_model_serializer(self):
+        self.assert_same_output(
+            PropertySearchRowSerializer, PropertySearchSerializer
+        )
+
+    def test_my_properties_row_serializer_matches_model_serializer(self):
+        self.assert_same_output(
+            PropertySearchMyPropertiesRowSerializer,
+            PropertySearchMyPropertiesSerializer
+        )
+
+    def test_featured_row_serializer_without_agent(self):
+        PropertyRecipe.make(agent=None, country="Ukraine", city="Kyiv")
+        self.assert_same_output(
+            FeaturedPropertyRowSerializer, PropertySearchSerializer
+        )
+        rows = FeaturedPropertyRowSerializer.get_rows(self.queryset)
+        self.assertIsNone(FeaturedPropertyRowSerializer(rows).data[-1]["agent"])
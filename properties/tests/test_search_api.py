@@ -1,5 +1,6 @@
 from itertools import cycle
 
+from django.contrib.gis.geos import Point
 from django.test import TestCase
 from moneyed import Money
 from rest_framework import status
@@ -135,3 +136,50 @@ class SearchAPITestCase(TestCase):
         self.assertEqual(len(response.data["items"]), 1)
         resp_prop = response.data["items"][0]
         self.assertEqual(resp_prop["price"], "4.00")
+
+    def test_near_orders_by_distance(self):
+        far, near = PropertyRecipe.make(
+            country="United States",
+            city="Las Vegas",
+            location=cycle([Point(1, 1, srid=4326), Point(0.01, 0, srid=4326)]),
+            status=STATUS_ACTIVE,
+            _quantity=2
+        )
+        response = self.client.get(
+            "/properties/search"
+            f"?near=0,0"
+            f"&properties={far.id},{near.id}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        items = response.data["items"]
+        self.assertEqual([item["id"] for item in items], [near.id, far.id])
+        self.assertAlmostEqual(items[0]["distance"], 1111.9, delta=1)
+        self.assertLess(items[0]["distance"], items[1]["distance"])
+
+    def test_near_orders_by_meters_at_high_latitude(self):
+        # 1.5 degrees of longitude at 60N are ~83 km, 1.2 of latitude ~133 km
+        east, north = PropertyRecipe.make(
+            country="Norway",
+            city="Oslo",
+            location=cycle([Point(1.5, 60, srid=4326), Point(0, 61.2, srid=4326)]),
+            status=STATUS_ACTIVE,
+            _quantity=2
+        )
+        response = self.client.get(
+            "/properties/search"
+            f"?near=0,60"
+            f"&properties={north.id},{east.id}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        items = response.data["items"]
+        self.assertEqual([item["id"] for item in items], [east.id, north.id])
+        self.assertLess(items[0]["distance"], items[1]["distance"])
+
+    def test_near_is_enough_as_filter(self):
+        response = self.client.get("/properties/search?near=0,0")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("distance", response.data["items"][0])
+
+    def test_near_invalid(self):
+        response = self.client.get("/properties/search?near=0")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,94 @@
+import threading
+
+from django.test import TestCase
+
+from .baker_recipes import PropertyRecipe
+from ..constants import TRANSLATION_OUTDATED, TRANSLATION_TRANSLATED
+from ..models import PropertyDescTranslation, TranslationMemory
+from ..translation_backfill import backfill_translations
+
+
+class StubTranslator:
+    """Local translator: prefixes texts with the target language."""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, texts, source, target):
+        with self.lock:
+            self.calls.append((source, target, list(texts)))
+        return [f"{target}:{text}" for text in texts]
+
+    @property
+    def texts(self):
+        return sorted(text for _, _, texts in self.calls for text in texts)
+
+
+class TestTranslationBackfill(TestCase):
+
+    def make_translation(self, city, **kwargs):
+        prop = PropertyRecipe.make(city=city, region="Kyiv oblast", country="Ukraine")
+        return PropertyDescTranslation.objects.create(property=prop, **kwargs)
+
+    def backfill(self, translator, **kwargs):
+        return backfill_translations(
+            ["ko", "fr"], translator=translator, batch_size=2, workers=2, rate_limit=0, **kwargs
+        )
+
+    def test_missing_languages(self):
+        rows = [
+            self.make_translation(
+                "Kyiv",
+                translation_status=TRANSLATION_TRANSLATED,
+                translations={
+                    "en": {"city": "Kyiv", "country": "Ukraine"},
+                    "fr": {"city": "Kiev", "country": "Ukraine"},
+                },
+            )
+            for _ in range(3)
+        ]
+        translator = StubTranslator()
+
+        stats = self.backfill(translator)
+
+        # one translation per distinct string, not per property
+        self.assertEqual(translator.texts, ["Kyiv", "Ukraine"])
+        self.assertEqual(stats["rows"], 3)
+        for row in rows:
+            row.refresh_from_db()
+            self.assertEqual(row.translations["ko"], {"city": "ko:Kyiv", "country": "ko:Ukraine"})
+            self.assertEqual(row.translations["fr"]["city"], "Kiev")
+
+    def test_outdated_rows_use_translation_memory(self):
+        first = self.make_translation("Lviv", translation_status=TRANSLATION_OUTDATED, translations={})
+        translator = StubTranslator()
+        self.backfill(translator)
+        calls = len(translator.calls)
+
+        second = self.make_translation("Lviv", translation_status=TRANSLATION_OUTDATED, translations={})
+        stats = self.backfill(translator)
+
+        self.assertEqual(len(translator.calls), calls)
+        self.assertEqual(stats["memory_hits"], stats["strings"])
+        for row in (first, second):
+            row.refresh_from_db()
+            self.assertEqual(row.translation_status, TRANSLATION_TRANSLATED)
+            self.assertEqual(row.translations["en"]["city"], "Lviv")
+            self.assertEqual(row.translations["fr"]["region"], "fr:Kyiv oblast")
+
+    def test_failed_translations_are_retried(self):
+        row = self.make_translation("Odesa", translation_status=TRANSLATION_OUTDATED, translations={})
+
+        def failing(texts, source, target):
+            raise RuntimeError
+
+        stats = self.backfill(failing)
+        row.refresh_from_db()
+        self.assertEqual(row.translation_status, TRANSLATION_OUTDATED)
+        self.assertEqual(stats["rows"], 0)
+        self.assertFalse(TranslationMemory.objects.exists())
+
+        self.backfill(StubTranslator())
+        row.refresh_from_db()
+        self.assertEqual(row.translation_status, TRANSLATION_TRANSLATED)
@@ -8,7 +8,9 @@ from rest_framework.test import APIClient
 from .baker_recipes import PropertyRecipe
 
 from ..models import Property
-from ..constants import TYPE_SUBTYPE_MAP, TYPE_RESIDENTIAL, TYPE_COMMERCIAL
+from ..constants import (
+    STATUS_INACTIVE, TYPE_SUBTYPE_MAP, TYPE_RESIDENTIAL, TYPE_COMMERCIAL,
+)
 from pgr_django.users.tests import AgentRecipe, BrokerRecipe, UserRecipe
 
 
@@ -271,3 +273,62 @@ class TestPropertyRetrieve(TestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), num_of_response_fields)
+
+
+class TestPropertyConditionalGet(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.agent = AgentRecipe.make(user__is_agent=True)
+        self.prop = PropertyRecipe.make(agent=self.agent)
+        self.detail_url = reverse("properties:get", kwargs={"pk": self.prop.pk})
+
+    def test_detail_not_modified(self):
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+    def test_detail_modified_by_bulk_update(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+        Property.objects.filter(pk=self.prop.pk).update(status=STATUS_INACTIVE)
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["status"], STATUS_INACTIVE)
+
+    def test_detail_modified_by_agent_change(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+        self.agent.first_name = "Changed"
+        self.agent.save()
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["agent"]["first_name"], "Changed")
+
+    def test_low_detailed_if_modified_since(self):
+        url = reverse("properties:property-low-detailed", kwargs={"pk": self.prop.pk})
+        last_modified = self.client.get(url)["Last-Modified"]
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_not_modified(self):
+        url = reverse("properties:list")
+        etag = self.client.get(url)["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        PropertyRecipe.make(agent=self.agent)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
@@ -0,0 +1,256 @@
+"""
+Bulk Google translation of PropertyDescTranslation rows.
+
+``backfill_translations`` translates the rows that are outdated or miss one of
+the languages. Each distinct string is translated once per language pair:
+results are kept in ``TranslationMemory``, so city and region names and the
+standard scraped descriptions reach the API only the first time they are
+seen. Strings missing from the memory are sent in batches from a few threads
+under a shared rate limit, rows are written back with one bulk update per
+batch of rows.
+
+A translator is a callable ``(texts, source, target) -> translated texts``
+(``None`` for texts it could not translate), ``TRANSLATION_BACKFILL_TRANSLATOR``
+names it as a dotted path and defaults to Google.
+"""
+import hashlib
+import logging
+import threading
+import time
+import typing as t
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from pgr_django.utils.google_translate import GoogleTranslate
+
+from .constants import (
+    NEW_LANGUAGES,
+    SOURCE_LANGUAGE,
+    TRANSLATION_OUTDATED,
+    TRANSLATION_TRANSLATED,
+)
+from .models import PropertyDescTranslation, TranslationMemory
+
+logger = logging.getLogger(__name__)
+
+ROW_BATCH_SIZE = 500
+DEFAULT_BATCH_SIZE = 100  # strings per request
+DEFAULT_WORKERS = 4
+DEFAULT_RATE_LIMIT = 10  # requests per second
+# translations key -> Property attribute, the source of outdated rows
+SOURCE_FIELDS = {
+    'txt': 'description',
+    'city': 'city',
+    'region': 'region',
+    'country': 'country',
+}
+
+
+def text_hash(text: str) -> str:
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def translatable(text) -> bool:
+    return isinstance(text, str) and bool(text.strip())
+
+
+def google_translator(texts: list, source: str, target: str) -> list:
+    keys = tuple(str(index) for index in range(len(texts)))
+    translations = GoogleTranslate(obj_for_translation=None).retrieve_google_translations(
+        source, [target], list(texts), keys
+    ) or {}
+    translated = translations.get(target) or {}
+    return [translated.get(key) for key in keys]
+
+
+class RateLimiter:
+    """Spaces ``wait()`` returns at least ``1 / rate`` seconds apart, across threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def rows_to_translate(languages: t.Sequence[str]):
+    missing = Q(translation_status=TRANSLATION_OUTDATED) | Q(translations__isnull=True)
+    for language in languages:
+        missing |= ~Q(translations__has_key=language)
+    return PropertyDescTranslation.objects.filter(missing)
+
+
+def translation_plan(row: PropertyDescTranslation, languages: t.Sequence[str]) -> tuple:
+    """Source language, ``{key: text}`` to translate and target languages of a row."""
+    translations = row.translations or {}
+    if row.translation_status != TRANSLATION_OUTDATED and translations.get(SOURCE_LANGUAGE):
+        targets = [language for language in languages if language not in translations]
+        return SOURCE_LANGUAGE, translations[SOURCE_LANGUAGE], targets
+
+    prop = row.property
+    source = prop.description_language or SOURCE_LANGUAGE
+    texts = {
+        key: getattr(prop, attr) for key, attr in SOURCE_FIELDS.items() if getattr(prop, attr)
+    }
+    targets = sorted((set(translations) | set(languages) | {SOURCE_LANGUAGE}) - {source})
+    return source, texts, targets
+
+
+def remembered(pair: tuple, hashes: t.Collection[str]) -> dict:
+    source, target = pair
+    return dict(
+        TranslationMemory.objects.filter(
+            source_language=source, target_language=target, source_hash__in=hashes
+        ).values_list('source_hash', 'translated_text')
+    )
+
+
+def translate_missing(translator, jobs: list, workers: int, limiter: RateLimiter,
+                      stats: Counter) -> list:
+    """Runs ``(pair, texts)`` jobs on the translator, returns new TranslationMemory rows."""
+    def run(job):
+        (source, target), texts = job
+        limiter.wait()
+        try:
+            translated = translator(texts, source, target)
+        except Exception:
+            logger.exception("Failed to translate %s strings %s->%s.", len(texts), source, target)
+            translated = []
+        if len(translated) != len(texts):
+            translated = [None] * len(texts)
+        return source, target, texts, translated
+
+    memory = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for source, target, texts, translated in executor.map(run, jobs):
+            stats['requests'] += 1
+            for text, translation in zip(texts, translated):
+                if translation is None:
+                    stats['failed'] += 1
+                    continue
+                memory.append(TranslationMemory(
+                    source_language=source, target_language=target,
+                    source_hash=text_hash(text), source_text=text, translated_text=translation,
+                ))
+    stats['translated'] += len(memory)
+    return memory
+
+
+def apply_translations(row, plan: tuple, known: dict) -> bool:
+    """Writes the translations of ``plan`` into ``row``, False when one is missing."""
+    source, texts, targets = plan
+    translations = dict(row.translations or {})
+    if row.translation_status == TRANSLATION_OUTDATED or SOURCE_LANGUAGE not in translations:
+        translations[source] = dict(texts)
+    for target in targets:
+        translated = dict(translations.get(target) or {})
+        for key, text in texts.items():
+            if not translatable(text):
+                translated[key] = text
+                continue
+            translation = known.get((source, target, text_hash(text)))
+            if translation is None:
+                return False
+            translated[key] = translation
+        translations[target] = translated
+    row.translations = translations
+    if row.translation_status == TRANSLATION_OUTDATED:
+        row.translation_status = TRANSLATION_TRANSLATED
+    return True
+
+
+def save_rows(rows: list, snapshots: dict) -> int:
+    """Bulk updates ``rows`` unless they or their property changed meanwhile."""
+    with transaction.atomic():
+        current = {
+            row_id: (status, updated_at)
+            for row_id, status, updated_at in PropertyDescTranslation.objects
+            .select_for_update(of=('self',))
+            .filter(id__in=[row.id for row in rows])
+            .values_list('id', 'translation_status', 'property__updated_at')
+        }
+        unchanged = [row for row in rows if current.get(row.id) == snapshots[row.id]]
+        PropertyDescTranslation.objects.bulk_update(
+            unchanged, ['translations', 'translation_status']
+        )
+    return len(unchanged)
+
+
+def backfill_translations(languages: t.Sequence[str] = None, translator=None,
+                          queryset=None, batch_size: int = None, workers: int = None,
+                          rate_limit: float = None) -> Counter:
+    """
+    Translates outdated rows and rows missing one of ``languages`` (by default
+    ``NEW_LANGUAGES``), returns the number of rows, distinct strings, memory
+    hits, translated strings and API requests.
+    """
+    languages = list(languages or NEW_LANGUAGES)
+    if translator is None:
+        translator = import_string(getattr(
+            settings, 'TRANSLATION_BACKFILL_TRANSLATOR',
+            'pgr_django.properties.translation_backfill.google_translator',
+        ))
+    if batch_size is None:
+        batch_size = getattr(settings, 'TRANSLATION_BACKFILL_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    if workers is None:
+        workers = getattr(settings, 'TRANSLATION_BACKFILL_WORKERS', DEFAULT_WORKERS)
+    if rate_limit is None:
+        rate_limit = getattr(settings, 'TRANSLATION_BACKFILL_RATE_LIMIT', DEFAULT_RATE_LIMIT)
+    if queryset is None:
+        queryset = rows_to_translate(languages)
+
+    limiter = RateLimiter(rate_limit)
+    stats = Counter()
+    last_id = 0
+    while True:
+        rows = list(
+            queryset.filter(id__gt=last_id).select_related('property').order_by('id')[:ROW_BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        plans = {row.id: translation_plan(row, languages) for row in rows}
+        snapshots = {row.id: (row.translation_status, row.property.updated_at) for row in rows}
+        wanted = defaultdict(dict)  # (source, target) -> {hash: text}
+        for source, texts, targets in plans.values():
+            for target in targets:
+                wanted[(source, target)].update(
+                    (text_hash(text), text) for text in texts.values() if translatable(text)
+                )
+
+        known = {}
+        jobs = []
+        for pair, texts in wanted.items():
+            stats['strings'] += len(texts)
+            for source_hash, translation in remembered(pair, texts).items():
+                known[(*pair, source_hash)] = translation
+            missing = [text for source_hash, text in texts.items() if (*pair, source_hash) not in known]
+            stats['memory_hits'] += len(texts) - len(missing)
+            jobs += [(pair, missing[i:i + batch_size]) for i in range(0, len(missing), batch_size)]
+
+        memory = translate_missing(translator, jobs, workers, limiter, stats)
+        TranslationMemory.objects.bulk_create(memory, ignore_conflicts=True)
+        for entry in memory:
+            known[(entry.source_language, entry.target_language, entry.source_hash)] = \
+                entry.translated_text
+
+        translated_rows = [row for row in rows if apply_translations(row, plans[row.id], known)]
+        stats['rows'] += save_rows(translated_rows, snapshots)
+
+    logger.info("Translation backfill: %s", dict(stats))
+    return stats
@@ -11,7 +11,9 @@ from .views import (
     properties_list_view,
     properties_partial_update_view,
     properties_search_view,
+    properties_search_export_view,
     properties_search_my_properties_view,
+    properties_search_my_properties_export_view,
     properties_type_subtype_get_view,
     properties_update_view,
     user_saved_properties_detail,
@@ -26,18 +28,28 @@ from .views import (
     properties_address_search_view,
     properties_area_search,
     property_low_detailed_view,
+    properties_autocomplete_view,
+    property_price_histogram_view,
 )
 
 app_name = "properties"
 
 urlpatterns = [
     path("search", view=properties_search_view, name="search"),
+    path("search/export/<str:file_format>", view=properties_search_export_view, name="search-export"),
     path("my-properties", view=properties_search_my_properties_view, name="my-properties"),
+    path(
+        "my-properties/export/<str:file_format>",
+        view=properties_search_my_properties_export_view,
+        name="my-properties-export",
+    ),
     path("list", view=properties_list_view, name="list"),
     path("get/<pk>", view=properties_detail_view, name="get"),
 
     path("create", view=properties_create_view, name="create"),
     path("count", view=properties_count_view, name="count"),
+    path("autocomplete", view=properties_autocomplete_view, name="autocomplete"),
+    path("price-histogram", view=property_price_histogram_view, name="price-histogram"),
     path("update/<pk>", view=properties_update_view, name="update"),
     path("patch/<pk>", view=properties_partial_update_view, name="patch"),
 
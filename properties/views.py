@@ -1,23 +1,26 @@
+import hashlib
+import json
 import logging
 import typing as t
 from datetime import datetime
 
 from dateutil.relativedelta import relativedelta
+from django.core.cache import cache
 from django.db.models import (
     Q,
     Subquery,
+    Sum,
     Prefetch
 )
 from django.db.models.query import QuerySet
 from django.db.utils import IntegrityError
 from django.utils.decorators import method_decorator
 from django.utils.translation import gettext_lazy as _
-from django.views.decorators.cache import cache_page
 from django.contrib.gis.geos import fromstr, Polygon
 from rest_framework import status
 from rest_framework.exceptions import APIException
 from rest_framework.filters import OrderingFilter
-from rest_framework.generics import ListAPIView, get_object_or_404, CreateAPIView
+from rest_framework.generics import ListAPIView, get_object_or_404, CreateAPIView, GenericAPIView
 from rest_framework.mixins import (
     CreateModelMixin,
     DestroyModelMixin,
@@ -46,13 +49,25 @@ from pgr_django.users.permissions import UserIsAgentOrBroker
 from pgr_django.utils.drf_paginators import DefaultPagination, PropertiesPagination
 from pgr_django.utils.google_translate import GoogleTranslate
 from pgr_django.utils.stripe import Stripe
+from .change_events import property_cache_version
+from .conditional import (
+    PropertyVersion,
+    conditional_get,
+    detail_validators,
+    list_validators,
+)
 from .constants import (
     STATUS_DELETED,
     TYPE_SUBTYPE_MAP,
     STATUS_INACTIVE,
     STATUS_ACTIVE
 )
+from .db_router import PinPrimaryAfterWriteMixin, ReplicaReadMixin
+from .exports import ExportContentNegotiation, export_response
 from .filters import (
+    BadParametersException,
+    PropertyNearFilterBackend,
+    PropertyPriceHistogramFilterBackend,
     PropertySearchFilterBackend,
     PropertySearchMyPropertiesFilterBackend,
 )
@@ -60,8 +75,18 @@ from .models import (
     Property,
     PropertyPhoto,
     PropertyFile,
+    PropertyCounter,
     UserSavedProperty,
 )
+from .instrumentation import (
+    PHASE_GOOGLE_TRANSLATE,
+    PHASE_STRIPE,
+    record_cache,
+    timed,
+    timed_cache_page,
+)
+from .parsers import FAST_PARSER_CLASSES
+from .price_histogram import PRICE_FIELDS, DEFAULT_BINS, MAX_BINS, price_histogram
 from .permissions import (
     AlwaysDenyPermission,
     UserIsPropertyAgentOrBroker,
@@ -83,10 +108,36 @@ from .serializers import (
     PropertiesFileUpdateRentSerializer,
     PropertyLocationSerializer,
     PropertyLowDetailedSerializer,
+    PropertyAutocompleteSerializer,
+)
+from .renderers import FAST_RENDERER_CLASSES
+from .row_serializers import (
+    FeaturedPropertyRowSerializer,
+    PropertySearchRowSerializer,
+    PropertySearchMyPropertiesRowSerializer,
 )
 
 logger = logging.getLogger(__name__)
 SEARCH_RADIUS = 0.02
+AUTOCOMPLETE_MIN_LENGTH = 3
+AUTOCOMPLETE_LIMIT = 10
+
+
+def row_serialized_list(view) -> Response:
+    """
+    ``ListModelMixin.list`` for views with a ``row_serializer_class``:
+    pages are fetched as ``values_list`` rows instead of model instances.
+    """
+    queryset = view.filter_queryset(view.get_queryset())
+    annotations = view.row_serializer_class.get_annotations(queryset)
+    rows = view.row_serializer_class.get_rows(queryset)
+    page = view.paginate_queryset(rows)
+    if page is not None:
+        return view.get_paginated_response(
+            view.row_serializer_class(page, annotations).data
+        )
+
+    return Response(view.row_serializer_class(rows, annotations).data)
 
 
 class PropertyConflictCreating(APIException):
@@ -103,42 +154,23 @@ class PropertyTypeSubtypeDoNotMap(APIException):
     default_code = 'error'
 
 
-class PropertySearchAPIView(ListAPIView):
+class PropertySearchAPIView(ReplicaReadMixin, ListAPIView):
     pagination_class = DefaultPagination
     permission_classes = [AllowAny]
-    queryset = Property.objects.prefetch_related('photos')
+    queryset = Property.objects.all()
     serializer_class = PropertySearchSerializer
-    filter_backends = (PropertySearchFilterBackend, OrderingFilter)
-    ordering_fields = ['priority', 'status', 'id', 'price', 'price_max', 'price_avg', 'updated_at']
+    renderer_classes = FAST_RENDERER_CLASSES
+    row_serializer_class = PropertySearchRowSerializer
+    filter_backends = (PropertySearchFilterBackend, OrderingFilter, PropertyNearFilterBackend)
+    ordering_fields = ['priority', 'status', 'id', 'price', 'price_max', 'price_avg', 'price_usd', 'updated_at']
     ordering = ['status']
-
-    @staticmethod
-    def set_agents(page):
-        """
-        Manually load and set agents to optimize query time.
-        """
-        default_agent = Agent.default_agent()
-        agent_ids = [property.agent_id for property in page]
-        agents = {
-            agent.id: agent
-            for agent in Agent.objects.filter(id__in=agent_ids).select_related('broker')
-        }
-        for property in page:
-            property.agent = agents.get(property.agent_id, default_agent)
-        return page
+    # count, page, photos, agents
+    query_budget = 4
 
     def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
-        page = self.set_agents(page)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return row_serialized_list(self)
 
-    @method_decorator(cache_page(60))
+    @method_decorator(timed_cache_page(60))
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
@@ -146,15 +178,32 @@ class PropertySearchAPIView(ListAPIView):
 properties_search_view = PropertySearchAPIView.as_view()
 
 
+class PropertySearchExportView(PropertySearchAPIView):
+    """Search results as one CSV or XLSX file, for signed in users."""
+    pagination_class = None
+    permission_classes = [IsAuthenticated]
+    content_negotiation_class = ExportContentNegotiation
+    export_name = 'properties'
+    export_max_rows = 10000
+
+    def get(self, request, file_format):
+        return export_response(self, file_format, self.export_max_rows)
+
+
+properties_search_export_view = PropertySearchExportView.as_view()
+
+
 class PropertySearchMyPropertiesAPIView(ListAPIView):
-    queryset = Property.objects.select_related(
-        'agent', 'agent__user', 'agent__broker', 'payment', 'description_translation'
-    ).prefetch_related('photos')
+    queryset = Property.objects.all()
     permission_classes = [UserIsAgentOrBroker]
     serializer_class = PropertySearchMyPropertiesSerializer
+    renderer_classes = FAST_RENDERER_CLASSES
+    row_serializer_class = PropertySearchMyPropertiesRowSerializer
     filter_backends = (PropertySearchMyPropertiesFilterBackend, OrderingFilter)
-    ordering_fields = ['status', 'id', 'price_avg', 'price', 'size', 'baths', 'beds', 'build_year']
+    ordering_fields = ['status', 'id', 'price_avg', 'price_usd', 'price', 'size', 'baths', 'beds', 'build_year']
     ordering = ['status']
+    # promo codes, agent, broker, count, page, one per related field
+    query_budget = 10
 
     def check_promocodes(self):
         codes = PromoCode.objects.filter(user=self.request.user, active=True)
@@ -179,19 +228,41 @@ class PropertySearchMyPropertiesAPIView(ListAPIView):
         else:
             return queryset.filter(agent_id=agent.id)
 
+    def list(self, request, *args, **kwargs):
+        return row_serialized_list(self)
+
 
 properties_search_my_properties_view = PropertySearchMyPropertiesAPIView.as_view()
 
 
-class PropertyListViewSet(ListModelMixin, GenericViewSet):
-    queryset = Property.objects.select_related('agent').prefetch_related('photos')
+class PropertySearchMyPropertiesExportView(PropertySearchMyPropertiesAPIView):
+    """``my-properties`` with the same filters and ordering, as one CSV or XLSX file."""
+    pagination_class = None
+    content_negotiation_class = ExportContentNegotiation
+    export_name = 'my-properties'
+
+    def get(self, request, file_format):
+        return export_response(self, file_format)
+
+
+properties_search_my_properties_export_view = PropertySearchMyPropertiesExportView.as_view()
+
+
+class PropertyListViewSet(ReplicaReadMixin, ListModelMixin, GenericViewSet):
+    queryset = Property.objects.prefetch_related(
+        Prefetch('photos', queryset=PropertyPhoto.objects.order_by('order')),
+        Prefetch('files', queryset=PropertyFile.objects.order_by('order')),
+    )
     pagination_class = DefaultPagination
     serializer_class = PropertyListSerializer
+    renderer_classes = FAST_RENDERER_CLASSES
     permission_classes = [AllowAny]
     filter_backends = (OrderingFilter,)
     ordering = ['pk']
+    # validators, count, page, photos, files
+    query_budget = 5
 
-    @method_decorator(cache_page(60))
+    @conditional_get(list_validators(PropertyVersion(attachments=True)), cache_timeout=60)
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -205,9 +276,11 @@ property_iou_permissions = {
 }
 
 
-class PropertyImportUpdateViewSet(CreateModelMixin, UpdateModelMixin, GenericViewSet):
+class PropertyImportUpdateViewSet(PinPrimaryAfterWriteMixin, CreateModelMixin, UpdateModelMixin, GenericViewSet):
     queryset = Property.objects.all()
     serializer_class = PropertyInsertUpdateSerializer
+    renderer_classes = FAST_RENDERER_CLASSES
+    parser_classes = FAST_PARSER_CLASSES
     response_serializer_class = PropertyDetailSerializer
     ordering = ['pk']
 
@@ -239,14 +312,17 @@ class PropertyImportUpdateViewSet(CreateModelMixin, UpdateModelMixin, GenericVie
         instance = self.get_object()  # type: Property
         if instance.subscription:
             if instance.status == STATUS_ACTIVE and data.get('status') == STATUS_INACTIVE:
-                stripe = Stripe()
-                stripe.deactivate_property_subscription(instance)
+                with timed(PHASE_STRIPE):
+                    stripe = Stripe()
+                    stripe.deactivate_property_subscription(instance)
             elif instance.status == STATUS_INACTIVE and data.get('status') == STATUS_ACTIVE:
-                stripe = Stripe()
-                stripe.activate_property_subscription(instance)
+                with timed(PHASE_STRIPE):
+                    stripe = Stripe()
+                    stripe.activate_property_subscription(instance)
             elif instance.status in [STATUS_ACTIVE, STATUS_INACTIVE] and data.get('status') == STATUS_DELETED:
-                stripe = Stripe()
-                stripe.deactivate_property_subscription(instance)
+                with timed(PHASE_STRIPE):
+                    stripe = Stripe()
+                    stripe.deactivate_property_subscription(instance)
 
         self.check_type_subtype_map(
             instance=instance,
@@ -260,8 +336,9 @@ class PropertyImportUpdateViewSet(CreateModelMixin, UpdateModelMixin, GenericVie
         serializer.is_valid(raise_exception=True)
         saved_instance = self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
-        p = GoogleTranslate(obj_for_translation=saved_instance)
-        p.save_translation()
+        with timed(PHASE_GOOGLE_TRANSLATE):
+            p = GoogleTranslate(obj_for_translation=saved_instance)
+            p.save_translation()
         response_serializer = self.response_serializer_class(saved_instance)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
@@ -279,8 +356,9 @@ class PropertyImportUpdateViewSet(CreateModelMixin, UpdateModelMixin, GenericVie
             # forcibly invalidate the prefetch cache on the instance.
             instance._prefetched_objects_cache = {}
 
-        p = GoogleTranslate(obj_for_translation=instance)
-        p.save_translation()
+        with timed(PHASE_GOOGLE_TRANSLATE):
+            p = GoogleTranslate(obj_for_translation=instance)
+            p.save_translation()
         response_serializer = self.response_serializer_class(instance)
         return Response(response_serializer.data)
 
@@ -310,18 +388,23 @@ property_media_attachment_permissions = {
 
 
 class PropertyMediaAttachmentViewSet(
+    PinPrimaryAfterWriteMixin,
     RetrieveModelMixin, ListModelMixin, DestroyModelMixin, UpdateModelMixin,
     GenericViewSet
 ):
     filter_backends = (OrderingFilter,)
     ordering_fields = ['id', 'created_at', 'order']
     ordering = ['order']
+    query_budget = 2
 
     def get_queryset(self):
         queryset = self.queryset
         if isinstance(queryset, QuerySet):
             # Ensure queryset is re-evaluated on each request.
             queryset = queryset.all()
+        if self.action in ('destroy', 'partial_update'):
+            # read by UserIsPropertyPhotoAgentOrBroker
+            queryset = queryset.select_related('property__agent')
         return queryset.filter(property_id=self.kwargs['property_id'])
 
     def get_permissions(self):
@@ -377,7 +460,7 @@ property_file_detail_patch_view = PropertyFileViewSet.as_view({
 })
 
 
-class PropertyMediaAttachmentUploadView(CreateModelMixin, GenericViewSet):
+class PropertyMediaAttachmentUploadView(PinPrimaryAfterWriteMixin, CreateModelMixin, GenericViewSet):
     # MultiPartParser AND FormParser
     # https://www.django-rest-framework.org/api-guide/parsers/#multipartparser
     # "You will typically want to use both FormParser and MultiPartParser
@@ -422,39 +505,65 @@ class PropertyFileUploadView(PropertyMediaAttachmentUploadView):
 property_file_upload_view = PropertyFileUploadView.as_view({"post": "create"})
 
 
-class PropertiesCountAPIView(APIView):
+class PropertiesCountAPIView(ReplicaReadMixin, APIView):
+    """
+    Totals from PropertyCounter, optionally filtered by ``status``, ``country``
+    and ``type`` and broken down with ``group_by`` (one of the same names).
+    Deleted properties are only counted when asked for by ``status``.
+    """
     permission_classes = [AllowAny]
-    queryset = Property.objects.exclude(
-        status=STATUS_DELETED
-    )
+    queryset = PropertyCounter.objects.all()
+    filter_params = {
+        'status': 'status',
+        'country': 'country',
+        'type': 'property_type',
+    }
+    query_budget = 2
 
     def get_queryset(self):
-        queryset = self.queryset
-        if isinstance(queryset, QuerySet):
-            # Ensure queryset is re-evaluated on each request.
-            queryset = queryset.all()
-        return queryset
+        queryset = self.queryset.all()
+        params = self.request.query_params
+        if 'status' not in params:
+            queryset = queryset.exclude(status=STATUS_DELETED)
+        return queryset.filter(**{
+            field: params[param]
+            for param, field in self.filter_params.items() if param in params
+        })
 
-    @method_decorator(cache_page(60 * 60))  # 1h cache
     def get(self, request):
-        count = self.get_queryset().count()
-        return Response({'total': count})
+        queryset = self.get_queryset()
+        data = {'total': queryset.aggregate(total=Sum('count'))['total'] or 0}
+
+        group_by = self.filter_params.get(request.query_params.get('group_by'))
+        if group_by:
+            groups = queryset.values(group_by).annotate(total=Sum('count'))
+            data['groups'] = {
+                group[group_by]: group['total'] for group in groups if group['total']
+            }
+        return Response(data)
 
 
 properties_count_view = PropertiesCountAPIView.as_view()
 
 
-class PropertyDetailViewSet(RetrieveModelMixin, GenericViewSet):
+class PropertyDetailViewSet(ReplicaReadMixin, RetrieveModelMixin, GenericViewSet):
     queryset = Property.objects.select_related(
-        'agent', 'agent__user', 'agent__broker', 'description_translation',
+        'agent', 'agent__user', 'agent__broker', 'agent__description_translation',
+        'description_translation',
     ).prefetch_related(
         Prefetch('photos', queryset=PropertyPhoto.objects.order_by('order')),
         Prefetch('files', queryset=PropertyFile.objects.order_by('order')),
     )
     serializer_class = PropertyDetailSerializer
+    renderer_classes = FAST_RENDERER_CLASSES
     permission_classes = [AllowAny]
+    # validators, property with agent, photos, files
+    query_budget = 4
 
-    @method_decorator(cache_page(60))
+    @conditional_get(
+        detail_validators(PropertyVersion(attachments=True, translation=True, agent=True)),
+        cache_timeout=60,
+    )
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
@@ -471,6 +580,7 @@ class UserSavedPropertyView(ModelViewSet):
     ordering_fields = ['id', 'created_at', 'last_status']
     ordering = ['pk']
     lookup_field = 'property_id'
+    query_budget = 2
 
     def get_queryset(self):
         queryset = self.queryset
@@ -541,14 +651,17 @@ class PropertiesFileUpdateRentView(CreateAPIView):
 properties_file_update_rent_view = PropertiesFileUpdateRentView.as_view()
 
 
-class FeaturedPropertiesListView(ListModelMixin, GenericViewSet):
+class FeaturedPropertiesListView(ReplicaReadMixin, ListModelMixin, GenericViewSet):
     serializer_class = PropertySearchSerializer
+    renderer_classes = FAST_RENDERER_CLASSES
+    row_serializer_class = FeaturedPropertyRowSerializer
     queryset = Property.objects.filter(status=STATUS_ACTIVE).exclude(featured=None).order_by('-featured')
     permission_classes = [AllowAny]
+    query_budget = 4
 
-    @method_decorator(cache_page(60*5))
+    @method_decorator(timed_cache_page(60*5))
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        return row_serialized_list(self)
 
 
 featured_properties_list_view = FeaturedPropertiesListView.as_view({
@@ -556,11 +669,13 @@ featured_properties_list_view = FeaturedPropertiesListView.as_view({
 })
 
 
-class PropertiesAddressSearchView(ListModelMixin, GenericViewSet):
+class PropertiesAddressSearchView(ReplicaReadMixin, ListModelMixin, GenericViewSet):
     serializer_class = PropertyLocationSerializer
+    renderer_classes = FAST_RENDERER_CLASSES
     permission_classes = [AllowAny]
     queryset = Property.objects.all()
     pagination_class = PropertiesPagination
+    query_budget = 2
 
     def list(self, request, *args, **kwargs):
         query_params = request.query_params
@@ -586,11 +701,13 @@ properties_address_search_view = PropertiesAddressSearchView.as_view({
 })
 
 
-class PropertiesAreaSearch(ListModelMixin, GenericViewSet):
+class PropertiesAreaSearch(ReplicaReadMixin, ListModelMixin, GenericViewSet):
     serializer_class = PropertyLocationSerializer
+    renderer_classes = FAST_RENDERER_CLASSES
     permission_classes = [AllowAny]
     queryset = Property.objects.all()
     pagination_class = PropertiesPagination
+    query_budget = 2
 
     def list(self, request, *args, **kwargs):
         query_params = request.query_params
@@ -648,12 +765,14 @@ class PropertiesAreaSearch(ListModelMixin, GenericViewSet):
 properties_area_search = PropertiesAreaSearch.as_view({'get': 'list'})
 
 
-class PropertyLowDetailedView(RetrieveModelMixin, GenericViewSet):
+class PropertyLowDetailedView(ReplicaReadMixin, RetrieveModelMixin, GenericViewSet):
     serializer_class = PropertyLowDetailedSerializer
+    renderer_classes = FAST_RENDERER_CLASSES
     permission_classes = [AllowAny]
     queryset = Property.objects.all()
+    query_budget = 2
 
-    @method_decorator(cache_page(60*5))
+    @conditional_get(detail_validators(PropertyVersion()), cache_timeout=60*5)
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
@@ -661,3 +780,86 @@ class PropertyLowDetailedView(RetrieveModelMixin, GenericViewSet):
 property_low_detailed_view = PropertyLowDetailedView.as_view(
     {'get': 'retrieve'}
 )
+
+
+class PropertiesAutocompleteView(ReplicaReadMixin, ListAPIView):
+    """Best matching active properties for ``q`` (address, city, zip code, description)."""
+    serializer_class = PropertyAutocompleteSerializer
+    renderer_classes = FAST_RENDERER_CLASSES
+    permission_classes = [AllowAny]
+    pagination_class = None
+    queryset = Property.objects.filter(status=STATUS_ACTIVE)
+    query_budget = 1
+
+    def get_queryset(self):
+        text = self.request.query_params.get('q', '').strip()
+        if len(text) < AUTOCOMPLETE_MIN_LENGTH:
+            return Property.objects.none()
+
+        return super().get_queryset().search(text).values(
+            'id', 'address', 'country', 'region', 'city', 'district', 'street',
+            'zip_code', 'location',
+        )[:AUTOCOMPLETE_LIMIT]
+
+
+properties_autocomplete_view = PropertiesAutocompleteView.as_view()
+
+
+class PropertyPriceHistogramView(ReplicaReadMixin, GenericAPIView):
+    """
+    Price distribution of /properties/search results, price filters ignored.
+
+    ``price``: avg (calculated_price_avg, default) or usd (price_usd),
+    ``bins``: number of bins, ``percentiles``: e.g. 10,50,90.
+    Cached by the canonical form of the applied filters.
+    """
+    permission_classes = [AllowAny]
+    renderer_classes = FAST_RENDERER_CLASSES
+    queryset = Property.objects.all()
+    filter_backends = (PropertyPriceHistogramFilterBackend,)
+    # keys are versioned, invalidated by property change events
+    cache_timeout = 60 * 60
+    query_budget = 2
+
+    def get_histogram_params(self) -> dict:
+        query_params = self.request.query_params
+        price = query_params.get('price', 'avg')
+        if price not in PRICE_FIELDS:
+            raise BadParametersException(f'one of {", ".join(PRICE_FIELDS)}', 'price',
+                                         status_code=status.HTTP_400_BAD_REQUEST)
+        try:
+            bins = int(query_params.get('bins', DEFAULT_BINS))
+            if not 1 <= bins <= MAX_BINS:
+                raise ValueError(f'must be between 1 and {MAX_BINS}')
+        except ValueError as e:
+            raise BadParametersException(f'Invalid parameter type: {str(e)}', 'bins',
+                                         status_code=status.HTTP_400_BAD_REQUEST)
+        try:
+            percentiles = sorted({
+                float(value) for value in query_params.get('percentiles', '').split(',') if value
+            })
+            if any(not 0 <= value <= 100 for value in percentiles):
+                raise ValueError('must be between 0 and 100')
+        except ValueError as e:
+            raise BadParametersException(f'Invalid parameter type: {str(e)}', 'percentiles',
+                                         status_code=status.HTTP_400_BAD_REQUEST)
+        return {'field': PRICE_FIELDS[price], 'bins': bins, 'percentiles': percentiles}
+
+    def get(self, request):
+        params = self.get_histogram_params()
+        signature = {
+            'filters': PropertyPriceHistogramFilterBackend().get_signature(request),
+            **params,
+        }
+        digest = hashlib.md5(json.dumps(signature, sort_keys=True).encode()).hexdigest()
+        cache_key = f'properties:price-histogram:{property_cache_version()}:{digest}'
+
+        data = cache.get(cache_key)
+        record_cache(data is not None)
+        if data is None:
+            data = price_histogram(self.filter_queryset(self.get_queryset()), **params)
+            cache.set(cache_key, data, self.cache_timeout)
+        return Response(data)
+
+
+property_price_histogram_view = PropertyPriceHistogramView.as_view()